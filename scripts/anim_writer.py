@@ -0,0 +1,289 @@
+"""Animated WebP and APNG writers for the RGBA animation frame stream.
+
+GIF (see gif_writer.py) only has one-bit transparency and 256 colors per
+frame. These formats keep full 8-bit alpha, so the locomotive's soft
+edges survive:
+
+- ``webp``: lossy VP8 color with losslessly coded alpha
+  (``WEBP_QUALITY``), via Pillow's libwebp animation encoder
+- ``webp-lossless``: VP8L, exact pixels
+- ``apng``: lossless PNG frames written by ``ApngWriter``
+
+Every writer takes full-canvas RGBA uint8 frames one at a time:
+
+    writer = open_writer("out.webp", "webp", (width, height))
+    for frame in frames:
+        writer.add_frame(frame, duration_ms)
+    writer.close()
+
+or, from any iterable of frames, or of ``(frame, duration_ms)`` pairs to
+time frames one by one:
+
+    write_animation("out.png", "apng", frames, duration_ms)
+
+``ApngWriter`` streams like ``GifWriter``: it tracks what a decoder is
+showing and writes only the bounding rectangle of pixels that change,
+merging identical consecutive frames into one longer one. Its memory
+stays flat however many frames go through it. Pillow's WebP encoder
+needs every frame up front, so ``WebpWriter`` holds them, after the same
+merging, until ``close``.
+
+``decode_seconds`` times a full decode of every frame of a written file,
+as a stand-in for what the animation costs a phone to play.
+"""
+
+import io
+import struct
+import time
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from png_optimize import clear_transparent
+
+# Formats with a writer here; "gif" is handled by gif_writer.py
+FORMATS = ("webp", "webp-lossless", "apng")
+
+# libwebp quality for lossy color; alpha is always coded losslessly
+WEBP_QUALITY = 85
+WEBP_METHOD = 4
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+APNG_DISPOSE_NONE = 0
+APNG_BLEND_SOURCE = 0
+APNG_BLEND_OVER = 1
+
+# fcTL delays are a u16 numerator over a u16 denominator
+MAX_DELAY_MS = 0xFFFF
+
+
+def _chunk(chunk_type, data):
+    """One PNG chunk: length, type, data and CRC."""
+    return (
+        struct.pack(">I", len(data)) + chunk_type + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+    )
+
+
+def _png_image_data(rgba):
+    """zlib-compressed PNG scanlines of an RGBA array using Pillow's encoder.
+
+    Returns the concatenated IDAT payloads, which APNG reuses unchanged
+    as the data of an fdAT chunk.
+    """
+    buf = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(rgba), "RGBA").save(buf, "PNG", compress_level=9)
+    data = buf.getvalue()
+
+    pos = len(PNG_SIGNATURE)
+    payload = []
+    while pos < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[pos:pos + 8])
+        if chunk_type == b"IDAT":
+            payload.append(data[pos + 8:pos + 8 + length])
+        pos += 12 + length
+    return b"".join(payload)
+
+
+def _packed(rgba):
+    """(h, w) uint32 view of an RGBA uint8 array, one value per pixel."""
+    return np.ascontiguousarray(rgba).view(np.uint32)[:, :, 0]
+
+
+def _bbox(mask):
+    """(x0, y0, x1, y1) of the True pixels in ``mask``, or None."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+
+class _PendingFrame:
+    """A frame whose delay may still grow."""
+
+    def __init__(self, rgba, rect, blend, duration):
+        self.rgba = rgba  # just the rectangle's pixels
+        self.rect = rect
+        self.blend = blend
+        self.duration = duration
+
+
+class ApngWriter:
+    """Stream RGBA frames into a looping APNG, writing only what changes.
+
+    Within a frame's rectangle, pixels that do not change are written
+    fully transparent and the frame is blended over the canvas, so they
+    compress to almost nothing. That only works when every pixel that
+    does change ends up opaque; otherwise the rectangle replaces the
+    canvas outright. ``fp`` must be seekable: the frame count in the
+    header is only known once the last frame is in.
+    """
+
+    def __init__(self, fp, size, loop=0):
+        self.fp = fp
+        self.width, self.height = size
+        self.displayed = None
+        self.pending = None
+        self.sequence = 0
+        self.frames_written = 0
+        self.bytes_written = 0
+
+        self._write(PNG_SIGNATURE)
+        self._write(_chunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 8, 6, 0, 0, 0)))
+        self.actl_offset = self.fp.tell()
+        self.loop = loop
+        self._write(_chunk(b"acTL", struct.pack(">II", 0, loop)))
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.bytes_written += len(data)
+
+    def add_frame(self, rgba, duration):
+        """Queue a full-canvas RGBA frame shown for ``duration`` ms."""
+        rgba = clear_transparent(np.asarray(rgba, dtype=np.uint8))
+        target = _packed(rgba)
+
+        if self.pending is None:
+            self.pending = _PendingFrame(
+                rgba, (0, 0, self.width, self.height), APNG_BLEND_SOURCE, duration
+            )
+            self.displayed = target
+            return
+
+        changed = target != self.displayed
+        if not changed.any() and self.pending.duration + duration <= MAX_DELAY_MS:
+            self.pending.duration += duration
+            return
+
+        self._flush()
+        rect = _bbox(changed) or (0, 0, 1, 1)
+        x0, y0, x1, y1 = rect
+        region, region_changed = rgba[y0:y1, x0:x1], changed[y0:y1, x0:x1]
+        if (region[..., 3][region_changed] == 255).all():
+            region = np.where(region_changed[..., None], region, 0).astype(np.uint8)
+            blend = APNG_BLEND_OVER
+        else:
+            blend = APNG_BLEND_SOURCE
+        self.pending = _PendingFrame(region, rect, blend, duration)
+        self.displayed = target
+
+    def _flush(self):
+        """Encode and write the pending frame."""
+        frame = self.pending
+        x0, y0, x1, y1 = frame.rect
+        self._write(_chunk(b"fcTL", struct.pack(
+            ">IIIIIHHBB", self.sequence, x1 - x0, y1 - y0, x0, y0,
+            frame.duration, 1000, APNG_DISPOSE_NONE, frame.blend,
+        )))
+        self.sequence += 1
+
+        data = _png_image_data(frame.rgba)
+        if self.frames_written == 0:
+            self._write(_chunk(b"IDAT", data))  # the first frame is also the still image
+        else:
+            self._write(_chunk(b"fdAT", struct.pack(">I", self.sequence) + data))
+            self.sequence += 1
+        self.frames_written += 1
+        self.pending = None
+
+    def close(self):
+        """Write the last frame and the trailer, then fill in the frame count."""
+        if self.pending is not None:
+            self._flush()
+        self._write(_chunk(b"IEND", b""))
+        end = self.fp.tell()
+        self.fp.seek(self.actl_offset)
+        self.fp.write(_chunk(b"acTL", struct.pack(">II", self.frames_written, self.loop)))
+        self.fp.seek(end)
+
+
+class WebpWriter:
+    """Collect RGBA frames and encode them as an animated WebP on ``close``.
+
+    Identical consecutive frames are merged into one longer frame as they
+    arrive; libwebp itself only stores the changed rectangle of each one.
+    """
+
+    def __init__(self, fp, size, loop=0, lossless=False, quality=WEBP_QUALITY):
+        self.fp = fp
+        self.size = size
+        self.loop = loop
+        self.lossless = lossless
+        self.quality = quality
+        self.frames = []
+        self.durations = []
+        self.last = None
+        self.frames_written = 0
+        self.bytes_written = 0
+
+    def add_frame(self, rgba, duration):
+        """Queue a full-canvas RGBA frame shown for ``duration`` ms."""
+        rgba = clear_transparent(np.asarray(rgba, dtype=np.uint8))
+        if self.last is not None and np.array_equal(rgba, self.last):
+            self.durations[-1] += duration
+            return
+        self.frames.append(Image.fromarray(rgba, "RGBA"))
+        self.durations.append(duration)
+        self.last = rgba
+
+    def close(self):
+        """Encode the collected frames into ``fp``."""
+        start = self.fp.tell()
+        first, rest = self.frames[0], self.frames[1:]
+        first.save(
+            self.fp, "WEBP", save_all=True, append_images=rest,
+            duration=self.durations, loop=self.loop, lossless=self.lossless,
+            quality=100 if self.lossless else self.quality, alpha_quality=100,
+            method=WEBP_METHOD,
+        )
+        self.frames_written = len(self.frames)
+        self.bytes_written = self.fp.tell() - start
+        self.frames, self.last = [], None
+
+
+def open_writer(fp, fmt, size, loop=0):
+    """A writer for ``fmt`` (one of ``FORMATS``) streaming into ``fp``."""
+    if fmt == "apng":
+        return ApngWriter(fp, size, loop=loop)
+    if fmt in ("webp", "webp-lossless"):
+        return WebpWriter(fp, size, loop=loop, lossless=fmt == "webp-lossless")
+    raise ValueError(f"unknown animation format: {fmt}")
+
+
+def write_animation(path, fmt, frames, duration, loop=0):
+    """Write RGBA ``frames`` to ``path`` as ``fmt``, one frame at a time.
+
+    ``frames`` may be any iterable, typically a generator; each frame may
+    be a buffer that is reused for the next one. A frame given as a
+    ``(frame, duration)`` pair is shown for its own duration instead of
+    ``duration``. Raises ValueError if ``frames`` is empty. Returns the
+    closed writer for its stats.
+    """
+    writer = None
+    with open(path, "wb") as fp:
+        for frame in frames:
+            frame_duration = duration
+            if isinstance(frame, tuple):
+                frame, frame_duration = frame
+            if writer is None:
+                height, width = np.shape(frame)[:2]
+                writer = open_writer(fp, fmt, (width, height), loop=loop)
+            writer.add_frame(frame, frame_duration)
+        if writer is None:
+            raise ValueError("no frames to write")
+        writer.close()
+    return writer
+
+
+def decode_seconds(path):
+    """(frame count, seconds) to decode every frame of an animation to RGBA."""
+    start = time.perf_counter()
+    with Image.open(path) as img:
+        count = getattr(img, "n_frames", 1)
+        for i in range(count):
+            img.seek(i)
+            img.convert("RGBA")
+    return count, time.perf_counter() - start
@@ -1,19 +1,61 @@
 #!/usr/bin/env python3
-"""Create an animated GIF of the locomotive with glint/sparkle effects.
+"""Create an animation of the locomotive with glint/sparkle effects.
 
 Small bright glints appear and fade across the locomotive body,
 like light catching on polished metal.
 
 Usage:
     python3 animate-locomotive-glints.py input.png output.gif [--frames 60] [--duration 100] [--glints 8]
+    python3 animate-locomotive-glints.py input.png output.gif --encoding delta
+    python3 animate-locomotive-glints.py input.png output.gif --workers 4
+    python3 animate-locomotive-glints.py input.png output.webp --format webp
+
+--encoding delta quantizes the whole animation to one global palette and
+writes only the rectangles the glints touch each frame (see gif_writer.py),
+instead of a separately quantized full frame per step.
+
+--format webp|webp-lossless|apng writes an animated WebP or APNG instead
+of a GIF (see anim_writer.py). These keep the locomotive's soft alpha
+edges and full color, so frames skip the alpha threshold and the
+quantizer; --encoding only applies to GIF. Every run reports the output
+size and the time to decode all of its frames.
+
+Glint centers are spread evenly over the bright, opaque body with
+blue-noise (stratified plus Poisson-disk) placement. The decoded image and
+the eligibility map behind it are cached as memory-mapped .npy files keyed
+on the input and the eligibility thresholds (see asset_cache.py), and the
+positions placed on it per --glints count, so runs that only change
+--frames or --duration skip straight to scheduling.
+
+Frames are rendered, quantized and encoded one at a time, so memory does
+not grow with --frames (except with WebP, whose encoder takes every frame
+at once). --workers N renders frames in N processes (see frame_pool.py);
+the glint schedule is fixed up front from SCHEDULE_SEED and rendering
+uses no randomness, so the output is byte-identical to a serial run.
+
+Runs of frames that look the same, such as stretches with no glint lit,
+are merged into one longer frame before they are quantized or encoded
+(see frame_merge.py), so the output has fewer frames but the same loop.
+
+--profile out.json [--cprofile] records per-stage time and memory (see
+profiling.py).
 """
 
+import os
 import sys
 import random
 import math
+from functools import lru_cache
 from PIL import Image, ImageDraw
 import numpy as np
 
+import asset_cache
+import profiling
+from frame_pool import render_frames
+from anim_writer import FORMATS, decode_seconds, write_animation
+from frame_merge import merge_frames
+from gif_writer import quantize_frame, write_gif
+
 
 def draw_glint(draw, cx, cy, size, brightness):
     """Draw a 4-pointed star glint at (cx, cy).
@@ -23,12 +65,14 @@ def draw_glint(draw, cx, cy, size, brightness):
     """
     if brightness <= 0:
         return
+    _draw_glint_alpha(draw, cx, cy, size, int(255 * brightness))
 
-    alpha = int(255 * brightness)
 
+def _draw_glint_alpha(draw, cx, cy, size, alpha):
+    """``draw_glint`` at a peak alpha of 0-255."""
     # Outer glow -- thick fading lines
     glow_size = int(size * 1.8)
-    for t in np.linspace(0, 1, max(glow_size, 4)):
+    for t in np.linspace(0, 1, max(glow_size, 4)).tolist():
         d = int(glow_size * t)
         a = int(alpha * 0.5 * (1 - t))
         w = max(1, int(5 * (1 - t)))  # Thicker near center
@@ -38,7 +82,7 @@ def draw_glint(draw, cx, cy, size, brightness):
 
     # Bright core arms -- solid lines that taper
     core_size = max(int(size * 0.8), 2)
-    for t in np.linspace(0, 1, max(core_size, 3)):
+    for t in np.linspace(0, 1, max(core_size, 3)).tolist():
         d = int(core_size * t)
         a = int(alpha * (1 - t * 0.3))
         w = max(1, int(4 * (1 - t)))
@@ -52,7 +96,7 @@ def draw_glint(draw, cx, cy, size, brightness):
 
     # Diagonal arms (shorter, fainter)
     diag_size = max(int(size * 0.55), 2)
-    for t in np.linspace(0, 1, max(diag_size, 3)):
+    for t in np.linspace(0, 1, max(diag_size, 3)).tolist():
         d = int(diag_size * t)
         a = int(alpha * 0.6 * (1 - t))
         c = (255, 248, 220, a)
@@ -83,57 +127,367 @@ class Glint:
             return 1.0 - ((progress - 0.2) / 0.8)
 
 
-def find_glint_positions(img_array, alpha, num_positions=200):
-    """Find candidate positions for glints on the colorful body of the locomotive."""
-    h, w = alpha.shape
-    hsv_data = img_array[:, :, :3].astype(np.float64) / 255.0
+# Pixels a glint may be centered on: opaque and not too dark (the body,
+# not the wheels). Luminance is in thousandths to stay in integers.
+GLINT_MIN_ALPHA = 128
+GLINT_MIN_LUMINANCE = 60
+ELIGIBILITY_VERSION = 2
 
-    candidates = []
-    for _ in range(num_positions * 10):
-        y = random.randint(0, h - 1)
-        x = random.randint(0, w - 1)
-        if alpha[y, x] > 128:
-            # Prefer lighter/more colorful areas (the body, not dark wheels)
-            r, g, b = img_array[y, x, :3]
-            luminance = 0.299 * r + 0.587 * g + 0.114 * b
-            if luminance > 60:  # Not too dark
-                candidates.append((x, y))
-                if len(candidates) >= num_positions:
-                    break
+# The glint placement and schedule are fixed from this seed, with this
+# many glint events, each at its own position, per --glints
+SCHEDULE_SEED = 42
+EVENTS_PER_GLINT = 4
+PLACEMENT_VERSION = 1
 
-    return candidates
+# Placement works on at most this many eligible pixels, drawn at random,
+# so its cost does not grow with the art
+MAX_PLACEMENT_CANDIDATES = 100_000
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 animate-locomotive-glints.py input.png output.gif [--frames 60] [--duration 100] [--glints 8]")
-        sys.exit(1)
+def glint_eligibility(img_array):
+    """Flat indices, in raster order, of every pixel a glint may sit on."""
+    rgb = img_array[:, :, :3].astype(np.int32)
+    luminance = 299 * rgb[:, :, 0] + 587 * rgb[:, :, 1] + 114 * rgb[:, :, 2]
+    eligible = (img_array[:, :, 3] > GLINT_MIN_ALPHA) & (luminance > GLINT_MIN_LUMINANCE * 1000)
+    return np.flatnonzero(eligible)
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
 
-    num_frames = 60
-    frame_duration = 100  # ms per frame
-    num_active_glints = 8  # roughly how many glints visible at any time
+def load_setup(input_path):
+    """Decode ``input_path`` to RGBA and find its ``glint_eligibility``."""
+    data = np.array(Image.open(input_path).convert("RGBA"))
+    return {"data": data, "eligible": glint_eligibility(data)}
+
+
+def _occupied_cells(ys, xs, side):
+    """Number of ``side`` px grid cells holding at least one of the points."""
+    grid = np.zeros((ys.max() // side + 1, xs.max() // side + 1), dtype=bool)
+    grid[ys // side, xs // side] = True
+    return int(grid.sum())
+
+
+def find_glint_positions(eligible, width, num_positions, rng):
+    """Pick up to ``num_positions`` evenly spread (x, y) glint centers.
+
+    ``eligible`` is the output of ``glint_eligibility``. The eligible
+    pixels are bucketed into a square grid sized so that about 1.5x
+    ``num_positions`` cells are occupied, and one random pixel is drawn
+    from each occupied cell. Picks are then taken in random order,
+    dropping any within half a cell of one already taken (Poisson-disk),
+    so neighbors are never stacked at a shared cell corner. Dropped
+    picks only refill the list if too few survive.
+    """
+    if eligible.size == 0:
+        return []
+    if eligible.size > MAX_PLACEMENT_CANDIDATES:
+        eligible = eligible[rng.integers(0, eligible.size, MAX_PLACEMENT_CANDIDATES)]
+    ys, xs = np.divmod(eligible, width)
+
+    # Largest cell side that still leaves enough occupied cells
+    target = int(num_positions * 1.5)
+    lo, hi = 1, int(max(ys.max(), xs.max())) + 1
+    while lo < hi:
+        side = (lo + hi + 1) // 2
+        if _occupied_cells(ys, xs, side) >= target:
+            lo = side
+        else:
+            hi = side - 1
+    side = lo
+
+    cells = (ys // side) * (xs.max() // side + 1) + xs // side
+    order = np.lexsort((rng.random(cells.size), cells))
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = cells[order[1:]] != cells[order[:-1]]
+    picks = rng.permutation(order[first])
+
+    points = np.stack([xs[picks], ys[picks]], axis=1)
+    min_dist_sq = (side / 2) ** 2
+    kept, dropped = [], []
+    for i, point in enumerate(points):
+        if kept and (((points[kept] - point) ** 2).sum(axis=1) < min_dist_sq).any():
+            dropped.append(i)
+        else:
+            kept.append(i)
+    chosen = (kept + dropped)[:num_positions]
+    return [(int(x), int(y)) for x, y in points[chosen]]
+
+
+def glint_positions(eligible, width, num_active_glints):
+    """The glint centers ``animate`` places for ``num_active_glints``.
+
+    Drawn from the same seed ``animate`` uses, so they can be worked out,
+    and cached, ahead of it.
+    """
+    rng = np.random.default_rng(random.Random(SCHEDULE_SEED).getrandbits(64))
+    return find_glint_positions(eligible, width, num_active_glints * EVENTS_PER_GLINT, rng)
+
+
+# Frames sampled to build the delta encoding's global palette
+PALETTE_SAMPLE_FRAMES = 16
+
+
+class PaletteMapper:
+    """Nearest-color lookup into a fixed palette, memoized per RGB value.
+
+    The glint frames reuse the same few thousand colors over and over, so
+    each distinct color is matched against the palette only once.
+    """
+
+    UNKNOWN = 255
+
+    def __init__(self, palette):
+        self.palette_t = palette.astype(np.float32).T
+        self.palette_norm = (self.palette_t ** 2).sum(axis=0)
+        self.lookup = np.full(1 << 24, self.UNKNOWN, dtype=np.uint8)
+
+    def __call__(self, rgb):
+        """Palette indices for an (N, 3) uint8 array of RGB pixels."""
+        packed = (rgb[:, 0].astype(np.uint32) << 16) | (rgb[:, 1].astype(np.uint32) << 8) | rgb[:, 2]
+        indices = self.lookup[packed]
+        missing = np.unique(packed[indices == self.UNKNOWN])
+        if missing.size:
+            colors = np.stack([(missing >> 16) & 0xFF, (missing >> 8) & 0xFF, missing & 0xFF], axis=1)
+            colors = colors.astype(np.float32)
+            for start in range(0, len(missing), 4096):
+                # |c - p|^2 minus the per-color |c|^2 term, exact in float32
+                dist = self.palette_norm - 2 * (colors[start:start + 4096] @ self.palette_t)
+                self.lookup[missing[start:start + 4096]] = dist.argmin(axis=1)
+            indices = self.lookup[packed]
+        return indices
+
+
+def rgb_changed(a, b):
+    """Mask of pixels whose RGB differs between two RGBA uint8 arrays."""
+    packed_a = a.view(np.uint32)[:, :, 0]
+    packed_b = b.view(np.uint32)[:, :, 0]
+    rgb_bits = np.array([255, 255, 255, 0], dtype=np.uint8).view(np.uint32)[0]
+    return ((packed_a ^ packed_b) & rgb_bits) != 0
+
+
+# Glint shapes (one per size) and stamps (one per size and alpha) kept
+SHAPE_CACHE_SIZE = 64
+SPRITE_CACHE_SIZE = 1024
+
+
+class _DrawRecorder:
+    """Stands in for an ``ImageDraw.Draw``, noting each call instead of drawing."""
+
+    def __init__(self):
+        self.calls = []
+
+    def line(self, xy, fill=None, width=0):
+        self.calls.append(("line", xy, fill, width))
+
+    def ellipse(self, xy, fill=None):
+        self.calls.append(("ellipse", xy, fill, None))
+
+
+def _glint_calls(size, alpha):
+    """``draw_glint``'s ``(name, xy, fill, width)`` calls, centered in a stamp."""
+    radius = int(size * 1.8) + 3  # glow arms plus half the thickest line
+    recorder = _DrawRecorder()
+    _draw_glint_alpha(recorder, radius, radius, size, alpha)
+    return radius, recorder.calls
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def glint_shape(size):
+    """Which of ``draw_glint``'s calls last paints each pixel of a stamp.
+
+    Where a glint's lines land and which overwrite which depends only on
+    its size; its brightness only changes the colors they are drawn in.
+    The calls are replayed once with their index as the color, returning
+    ``(dy, dx, call)``: pixel offsets from the glint center and the index
+    of the call that paints each.
+    """
+    radius, calls = _glint_calls(size, 255)
+    labels = Image.new("I", (2 * radius + 1, 2 * radius + 1), 0)
+    draw = ImageDraw.Draw(labels)
+    for i, (name, xy, _, width) in enumerate(calls, start=1):
+        if name == "line":
+            draw.line(xy, fill=i, width=width)
+        else:
+            draw.ellipse(xy, fill=i)
+    labels = np.array(labels)
+
+    ys, xs = np.nonzero(labels)
+    return ys - radius, xs - radius, labels[ys, xs] - 1
 
-    if "--frames" in sys.argv:
-        num_frames = int(sys.argv[sys.argv.index("--frames") + 1])
-    if "--duration" in sys.argv:
-        frame_duration = int(sys.argv[sys.argv.index("--duration") + 1])
-    if "--glints" in sys.argv:
-        num_active_glints = int(sys.argv[sys.argv.index("--glints") + 1])
 
-    img = Image.open(input_path).convert("RGBA")
-    data = np.array(img)
-    alpha = data[:, :, 3]
+@lru_cache(maxsize=SPRITE_CACHE_SIZE)
+def glint_sprite(size, alpha):
+    """One glint stamp, as the pixels ``draw_glint`` paints on a clear layer.
 
-    print(f"Input: {img.size}, {num_frames} frames at {frame_duration}ms each")
+    Returns ``(dy, dx, rgba)``: pixel offsets from the glint center and
+    the (N, 4) uint8 color each is left with. That includes the
+    zero-alpha ink at the arm tips, which wipes out whatever an earlier
+    glint drew under it. The arms are thin, so this is a few percent of
+    the stamp's bounding box.
+    """
+    dy, dx, call = glint_shape(size)
+    _, calls = _glint_calls(size, alpha)
+    fills = np.array([fill for _, _, fill, _ in calls], dtype=np.uint8)
+    return dy, dx, fills[call]
+
+
+def threshold_alpha(data):
+    """A copy of an RGBA array with alpha cut to 0 or 255, for GIF."""
+    data = data.copy()
+    data[:, :, 3] = np.where(data[:, :, 3] > 128, 255, 0)
+    return data
+
+
+def render_glint_frame(data, glints, f, binary_alpha=True, base=None):
+    """Composite the glints active at frame ``f`` over ``data``.
+
+    The active glints' stamps are laid on one transparent overlay, later
+    ones over earlier ones, which is then alpha-composited over the
+    soft-edged image, exactly as drawing them all with ``draw_glint`` and
+    compositing the whole canvas would. Only the box the stamps cover is
+    composited, so the cost follows the glint area rather than the image
+    area. With ``binary_alpha`` the frame's alpha is thresholded for GIF
+    afterwards; ``base`` is ``threshold_alpha(data)``, computed if not
+    given.
+    """
+    if binary_alpha:
+        frame_data = (threshold_alpha(data) if base is None else base).copy()
+    else:
+        frame_data = np.array(data)
+
+    h, w = data.shape[:2]
+    stamps = []
+    for g in glints:
+        b = g.brightness_at(f)
+        if b > 0:
+            dy, dx, rgba = glint_sprite(g.size, int(255 * b))
+            ys, xs = dy + g.y, dx + g.x
+            inside = (ys >= 0) & (ys < h) & (xs >= 0) & (xs < w)
+            stamps.append((ys[inside], xs[inside], rgba[inside]))
+    stamps = [stamp for stamp in stamps if stamp[0].size]
+    if not stamps:
+        return frame_data
+
+    y0 = min(int(ys.min()) for ys, _, _ in stamps)
+    y1 = max(int(ys.max()) for ys, _, _ in stamps) + 1
+    x0 = min(int(xs.min()) for _, xs, _ in stamps)
+    x1 = max(int(xs.max()) for _, xs, _ in stamps) + 1
+    overlay = np.zeros((y1 - y0, x1 - x0, 4), dtype=np.uint8)
+    for ys, xs, rgba in stamps:
+        overlay[ys - y0, xs - x0] = rgba
+
+    under = Image.fromarray(np.ascontiguousarray(data[y0:y1, x0:x1]), "RGBA")
+    region = np.array(Image.alpha_composite(under, Image.fromarray(overlay, "RGBA")))
+    if binary_alpha:
+        region[:, :, 3] = np.where(region[:, :, 3] > 128, 255, 0)
+    frame_data[y0:y1, x0:x1] = region
+    return frame_data
+
+
+def _glint_setup(arrays, glints, binary_alpha):
+    data = arrays["data"]
+    return data, glints, binary_alpha, threshold_alpha(data) if binary_alpha else None
+
+
+def _glint_render(state, f):
+    data, glints, binary_alpha, base = state
+    return render_glint_frame(data, glints, f, binary_alpha, base)
+
+
+def glint_frames(data, glints, frame_numbers, workers=1, progress=True, binary_alpha=True):
+    """Yield the frames in ``frame_numbers`` in turn.
+
+    Glints are always composited over the soft-edged ``data``; with
+    ``binary_alpha`` each frame's alpha is then thresholded for GIF.
+    """
+    frames = render_frames(
+        _glint_setup, _glint_render, {"data": data}, frame_numbers, workers,
+        (glints, binary_alpha),
+    )
+    for i, frame in enumerate(frames):
+        yield frame
+
+        if progress and (i + 1) % 10 == 0:
+            print(f"  Frame {i + 1}/{len(frame_numbers)}")
+
+
+def build_global_palette(base_data, frames, colors=255, max_samples=200_000):
+    """Quantize the base image plus every pixel the glints change into one palette.
+
+    ``frames`` is an iterable of RGBA arrays; only their glint pixels are
+    kept. The glint pixels are subsampled evenly so quantizing stays fast
+    however long the animation is.
+    """
+    body = base_data[:, :, 3] > 0
+    glint_pixels = [frame[rgb_changed(frame, base_data) & body][:, :3] for frame in frames]
+    glint_pixels = np.concatenate(glint_pixels)
+    step = max(1, len(glint_pixels) // max_samples)
+    sample = np.concatenate([base_data[body][:, :3], glint_pixels[::step]])
+    sample_img = Image.fromarray(sample.reshape(1, -1, 3), "RGB")
+    palette = sample_img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE).getpalette()
+    return np.array(palette[: colors * 3], dtype=np.uint8).reshape(-1, 3)
+
+
+def encode_delta_gif(base_data, frames, palette, output_path):
+    """Write frames as one-palette delta rectangles over a shared base frame.
+
+    ``frames`` yields ``(frame, duration)`` pairs, as ``merge_frames`` does.
+    ``base_data`` is the alpha-thresholded locomotive without glints. It is
+    mapped to the palette once; each frame only re-maps the pixels the
+    glints changed. Glint pixels outside the locomotive's silhouette are
+    dropped: turning them back to transparent would force GIF disposal to
+    redraw most of the body on almost every frame.
+    """
+    mapper = PaletteMapper(palette)
+    body = base_data[:, :, 3] > 0
+    base_indices = np.zeros(body.shape, dtype=np.uint8)
+    base_indices[body] = mapper(base_data[body][:, :3]) + 1  # index 0 is transparent
+    full_palette = [0, 0, 0] + palette.ravel().tolist()
+
+    def delta_frames():
+        for frame_data, duration in frames:
+            changed = rgb_changed(frame_data, base_data) & body
+            indices = base_indices.copy()
+            indices[changed] = mapper(frame_data[changed][:, :3]) + 1
+            yield indices, None, duration
+
+    indexed = profiling.iterate("quantize", delta_frames())
+    with profiling.stage("encode"):
+        writer = write_gif(output_path, indexed, None, palette=full_palette)
+    print(f"  {writer.frames_written} frames written, {len(palette)} palette colors")
+
+
+def report_output(output_path):
+    """Print the output's size and how long all of its frames take to decode."""
+    size_kb = os.path.getsize(output_path) / 1024
+    with profiling.stage("decode-check"):
+        count, seconds = decode_seconds(output_path)
+    print(f"Saved to: {output_path} ({size_kb:.0f} KB, {count} frames decode in {seconds * 1000:.0f} ms)")
+
+
+def animate(data, output_path, num_frames=60, frame_duration=100, num_active_glints=8,
+            encoding="adaptive", output_format="gif", workers=1, eligible=None, positions=None):
+    """Write the glint animation of an RGBA array to ``output_path``.
+
+    ``positions`` is the ``glint_positions`` list for ``num_active_glints``
+    and ``eligible`` the ``glint_eligibility`` map of ``data``; each is
+    computed here if not given. Raises ValueError if nothing is bright
+    enough for a glint.
+    """
+    height, width = data.shape[:2]
+    print(f"Input: {(width, height)}, {num_frames} frames at {frame_duration}ms each")
     print(f"Total loop duration: {num_frames * frame_duration / 1000:.1f}s")
 
-    # Find candidate glint positions on the locomotive body
-    random.seed(42)  # Reproducible
-    positions = find_glint_positions(data, alpha)
-    print(f"Found {len(positions)} candidate glint positions")
+    # Place one glint per event, spread evenly over the locomotive body
+    random.seed(SCHEDULE_SEED)  # Reproducible
+    random.getrandbits(64)  # the draw glint_positions seeds placement with
+    num_events = num_active_glints * EVENTS_PER_GLINT
+    with profiling.stage("positions"):
+        if positions is None:
+            if eligible is None:
+                eligible = glint_eligibility(data)
+            positions = glint_positions(eligible, width, num_active_glints)
+    if not positions:
+        raise ValueError("No pixels bright enough for glints")
+    print(f"Placed {len(positions)} glint positions")
 
     # Schedule glints across the animation
     # Each glint lasts ~8-15 frames, stagger starts so ~num_active_glints are visible at once
@@ -142,11 +496,11 @@ def main():
 
     glints = []
     spacing = max(1, num_frames // (num_active_glints * 3))
-    for i in range(num_active_glints * 4):
+    for i in range(num_events):
         start = (i * spacing) % num_frames
         duration = random.randint(*glint_duration_range)
         size = random.randint(*glint_size_range)
-        pos = random.choice(positions)
+        pos = positions[i % len(positions)]
         glints.append(Glint(pos[0], pos[1], start, duration, size))
         # Also schedule a wrapped version for seamless looping
         if start + duration > num_frames:
@@ -154,53 +508,136 @@ def main():
 
     print(f"Scheduled {len(glints)} glint events")
 
-    frames = []
-    for f in range(num_frames):
-        # Start with the original image
-        frame = img.copy()
-        overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
-
-        for g in glints:
-            b = g.brightness_at(f)
-            if b > 0:
-                draw_glint(draw, g.x, g.y, g.size, b)
-
-        # Composite glints on top
-        frame = Image.alpha_composite(frame, overlay)
-
-        # Threshold alpha for GIF compatibility
-        frame_data = np.array(frame)
-        frame_data[:, :, 3] = np.where(frame_data[:, :, 3] > 128, 255, 0)
-        frame = Image.fromarray(frame_data)
-
-        frames.append(frame)
-
-        if (f + 1) % 10 == 0:
-            print(f"  Frame {f + 1}/{num_frames}")
-
-    print("Assembling GIF...")
-
-    gif_frames = []
-    for frame in frames:
-        p_frame = frame.convert("P", palette=Image.ADAPTIVE, colors=255)
-        mask = frame.split()[3].point(lambda x: 255 if x < 128 else 0)
-        p_frame.paste(0, mask=mask)
-        gif_frames.append(p_frame)
-
-    gif_frames[0].save(
-        output_path,
-        save_all=True,
-        append_images=gif_frames[1:],
-        duration=frame_duration,
-        loop=0,
-        disposal=2,
-        transparency=0,
-    )
+    if output_format != "gif":
+        print(f"Rendering and encoding {output_format}...")
+        frames = glint_frames(data, glints, range(num_frames), workers, binary_alpha=False)
+        frames = profiling.iterate("render", frames)
+        frames = profiling.iterate("merge", merge_frames(frames, frame_duration))
+        with profiling.stage("encode"):
+            writer = write_animation(output_path, output_format, frames, frame_duration)
+        print(f"  {writer.frames_written} frames written")
+        report_output(output_path)
+        return
 
-    import os
-    size_kb = os.path.getsize(output_path) / 1024
-    print(f"Saved to: {output_path} ({size_kb:.0f} KB)")
+    # The glint-free frame, alpha-thresholded for GIF compatibility
+    base_data = threshold_alpha(data)
+
+    if encoding == "delta":
+        # Build the palette from an even subset of frames so the full
+        # animation never has to be held in memory at once
+        stride = max(1, num_frames // PALETTE_SAMPLE_FRAMES)
+        sample_numbers = range(0, num_frames, stride)
+        with profiling.stage("palette"):
+            samples = glint_frames(data, glints, sample_numbers, workers, progress=False)
+            palette = build_global_palette(base_data, samples)
+
+        print("Rendering and encoding delta GIF...")
+        frames = glint_frames(data, glints, range(num_frames), workers)
+        frames = profiling.iterate("render", frames)
+        frames = profiling.iterate("merge", merge_frames(frames, frame_duration))
+        encode_delta_gif(base_data, frames, palette, output_path)
+    else:
+        print("Rendering and encoding GIF...")
+        frames = glint_frames(data, glints, range(num_frames), workers)
+        frames = profiling.iterate("render", frames)
+        frames = profiling.iterate("merge", merge_frames(frames, frame_duration))
+        frames = profiling.iterate(
+            "quantize", (quantize_frame(frame) + (duration,) for frame, duration in frames)
+        )
+        with profiling.stage("encode"):
+            write_gif(output_path, frames, frame_duration)
+
+    report_output(output_path)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 animate-locomotive-glints.py input.png output.gif [--frames 60] [--duration 100] [--glints 8] [--encoding adaptive|delta] [--format gif|webp|webp-lossless|apng] [--workers N] [--no-cache] [--profile out.json [--cprofile]]")
+        sys.exit(1)
+
+    input_path = sys.argv[1]
+    output_path = sys.argv[2]
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
+    num_frames = 60
+    frame_duration = 100  # ms per frame
+    num_active_glints = 8  # roughly how many glints visible at any time
+    encoding = "adaptive"
+    output_format = "gif"
+    workers = 1
+
+    if "--frames" in sys.argv:
+        num_frames = int(sys.argv[sys.argv.index("--frames") + 1])
+    if "--duration" in sys.argv:
+        frame_duration = int(sys.argv[sys.argv.index("--duration") + 1])
+    if "--glints" in sys.argv:
+        num_active_glints = int(sys.argv[sys.argv.index("--glints") + 1])
+    if "--encoding" in sys.argv:
+        encoding = sys.argv[sys.argv.index("--encoding") + 1]
+    if "--format" in sys.argv:
+        output_format = sys.argv[sys.argv.index("--format") + 1]
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+
+    if num_frames < 1:
+        print(f"--frames must be at least 1, got {num_frames}")
+        sys.exit(1)
+    if output_format != "gif" and output_format not in FORMATS:
+        print(f"Unknown format: {output_format}")
+        sys.exit(1)
+    if output_format != "gif" and encoding != "adaptive":
+        print(f"--encoding {encoding} is GIF-only; drop it for --format {output_format}")
+        sys.exit(1)
+
+    params = {
+        "frames": num_frames,
+        "duration": frame_duration,
+        "glints": num_active_glints,
+        "encoding": encoding,
+        "format": output_format,
+    }
+    with profiling.stage("cache"):
+        cache = asset_cache.lookup(
+            __file__, [input_path], params, output_path, enabled="--no-cache" not in sys.argv
+        )
+    if cache.fresh:
+        print(f"Up to date ({cache.status}): {output_path}")
+        return
+
+    with profiling.stage("decode"):
+        arrays = asset_cache.cached_arrays(
+            "glint-setup",
+            [input_path],
+            {"min_alpha": GLINT_MIN_ALPHA, "min_luminance": GLINT_MIN_LUMINANCE,
+             "version": ELIGIBILITY_VERSION},
+            lambda: load_setup(input_path),
+            enabled="--no-cache" not in sys.argv,
+        )
+    with profiling.stage("positions"):
+        placed = asset_cache.cached_arrays(
+            "glint-positions",
+            [input_path],
+            {"min_alpha": GLINT_MIN_ALPHA, "min_luminance": GLINT_MIN_LUMINANCE,
+             "glints": num_active_glints, "seed": SCHEDULE_SEED,
+             "version": [ELIGIBILITY_VERSION, PLACEMENT_VERSION]},
+            lambda: {"positions": np.array(glint_positions(
+                arrays["eligible"], arrays["data"].shape[1], num_active_glints,
+            ), dtype=np.int64).reshape(-1, 2)},
+            enabled="--no-cache" not in sys.argv,
+        )
+        positions = [(int(x), int(y)) for x, y in placed["positions"]]
+
+    try:
+        animate(arrays["data"], output_path, num_frames, frame_duration, num_active_glints,
+                encoding, output_format, workers, positions=positions)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    with profiling.stage("cache"):
+        cache.store()
 
 
 if __name__ == "__main__":
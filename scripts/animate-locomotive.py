@@ -1,16 +1,62 @@
 #!/usr/bin/env python3
-"""Create an animated GIF of the locomotive with a slow color shimmer.
+"""Create an animation of the locomotive with a slow color shimmer.
 
 Takes the static locomotive PNG and creates frames by rotating the hue
 of the colored body while keeping the neutral wheels/undercarriage stable.
 
 Usage:
     python3 animate-locomotive.py input.png output.gif [--frames 60] [--duration 100]
+    python3 animate-locomotive.py input.png output.gif --encoding palette
+    python3 animate-locomotive.py input.png output.gif --workers 4
+    python3 animate-locomotive.py input.png output.webp --format webp
+
+--encoding palette quantizes the locomotive once, with separate palette
+entries for the colorful body and the neutral parts, then animates by
+rotating the hue of the body entries only. Each frame is just a new local
+color table over the same pixels (see gif_writer.py). It is a speed and
+color-stability option, not a size one: frames cost no quantizing and do
+not flicker between per-frame palettes, but GIF has no palette-only
+frames, so every cycling pixel is redrawn each frame. The file only comes
+out smaller than --encoding adaptive when the colorful body is a small
+part of the image; on the locomotive, where nearly every pixel cycles,
+it is about 25% larger.
+
+--format webp|webp-lossless|apng writes an animated WebP or APNG instead
+of a GIF (see anim_writer.py). These keep the locomotive's soft alpha
+edges and full color, so frames skip the alpha threshold and the
+quantizer; --encoding only applies to GIF. Every run reports the output
+size and the time to decode all of its frames.
+
+Frames are rendered, quantized and encoded one at a time, so memory does
+not grow with --frames (except with WebP, whose encoder takes every frame
+at once). --workers N renders frames in N processes (see frame_pool.py);
+the output is byte-identical to a serial run.
+
+Runs of frames that look the same, such as hue steps too small to change
+any pixel, are merged into one longer frame before they are quantized or
+encoded (see frame_merge.py), so the output has fewer frames but the same
+loop.
+
+The decoded image, its HSV planes and the mask of pixels that shift are
+cached as memory-mapped .npy files keyed on the input and the mask
+thresholds (see asset_cache.py), so runs that only change --frames,
+--duration or --encoding skip straight to rendering.
+
+--profile out.json [--cprofile] records per-stage time and memory (see
+profiling.py).
 """
 
+import os
 import sys
 from PIL import Image
 import numpy as np
+
+import asset_cache
+import profiling
+from frame_pool import render_frames
+from anim_writer import FORMATS, decode_seconds, write_animation
+from frame_merge import MERGE_TOLERANCE, merge_frames
+from gif_writer import quantize_frame, write_gif
 import colorsys
 
 
@@ -71,99 +117,309 @@ def hsv_to_rgb_array(hsv):
     return (rgb * 255).astype(np.uint8)
 
 
-def create_shimmer_frame(data, hsv, alpha, saturation_mask, hue_shift):
-    """Create a single frame with hue shifted on saturated pixels only."""
-    shifted_hsv = hsv.copy()
-    shifted_hsv[:, :, 0] = (hsv[:, :, 0] + hue_shift) % 1.0
+# Pixels whose hue shifts: visible and colorful enough to be the body, not
+# the neutral dark wheels/undercarriage
+SHIMMER_MIN_SATURATION = 0.15
+SHIMMER_MIN_ALPHA = 128
+SETUP_VERSION = 1
 
-    # Only shift pixels that have enough saturation (the colorful body)
-    # Leave low-saturation pixels alone (dark wheels, neutral tones)
-    new_rgb = hsv_to_rgb_array(shifted_hsv)
 
-    result = data.copy()
-    result[:, :, 0] = np.where(saturation_mask, new_rgb[:, :, 0], data[:, :, 0])
-    result[:, :, 1] = np.where(saturation_mask, new_rgb[:, :, 1], data[:, :, 1])
-    result[:, :, 2] = np.where(saturation_mask, new_rgb[:, :, 2], data[:, :, 2])
+def shimmer_setup(data):
+    """The HSV planes of an RGBA array and the mask of pixels whose hue shifts."""
+    hsv = rgb_to_hsv_array(data[:, :, :3])
+    saturation_mask = (hsv[:, :, 1] > SHIMMER_MIN_SATURATION) & (data[:, :, 3] > SHIMMER_MIN_ALPHA)
+    return {"hsv": hsv, "saturation_mask": saturation_mask}
 
-    return result
 
+def load_setup(input_path):
+    """Decode ``input_path`` to RGBA and derive its ``shimmer_setup`` arrays."""
+    data = np.array(Image.open(input_path).convert("RGBA"))
+    return {"data": data, **shimmer_setup(data)}
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 animate-locomotive.py input.png output.gif [--frames 60] [--duration 100]")
-        sys.exit(1)
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
+class ShimmerEngine:
+    """Hue-rotate just the colorful pixels, frame after frame.
 
-    # Parse optional args
-    num_frames = 48
-    frame_duration = 120  # ms per frame
+    The ``saturation_mask`` pixels are gathered once into contiguous
+    float32 HSV arrays. Each frame shifts the hue, converts back to RGB
+    branch-free on that subset and scatters the result into one reused
+    RGBA buffer, so a frame costs O(colorful pixels) and allocates nothing
+    the size of the image.
+    """
 
-    if "--frames" in sys.argv:
-        num_frames = int(sys.argv[sys.argv.index("--frames") + 1])
-    if "--duration" in sys.argv:
-        frame_duration = int(sys.argv[sys.argv.index("--duration") + 1])
+    def __init__(self, data, hsv, saturation_mask, binary_alpha=True):
+        self.pixels = np.flatnonzero(saturation_mask)
+        hsv = hsv.reshape(-1, 3)[self.pixels].astype(np.float32)
+        self.h, self.s, self.v = hsv[:, 0].copy(), hsv[:, 1].copy(), hsv[:, 2].copy()
 
-    img = Image.open(input_path).convert("RGBA")
-    data = np.array(img)
-    alpha = data[:, :, 3]
-    rgb = data[:, :, :3]
+        # GIF only supports binary transparency (no semi-transparent pixels).
+        # Threshold alpha to 0 or 255 once to avoid black-fringe artifacts;
+        # frames never touch alpha, so WebP/APNG keep the soft edges as is.
+        self.output = data.copy()
+        if binary_alpha:
+            self.output[:, :, 3] = np.where(data[:, :, 3] > 128, 255, 0)
+        self.output_pixels = self.output.reshape(-1, 4)
+
+    def frame(self, hue_shift):
+        """Render the frame for ``hue_shift`` into the shared output buffer."""
+        h6 = (self.h + hue_shift) % 1.0 * 6.0
+        sector = h6.astype(np.int32) % 6
+        f = h6 - sector
+        v, s = self.v, self.s
+        p = v * (1.0 - s)
+        q = v * (1.0 - s * f)
+        t = v * (1.0 - s * (1.0 - f))
+
+        sectors = [sector == i for i in range(6)]
+        rgb = np.empty((len(self.pixels), 3), dtype=np.float32)
+        rgb[:, 0] = np.select(sectors, [v, q, p, p, t, v])
+        rgb[:, 1] = np.select(sectors, [t, v, v, q, p, p])
+        rgb[:, 2] = np.select(sectors, [p, p, t, v, v, q])
+        rgb *= 255
+        self.output_pixels[self.pixels, :3] = rgb  # truncates like astype(uint8)
+        return self.output
+
+
+def _quantize_group(pixels, colors):
+    """Quantize an (N, 3) pixel array; return (indices, palette array)."""
+    if len(pixels) == 0 or colors == 0:
+        return np.zeros(len(pixels), dtype=np.uint8), np.zeros((0, 3), dtype=np.uint8)
+    quantized = Image.fromarray(pixels.reshape(1, -1, 3), "RGB").quantize(
+        colors=colors, method=Image.Quantize.FASTOCTREE
+    )
+    indices = np.array(quantized)[0]
+    used = int(indices.max()) + 1
+    palette = np.array(quantized.getpalette()[: used * 3], dtype=np.uint8).reshape(-1, 3)
+    return indices, palette
+
+
+def quantize_split(data, saturation_mask, colors=255):
+    """Quantize the locomotive once, keeping the colorful body on its own entries.
+
+    Returns the full-canvas index array (0 is transparent), the RGB palette
+    and the slice of palette entries that belong to ``saturation_mask``.
+    Palette entries are shared out in proportion to pixel counts.
+    """
+    opaque = data[:, :, 3] > 128
+    neutral_mask = opaque & ~saturation_mask
+    num_colorful = int(saturation_mask.sum())
+    num_opaque = max(int(opaque.sum()), 1)
+    colorful_colors = min(colors - 16, max(16, round(colors * num_colorful / num_opaque)))
+    if num_colorful == 0:
+        colorful_colors = 0
+
+    colorful_idx, colorful_pal = _quantize_group(data[saturation_mask][:, :3], colorful_colors)
+    neutral_idx, neutral_pal = _quantize_group(
+        data[neutral_mask][:, :3], colors - len(colorful_pal)
+    )
 
-    print(f"Input: {img.size}, {num_frames} frames at {frame_duration}ms each")
-    print(f"Total loop duration: {num_frames * frame_duration / 1000:.1f}s")
+    indices = np.zeros(opaque.shape, dtype=np.uint8)
+    indices[saturation_mask] = colorful_idx + 1
+    indices[neutral_mask] = neutral_idx + 1 + len(colorful_pal)
+    palette = np.concatenate([np.zeros((1, 3), dtype=np.uint8), colorful_pal, neutral_pal])
+    return indices, palette, slice(1, 1 + len(colorful_pal))
 
-    # Convert to HSV for hue manipulation
-    hsv = rgb_to_hsv_array(rgb)
 
-    # Create mask: only shift hue on pixels that are both visible and colorful
-    # Saturation threshold separates the colorful body from neutral dark wheels
-    saturation_mask = (hsv[:, :, 1] > 0.15) & (alpha > 128)
+def _shimmer_setup(arrays, num_frames, binary_alpha):
+    engine = ShimmerEngine(arrays["data"], arrays["hsv"], arrays["saturation_mask"], binary_alpha)
+    return engine, num_frames
 
-    print(f"Colorful pixels: {saturation_mask.sum()} / {(alpha > 128).sum()} opaque pixels")
 
-    frames = []
-    for i in range(num_frames):
-        hue_shift = i / num_frames  # Full rotation over all frames
-        frame_data = create_shimmer_frame(data, hsv, alpha, saturation_mask, hue_shift)
+def _shimmer_render(state, i):
+    engine, num_frames = state
+    hue_shift = i / num_frames  # Full rotation over all frames
+    return engine.frame(hue_shift)
 
-        # GIF only supports binary transparency (no semi-transparent pixels).
-        # Threshold alpha to 0 or 255 to avoid black-fringe artifacts.
-        frame_data[:, :, 3] = np.where(frame_data[:, :, 3] > 128, 255, 0)
 
-        frame_img = Image.fromarray(frame_data)
-        frames.append(frame_img)
+def shimmer_frames(data, hsv, saturation_mask, num_frames, workers=1, binary_alpha=True):
+    """Yield each RGBA shimmer frame in turn, alpha-thresholded for GIF by default.
+
+    In serial mode every frame is the same reused buffer, valid until the
+    next one.
+    """
+    arrays = {"data": data, "hsv": hsv, "saturation_mask": saturation_mask}
+    frames = render_frames(
+        _shimmer_setup, _shimmer_render, arrays, range(num_frames), workers,
+        (num_frames, binary_alpha),
+    )
+    for i, frame in enumerate(frames):
+        yield frame
 
         if (i + 1) % 10 == 0:
             print(f"  Frame {i + 1}/{num_frames}")
 
-    print("Assembling GIF...")
 
-    # Convert RGBA frames to palette mode with proper transparency handling.
+# Share of cycling pixels past which a palette-cycled GIF is expected to
+# come out larger than an adaptively quantized one (a rough cut-off)
+PALETTE_CYCLE_MAX_SHARE = 0.5
+
+
+def encode_palette_cycle_gif(data, saturation_mask, num_frames, output_path, frame_duration):
+    """Write the shimmer as one set of pixels with a hue-rotated palette per frame.
+
+    Frame generation only converts the colorful palette entries, so it
+    costs O(palette) rather than O(pixels). Runs of frames whose palettes
+    are within ``MERGE_TOLERANCE`` of each other are merged.
+    """
+    with profiling.stage("quantize"):
+        indices, palette, colorful = quantize_split(data, saturation_mask)
+    colorful_hsv = rgb_to_hsv_array(palette[colorful][np.newaxis].astype(np.float64))
+    print(f"  Quantized once: {len(palette) - 1} colors, {colorful.stop - colorful.start} cycling")
+    cycling_share = saturation_mask.sum() / max(int((data[:, :, 3] > 128).sum()), 1)
+    if cycling_share > PALETTE_CYCLE_MAX_SHARE:
+        print(f"  {cycling_share:.0%} of the body cycles and is redrawn every frame;"
+              " expect a larger file than --encoding adaptive")
+
+    def palettes():
+        for i in range(num_frames):
+            hue_shift = i / num_frames  # Full rotation over all frames
+            shifted = colorful_hsv.copy()
+            shifted[:, :, 0] = (colorful_hsv[:, :, 0] + hue_shift) % 1.0
+            frame_palette = palette.copy()
+            frame_palette[colorful] = hsv_to_rgb_array(shifted)[0]
+            yield frame_palette
+
+    def same_colors(a, b):
+        return np.abs(a.astype(np.int16) - b).max() <= MERGE_TOLERANCE
+
+    with profiling.stage("encode"):
+        merged = merge_frames(profiling.iterate("render", palettes()), frame_duration, same_colors)
+        frames = (
+            (indices, frame_palette.ravel().tolist(), duration)
+            for frame_palette, duration in merged
+        )
+        write_gif(output_path, frames, frame_duration, palette=palette.ravel().tolist())
+
+
+def report_output(output_path):
+    """Print the output's size and how long all of its frames take to decode."""
+    size_kb = os.path.getsize(output_path) / 1024
+    with profiling.stage("decode-check"):
+        count, seconds = decode_seconds(output_path)
+    print(f"Saved to: {output_path} ({size_kb:.0f} KB, {count} frames decode in {seconds * 1000:.0f} ms)")
+
+
+def animate(data, output_path, num_frames=48, frame_duration=120, encoding="adaptive",
+            output_format="gif", workers=1, setup=None):
+    """Write the shimmer animation of an RGBA array to ``output_path``.
+
+    ``setup`` is the ``shimmer_setup`` of ``data``, computed here if not
+    given.
+    """
+    height, width = data.shape[:2]
+    print(f"Input: {(width, height)}, {num_frames} frames at {frame_duration}ms each")
+    print(f"Total loop duration: {num_frames * frame_duration / 1000:.1f}s")
+
+    with profiling.stage("hsv"):
+        if setup is None:
+            setup = shimmer_setup(data)
+        hsv, saturation_mask = setup["hsv"], setup["saturation_mask"]
+
+    print(f"Colorful pixels: {saturation_mask.sum()} / {(data[:, :, 3] > 128).sum()} opaque pixels")
+
+    if encoding == "palette":
+        print("Assembling palette-cycled GIF...")
+        encode_palette_cycle_gif(data, saturation_mask, num_frames, output_path, frame_duration)
+        report_output(output_path)
+        return
+
+    if output_format != "gif":
+        print(f"Rendering and encoding {output_format}...")
+        with profiling.stage("encode"):
+            frames = profiling.iterate(
+                "render",
+                shimmer_frames(data, hsv, saturation_mask, num_frames, workers, binary_alpha=False),
+            )
+            frames = profiling.iterate("merge", merge_frames(frames, frame_duration))
+            writer = write_animation(output_path, output_format, frames, frame_duration)
+        print(f"  {writer.frames_written} frames written")
+        report_output(output_path)
+        return
+
+    print("Rendering and encoding GIF...")
+
     # Pillow's default RGBA->GIF conversion composites against black, causing
-    # the black background issue. We handle it explicitly.
-    gif_frames = []
-    for frame in frames:
-        # Create a new palette image with a designated transparent color
-        p_frame = frame.convert("P", palette=Image.ADAPTIVE, colors=255)
-        # Map fully transparent pixels to index 0
-        mask = frame.split()[3].point(lambda x: 255 if x < 128 else 0)
-        p_frame.paste(0, mask=mask)
-        gif_frames.append(p_frame)
-
-    gif_frames[0].save(
-        output_path,
-        save_all=True,
-        append_images=gif_frames[1:],
-        duration=frame_duration,
-        loop=0,  # Loop forever
-        disposal=2,  # Clear frame before drawing next
-        transparency=0,
-    )
+    # the black background issue. quantize_frame keeps index 0 transparent.
+    with profiling.stage("encode"):
+        frames = profiling.iterate(
+            "render", shimmer_frames(data, hsv, saturation_mask, num_frames, workers)
+        )
+        frames = profiling.iterate("merge", merge_frames(frames, frame_duration))
+        frames = profiling.iterate(
+            "quantize", (quantize_frame(frame) + (duration,) for frame, duration in frames)
+        )
+        write_gif(output_path, frames, frame_duration)
 
-    import os
-    size_kb = os.path.getsize(output_path) / 1024
-    print(f"Saved to: {output_path} ({size_kb:.0f} KB)")
+    report_output(output_path)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 animate-locomotive.py input.png output.gif [--frames 60] [--duration 100] [--encoding adaptive|palette] [--format gif|webp|webp-lossless|apng] [--workers N] [--no-cache] [--profile out.json [--cprofile]]")
+        sys.exit(1)
+
+    input_path = sys.argv[1]
+    output_path = sys.argv[2]
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
+    # Parse optional args
+    num_frames = 48
+    frame_duration = 120  # ms per frame
+    encoding = "adaptive"
+    output_format = "gif"
+    workers = 1
+
+    if "--frames" in sys.argv:
+        num_frames = int(sys.argv[sys.argv.index("--frames") + 1])
+    if "--duration" in sys.argv:
+        frame_duration = int(sys.argv[sys.argv.index("--duration") + 1])
+    if "--encoding" in sys.argv:
+        encoding = sys.argv[sys.argv.index("--encoding") + 1]
+    if "--format" in sys.argv:
+        output_format = sys.argv[sys.argv.index("--format") + 1]
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+
+    if num_frames < 1:
+        print(f"--frames must be at least 1, got {num_frames}")
+        sys.exit(1)
+    if output_format != "gif" and output_format not in FORMATS:
+        print(f"Unknown format: {output_format}")
+        sys.exit(1)
+    if output_format != "gif" and encoding != "adaptive":
+        print(f"--encoding {encoding} is GIF-only; drop it for --format {output_format}")
+        sys.exit(1)
+
+    params = {
+        "frames": num_frames,
+        "duration": frame_duration,
+        "encoding": encoding,
+        "format": output_format,
+    }
+    with profiling.stage("cache"):
+        cache = asset_cache.lookup(
+            __file__, [input_path], params, output_path, enabled="--no-cache" not in sys.argv
+        )
+    if cache.fresh:
+        print(f"Up to date ({cache.status}): {output_path}")
+        return
+
+    with profiling.stage("decode"):
+        arrays = asset_cache.cached_arrays(
+            "shimmer-setup",
+            [input_path],
+            {"min_saturation": SHIMMER_MIN_SATURATION, "min_alpha": SHIMMER_MIN_ALPHA,
+             "version": SETUP_VERSION},
+            lambda: load_setup(input_path),
+            enabled="--no-cache" not in sys.argv,
+        )
+    animate(arrays["data"], output_path, num_frames, frame_duration, encoding, output_format,
+            workers, setup=arrays)
+    with profiling.stage("cache"):
+        cache.store()
 
 
 if __name__ == "__main__":
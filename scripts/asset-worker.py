@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""Long-lived worker that runs the asset scripts without a cold start each call.
+
+The art-direction loop calls the processing scripts over and over; as
+separate processes each call pays for interpreter startup and the PIL and
+numpy imports, and every image goes through a temp file. This worker
+imports everything once and takes requests as line-delimited JSON, one
+object per line, on stdin/stdout or on a Unix socket:
+
+    python3 asset-worker.py
+    python3 asset-worker.py --socket /tmp/asset-worker.sock
+
+Each request is answered with one line carrying the same "id":
+
+    {"id": 1, "op": "remove_background", "image": {"png": "<base64>"}, "fuzz": 30}
+    {"id": 1, "ok": true, "image": {"png": "<base64>"}, "size": [1024, 1024], "seconds": 0.21}
+    {"id": 2, "ok": false, "error": "ValueError: ..."}
+
+Image operations, each taking an "image" and answering with one:
+
+- remove_background [fuzz]           -- as in process-card.py
+- crop_to_content [padding]          -- as in process-card.py
+- fit_to_canvas [width, height]      -- as in process-card.py
+- process_card [fuzz]                -- the three above in turn
+- process_icon [bg_color, padding, size] -- crop, pad to square and resize,
+  as process-icon.py does
+
+An "image" is one of:
+
+- {"png": base64}: encoded image bytes (any format Pillow reads)
+- {"path": path}: a file to read
+- {"shm": name, "shape": [h, w, bands]}: uint8 pixels in a shared memory
+  segment, read straight from memory with nothing to decode
+
+"reply" picks how the result comes back: "png" (default), "shm" or
+{"path": path}. A "shm" reply is a segment owned by the worker; map it
+by name, then send {"op": "release", "shm": name} when done with it.
+Python clients before 3.13 should map it the way ``attach`` does, or
+their resource tracker unlinks it when they exit.
+Passing a reply segment straight on as the next request's image chains
+steps without encoding anything in between.
+
+Script entry points run the script's own command line in-process, so the
+modules stay imported and warm between calls:
+
+    {"op": "run", "script": "animate-locomotive-glints.py", "args": ["in.png", "out.webp", "--format", "webp"]}
+    {"ok": true, "exit": 0, "log": "...", "seconds": 1.9}
+
+"script" is one of ``SCRIPTS``. Whatever the work prints is returned as
+"log" (or dropped, for image operations) so it never mixes with replies.
+{"op": "ping"} checks the worker is up; {"op": "shutdown"} stops it.
+
+Requests are handled one at a time in arrival order. On a socket each
+connection is served in turn, and segments still held when the worker
+exits are released.
+"""
+
+import base64
+import io
+import json
+import os
+import socketserver
+import sys
+import time
+from contextlib import redirect_stdout
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image
+
+from script_support import load_script
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Scripts "run" may call, each a module with a main() reading sys.argv
+SCRIPTS = (
+    "process-card.py",
+    "process-icon.py",
+    "generate-icons.py",
+    "build-card-atlas.py",
+    "animate-locomotive.py",
+    "animate-locomotive-glints.py",
+)
+
+MODES = {1: "L", 3: "RGB", 4: "RGBA"}
+
+
+def attach(name):
+    """Map an existing shared memory segment someone else owns.
+
+    The segment is dropped from this process's resource tracker, which
+    would otherwise unlink it from under its owner when the worker exits.
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+class Worker:
+    """Decode requests, run them and encode the replies."""
+
+    def __init__(self):
+        self.modules = {}
+        self.segments = {}  # reply segments this worker created, by name
+        self.card = self.script("process-card.py")
+        self.icons = self.script("generate-icons.py")
+
+    def script(self, name):
+        """The module for ``name``, imported on first use."""
+        if name not in SCRIPTS:
+            raise ValueError(f"unknown script: {name}")
+        if name not in self.modules:
+            self.modules[name] = load_script(name)
+        return self.modules[name]
+
+    # --- Image transport ---------------------------------------------------
+
+    def read_image(self, spec):
+        """A PIL image for an "image" spec."""
+        if "png" in spec:
+            img = Image.open(io.BytesIO(base64.b64decode(spec["png"])))
+            img.load()
+            return img
+        if "path" in spec:
+            img = Image.open(spec["path"])
+            img.load()
+            return img
+        if "shm" in spec:
+            owned = spec["shm"] in self.segments
+            segment = self.segments[spec["shm"]] if owned else attach(spec["shm"])
+            h, w, bands = spec["shape"]
+            data = np.ndarray((h, w, bands), np.uint8, buffer=segment.buf)
+            # Copied either way: the segment may close before the image is used
+            img = Image.fromarray(np.array(data[:, :, 0] if bands == 1 else data), MODES[bands])
+            del data
+            if not owned:
+                segment.close()
+            return img
+        raise ValueError("image needs one of: png, path, shm")
+
+    def write_image(self, img, reply):
+        """The reply fields for ``img`` sent back as ``reply``."""
+        fields = {"size": list(img.size), "mode": img.mode}
+        if reply == "png":
+            buffer = io.BytesIO()
+            img.save(buffer, "PNG", compress_level=1)
+            fields["image"] = {"png": base64.b64encode(buffer.getvalue()).decode("ascii")}
+        elif reply == "shm":
+            data = np.asarray(img)
+            segment = shared_memory.SharedMemory(create=True, size=max(data.nbytes, 1))
+            np.ndarray(data.shape, np.uint8, buffer=segment.buf)[...] = data
+            self.segments[segment.name] = segment
+            shape = list(data.shape) if data.ndim == 3 else list(data.shape) + [1]
+            fields["image"] = {"shm": segment.name, "shape": shape}
+        elif isinstance(reply, dict) and "path" in reply:
+            img.save(reply["path"])
+            fields["image"] = {"path": reply["path"]}
+        else:
+            raise ValueError(f"unknown reply: {reply}")
+        return fields
+
+    def release(self, name):
+        segment = self.segments.pop(name)
+        segment.close()
+        segment.unlink()
+
+    def close(self):
+        for name in list(self.segments):
+            self.release(name)
+
+    # --- Operations ----------------------------------------------------------
+
+    def image_op(self, op, img, request):
+        card = self.card
+        if op == "remove_background":
+            return card.remove_background(img, fuzz=request.get("fuzz", 30))
+        if op == "crop_to_content":
+            return card.crop_to_content(img, padding=request.get("padding", 2))
+        if op == "fit_to_canvas":
+            return card.fit_to_canvas(img, request.get("width", 600), request.get("height", 420))
+        if op == "process_card":
+            img = card.remove_background(img, fuzz=request.get("fuzz", 30))
+            return card.fit_to_canvas(card.crop_to_content(img))
+        if op == "process_icon":
+            bg_color = tuple(request.get("bg_color", (45, 38, 34)))
+            canvas = self.icons.build_canvas(img.convert("RGB"), bg_color, request.get("padding", 5))
+            size = request.get("size", 1024)
+            return canvas.resize((size, size), Image.LANCZOS)
+        raise ValueError(f"unknown op: {op}")
+
+    def run_script(self, name, args):
+        """Run a script's main() with ``args``; returns (exit code, output)."""
+        module = self.script(name)
+        log = io.StringIO()
+        argv = sys.argv
+        sys.argv = [os.path.join(SCRIPTS_DIR, name)] + [str(arg) for arg in args]
+        code = 0
+        try:
+            with redirect_stdout(log):
+                module.main()
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        finally:
+            sys.argv = argv
+        return code, log.getvalue()
+
+    def handle(self, request):
+        """The reply for one decoded request."""
+        op = request.get("op")
+        reply = {"id": request.get("id")}
+        start = time.perf_counter()
+        try:
+            if op == "ping":
+                pass
+            elif op == "release":
+                self.release(request["shm"])
+            elif op == "run":
+                reply["exit"], reply["log"] = self.run_script(request["script"], request.get("args", []))
+            else:
+                img = self.read_image(request["image"])
+                with redirect_stdout(io.StringIO()):
+                    img = self.image_op(op, img, request)
+                reply.update(self.write_image(img, request.get("reply", "png")))
+            reply["ok"] = True
+        except Exception as e:
+            reply["ok"] = False
+            reply["error"] = f"{type(e).__name__}: {e}"
+        reply["seconds"] = round(time.perf_counter() - start, 4)
+        return reply
+
+    def serve(self, lines, send):
+        """Answer each JSON line from ``lines`` through ``send``; False on shutdown."""
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                send({"id": None, "ok": False, "error": f"JSONDecodeError: {e}"})
+                continue
+            if request.get("op") == "shutdown":
+                send({"id": request.get("id"), "ok": True})
+                return False
+            send(self.handle(request))
+        return True
+
+
+def serve_stdio(worker):
+    out = sys.stdout
+
+    def send(reply):
+        out.write(json.dumps(reply) + "\n")
+        out.flush()
+
+    worker.serve(sys.stdin, send)
+
+
+def serve_socket(worker, path):
+    if os.path.exists(path):
+        os.unlink(path)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            def send(reply):
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+                self.wfile.flush()
+
+            lines = (line.decode() for line in self.rfile)
+            if not worker.serve(lines, send):
+                self.server.running = False
+
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        server.running = True
+        print(f"Listening on {path}", file=sys.stderr)
+        try:
+            while server.running:
+                server.handle_request()
+        finally:
+            os.unlink(path)
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print("Usage: python3 asset-worker.py [--socket PATH]")
+        sys.exit(1)
+
+    worker = Worker()
+    try:
+        if "--socket" in sys.argv:
+            serve_socket(worker, sys.argv[sys.argv.index("--socket") + 1])
+        else:
+            serve_stdio(worker)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Content-addressed build cache shared by the asset scripts.
+
+Each output is keyed on a hash of its input bytes, the effective
+parameters the script ran with, and the source of the script and of every
+module from its directory it imports, directly or through another one (so
+editing a script or a helper such as png_optimize.py invalidates
+everything built with it). Modules loaded any other way, such as scripts
+run through ``load_script``, are not followed. A manifest maps every output
+path to the key that built it, and a copy of each output is kept under
+``objects/`` so a deleted or overwritten output can be restored without
+re-running the pipeline.
+
+Usage from a script:
+
+    entry = asset_cache.lookup(__file__, [input_path], {"fuzz": fuzz}, output_path)
+    if entry.fresh:
+        print(f"Up to date ({entry.status}): {output_path}")
+        return
+    ...build output_path...
+    entry.store()
+
+Intermediate arrays that are slow to derive from an input, like the
+decoded image and the masks built from it, can be cached the same way:
+
+    arrays = asset_cache.cached_arrays("glint-map", [input_path], params, build)
+
+Each set of arrays is a directory of ``.npy`` files that later runs map
+read-only instead of loading, so a hit costs about as much as hashing the
+input. The ``arrays/`` directory is kept under ``ARRAY_CACHE_BYTES``
+(``ASSET_CACHE_ARRAY_MB``) by dropping the least recently used sets.
+
+The cache lives in ``scripts/.asset-cache`` unless ``ASSET_CACHE_DIR`` is
+set. Scripts accept ``--no-cache`` to bypass it.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import shutil
+from functools import lru_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are not locked
+    fcntl = None
+
+CACHE_DIR = os.environ.get(
+    "ASSET_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".asset-cache")
+)
+
+# Size bound on the cached intermediate arrays, least recently used out first
+ARRAY_CACHE_BYTES = int(os.environ.get("ASSET_CACHE_ARRAY_MB", "256")) << 20
+
+
+def file_digest(path):
+    """SHA-256 hex digest of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def local_imports(script_path):
+    """Sorted paths of ``script_path`` and the modules beside it that it imports.
+
+    Follows imports transitively, reading them from the source, so
+    nothing is actually imported.
+    """
+    script_path = os.path.abspath(script_path)
+    directory = os.path.dirname(script_path)
+    found, pending = set(), [script_path]
+    while pending:
+        path = pending.pop()
+        if path in found:
+            continue
+        found.add(path)
+        with open(path) as f:
+            tree = ast.parse(f.read(), path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                helper = os.path.join(directory, f"{module}.py")
+                if os.path.isfile(helper):
+                    pending.append(helper)
+    return tuple(sorted(found))
+
+
+def cache_key(script_path, input_paths, params):
+    """Hash the script and helper sources, the effective params and every input file."""
+    h = hashlib.sha256()
+    for path in local_imports(script_path):
+        h.update(os.path.basename(path).encode())
+        h.update(file_digest(path).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    for path in input_paths:
+        h.update(file_digest(path).encode())
+    return h.hexdigest()
+
+
+def _manifest_path(root):
+    return os.path.join(root, "manifest.json")
+
+
+def read_manifest(root=CACHE_DIR):
+    """Return the output-path -> record mapping, or {} if there is none yet."""
+    try:
+        with open(_manifest_path(root)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _update_manifest(root, output_path, record):
+    """Read-modify-write the manifest under a lock so pool workers can share it."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, "manifest.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = read_manifest(root)
+        manifest[output_path] = record
+        tmp_path = f"{_manifest_path(root)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, _manifest_path(root))
+
+
+class CacheEntry:
+    """Cache state for one output: whether it is fresh and how to record it.
+
+    ``status`` is "hit" (output already matches the key), "restored"
+    (copied back from the object store), "miss" or "disabled".
+    """
+
+    def __init__(self, root, key, output_path, script_path, input_paths, params, status):
+        self.root = root
+        self.key = key
+        self.output_path = output_path
+        self.script_path = script_path
+        self.input_paths = input_paths
+        self.params = params
+        self.status = status
+
+    @property
+    def fresh(self):
+        return self.status in ("hit", "restored")
+
+    def _object_path(self):
+        return os.path.join(self.root, "objects", self.key[:2], self.key)
+
+    def _record(self, output_digest):
+        return {
+            "key": self.key,
+            "script": os.path.basename(self.script_path),
+            "inputs": [os.path.abspath(p) for p in self.input_paths],
+            "params": self.params,
+            "output_sha256": output_digest,
+        }
+
+    def store(self):
+        """Copy the freshly built output into the cache and record it."""
+        if self.status == "disabled":
+            return
+        object_path = self._object_path()
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        shutil.copyfile(self.output_path, object_path)
+        _update_manifest(
+            self.root, os.path.abspath(self.output_path), self._record(file_digest(object_path))
+        )
+
+
+def lookup(script_path, input_paths, params, output_path, enabled=True, root=CACHE_DIR):
+    """Check the cache for ``output_path``, restoring it from the store if possible."""
+    if not enabled:
+        return CacheEntry(root, None, output_path, script_path, input_paths, params, "disabled")
+
+    key = cache_key(script_path, input_paths, params)
+    entry = CacheEntry(root, key, output_path, script_path, input_paths, params, "miss")
+
+    record = read_manifest(root).get(os.path.abspath(output_path))
+    if (
+        record is not None
+        and record["key"] == key
+        and os.path.exists(output_path)
+        and file_digest(output_path) == record["output_sha256"]
+    ):
+        entry.status = "hit"
+        return entry
+
+    object_path = entry._object_path()
+    if os.path.exists(object_path):
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        shutil.copyfile(object_path, output_path)
+        _update_manifest(root, os.path.abspath(output_path), entry._record(file_digest(object_path)))
+        entry.status = "restored"
+
+    return entry
+
+
+def _entry_bytes(path):
+    """Bytes on disk of a cached array set, or of a single file."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evict_arrays(max_bytes=ARRAY_CACHE_BYTES, keep=None, root=CACHE_DIR):
+    """Drop least recently used array sets until the rest fit in ``max_bytes``.
+
+    Recency is each set's mtime, which every hit bumps. ``keep`` is never
+    dropped. Processes still mapping a dropped set keep reading it; the
+    space comes back once they close it. Returns the bytes freed.
+    """
+    arrays_dir = os.path.join(root, "arrays")
+    entries = []
+    for shard in os.listdir(arrays_dir) if os.path.isdir(arrays_dir) else []:
+        shard_dir = os.path.join(arrays_dir, shard)
+        for name in os.listdir(shard_dir):
+            path = os.path.join(shard_dir, name)
+            if ".tmp" in name or path == keep:
+                continue
+            try:
+                entries.append((os.stat(path).st_mtime, _entry_bytes(path), path))
+            except FileNotFoundError:  # dropped by another process meanwhile
+                continue
+    total = sum(size for _, size, _ in entries)
+    if keep is not None and os.path.exists(keep):
+        total += _entry_bytes(keep)
+
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        freed += size
+    return freed
+
+
+def _map_arrays(path):
+    """Each ``.npy`` in an array set, mapped read-only, by name."""
+    import numpy as np
+
+    return {
+        name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+        for name in os.listdir(path)
+        if name.endswith(".npy")
+    }
+
+
+def cached_arrays(name, input_paths, params, build, enabled=True, root=CACHE_DIR):
+    """Arrays derived from ``input_paths``, mapped from ``.npy`` files if cached.
+
+    ``build()`` returns a dict of numeric arrays and runs only on a miss.
+    Unless the cache is disabled, the arrays usually come back as
+    read-only memory maps, hit or miss, so callers must copy before
+    writing. A set evicted by another process before it can be mapped is
+    returned as built instead. The key covers ``name``, ``params`` and
+    the input bytes but not the calling script, so put a version in
+    ``params`` when the derivation changes.
+    """
+    # Imported here so a run that finds everything up to date never loads NumPy
+    import numpy as np
+
+    if not enabled:
+        return build()
+
+    h = hashlib.sha256(name.encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    for path in input_paths:
+        h.update(file_digest(path).encode())
+    key = h.hexdigest()
+    path = os.path.join(root, "arrays", key[:2], key)
+
+    if os.path.isdir(path):
+        try:
+            arrays = _map_arrays(path)
+            os.utime(path)  # most recently used
+            return arrays
+        except FileNotFoundError:  # evicted while being mapped: rebuild it
+            pass
+
+    arrays = build()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    for array_name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{array_name}.npy"), array, allow_pickle=False)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:  # another process stored the same set first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    evict_arrays(keep=path, root=root)
+    try:
+        return _map_arrays(path)
+    except FileNotFoundError:  # evicted by another process in the meantime
+        return arrays
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""Benchmark the asset scripts against a stored baseline.
+
+Each stage runs on deterministic synthetic fixtures shaped like the real
+inputs: a 1024x1024 generated card on a flat background, and a 600x420
+RGBA locomotive with a colorful body and dark wheels. Nothing is
+downloaded and no real assets are read.
+
+Every stage runs in its own subprocess, so its peak RSS is measured
+cleanly. The benchmark records wall time (best of --repeat runs), peak
+RSS and output size, and compares them with the baseline JSON. The run
+exits 1 if any metric is worse than the baseline by more than
+--tolerance. When there is no baseline yet, the results become the
+baseline.
+
+Usage:
+    python3 benchmark-assets.py
+    python3 benchmark-assets.py --stage flood_fill --stage glint_render
+    python3 benchmark-assets.py --tolerance 0.3 --repeat 5
+    python3 benchmark-assets.py --update-baseline
+    python3 benchmark-assets.py --output results.json
+
+The baseline defaults to benchmark-baseline.json next to this script.
+Record it on the machine the comparisons will run on.
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout, redirect_stderr
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from script_support import load_script, peak_rss_kb
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(SCRIPTS_DIR, "benchmark-baseline.json")
+
+# Timings below this many seconds are within scheduler noise, so a stage
+# only regresses on time if it is also slower by more than this.
+TIME_SLACK = 0.005
+RSS_SLACK_KB = 2048
+
+
+# --- Fixtures ---------------------------------------------------------------
+
+
+def make_card_fixture(path):
+    """A 1024x1024 RGB card illustration centered on a flat, slightly noisy background."""
+    rng = np.random.default_rng(1)
+    size = 1024
+    data = np.empty((size, size, 3), dtype=np.int16)
+    data[:] = (236, 232, 224)
+    data += rng.integers(-3, 4, size=data.shape, dtype=np.int16)
+
+    # The card: a dark border around a gradient illustration with texture
+    y0, y1, x0, x1 = 96, 928, 200, 824
+    data[y0:y1, x0:x1] = (60, 40, 30)
+    yy, xx = np.mgrid[y0 + 24 : y1 - 24, x0 + 24 : x1 - 24]
+    data[y0 + 24 : y1 - 24, x0 + 24 : x1 - 24, 0] = 120 + (xx - x0) // 6
+    data[y0 + 24 : y1 - 24, x0 + 24 : x1 - 24, 1] = 60 + (yy - y0) // 8
+    data[y0 + 24 : y1 - 24, x0 + 24 : x1 - 24, 2] = 150 - (xx - x0) // 8
+    data[y0 + 24 : y1 - 24, x0 + 24 : x1 - 24] += rng.integers(
+        -12, 13, size=(y1 - y0 - 48, x1 - x0 - 48, 3), dtype=np.int16
+    )
+
+    img = Image.fromarray(np.clip(data, 0, 255).astype(np.uint8), "RGB")
+    draw = ImageDraw.Draw(img)
+    # Rounded corners let the background reach into the card's bounding box
+    for cx, cy in ((x0, y0), (x1, y0), (x0, y1), (x1, y1)):
+        draw.rectangle((cx - 20, cy - 20, cx + 20, cy + 20), fill=(236, 232, 224))
+    draw.ellipse((400, 300, 620, 520), fill=(250, 210, 60), outline=(30, 20, 10), width=6)
+    img.save(path)
+
+
+def make_locomotive_fixture(path):
+    """A 600x420 RGBA locomotive: saturated body, neutral wheels, soft edges."""
+    width, height = 600, 420
+    scale = 4  # draw large and downsample for anti-aliased alpha edges
+    img = Image.new("RGBA", (width * scale, height * scale), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+
+    def box(x0, y0, x1, y1):
+        return (x0 * scale, y0 * scale, x1 * scale, y1 * scale)
+
+    draw.rounded_rectangle(box(60, 120, 470, 300), radius=30 * scale, fill=(180, 40, 45, 255))
+    draw.rectangle(box(360, 50, 470, 150), fill=(40, 90, 170, 255))  # cab
+    draw.rectangle(box(110, 60, 160, 130), fill=(200, 160, 40, 255))  # smokestack
+    cowcatcher = [(470 * scale, 220 * scale), (470 * scale, 300 * scale), (560 * scale, 300 * scale)]
+    draw.polygon(cowcatcher, fill=(190, 150, 50, 255))
+    for cx in (130, 230, 330, 430):
+        draw.ellipse(box(cx - 45, 270, cx + 45, 360), fill=(45, 42, 40, 255))
+        draw.ellipse(box(cx - 15, 300, cx + 15, 330), fill=(120, 118, 115, 255))
+
+    img = img.resize((width, height), Image.LANCZOS)
+    data = np.array(img)
+    rng = np.random.default_rng(2)
+    opaque = data[:, :, 3] > 0
+    noise = rng.integers(-8, 9, size=(int(opaque.sum()), 3))
+    data[opaque, :3] = np.clip(data[opaque, :3].astype(np.int16) + noise, 0, 255)
+    Image.fromarray(data, "RGBA").save(path)
+
+
+def make_fixtures(fixture_dir):
+    card = os.path.join(fixture_dir, "card.png")
+    locomotive = os.path.join(fixture_dir, "locomotive.png")
+    if not os.path.exists(card):
+        make_card_fixture(card)
+    if not os.path.exists(locomotive):
+        make_locomotive_fixture(locomotive)
+    return {"card": card, "locomotive": locomotive}
+
+
+# --- Stages -------------------------------------------------------------------
+#
+# A stage takes (fixtures, out_dir). It returns a callable that does the
+# timed work and returns the path of the file it wrote (or None). Setup
+# such as imports and decoding happens before the timer starts.
+
+
+def stage_flood_fill(fixtures, out_dir):
+    card = load_script("process-card.py")
+    data = np.array(Image.open(fixtures["card"]).convert("RGB"))
+
+    def run():
+        card.flood_fill_mask(data, tolerance=30)
+
+    return run
+
+
+def stage_process_card(fixtures, out_dir):
+    card = load_script("process-card.py")
+    output = os.path.join(out_dir, "card-out.png")
+
+    def run():
+        card.process_card(fixtures["card"], output, use_cache=False)
+        return output
+
+    return run
+
+
+def stage_process_card_tiled(fixtures, out_dir):
+    card = load_script("process-card.py")
+    output = os.path.join(out_dir, "card-tiled-out.png")
+
+    def run():
+        card.process_card(fixtures["card"], output, use_cache=False, tiled=True)
+        return output
+
+    return run
+
+
+def _locomotive_hsv(shimmer, fixtures):
+    data = np.array(Image.open(fixtures["locomotive"]).convert("RGBA"))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hsv = shimmer.rgb_to_hsv_array(data[:, :, :3])
+    return data, hsv, (hsv[:, :, 1] > 0.15) & (data[:, :, 3] > 128)
+
+
+def stage_shimmer_render(fixtures, out_dir):
+    shimmer = load_script("animate-locomotive.py")
+    data, hsv, saturation_mask = _locomotive_hsv(shimmer, fixtures)
+
+    def run():
+        for _ in shimmer.shimmer_frames(data, hsv, saturation_mask, 48):
+            pass
+
+    return run
+
+
+def stage_glint_render(fixtures, out_dir):
+    glints_script = load_script("animate-locomotive-glints.py")
+    data = np.array(Image.open(fixtures["locomotive"]).convert("RGBA"))
+    rng = np.random.default_rng(3)
+    opaque = np.argwhere(data[:, :, 3] > 128)
+    positions = opaque[rng.integers(0, len(opaque), 32)]
+    glints = [
+        glints_script.Glint(int(x), int(y), i * 2, int(rng.integers(12, 21)), int(rng.integers(35, 61)))
+        for i, (y, x) in enumerate(positions)
+    ]
+
+    def run():
+        for _ in glints_script.glint_frames(data, glints, range(60), progress=False):
+            pass
+
+    return run
+
+
+def stage_glint_positions(fixtures, out_dir):
+    glints_script = load_script("animate-locomotive-glints.py")
+    data = np.array(Image.open(fixtures["locomotive"]).convert("RGBA"))
+
+    def run():
+        eligible = glints_script.glint_eligibility(data)
+        glints_script.find_glint_positions(eligible, data.shape[1], 32, np.random.default_rng(4))
+
+    return run
+
+
+def _script_stage(script, output_name, *args):
+    def stage(fixtures, out_dir):
+        module = load_script(script)
+        output = os.path.join(out_dir, output_name)
+
+        def run():
+            argv = sys.argv
+            sys.argv = [script, fixtures["locomotive"], output, *args, "--no-cache"]
+            try:
+                module.main()
+            finally:
+                sys.argv = argv
+            return output
+
+        return run
+
+    return stage
+
+
+STAGES = {
+    "flood_fill": stage_flood_fill,
+    "process_card": stage_process_card,
+    "process_card_tiled": stage_process_card_tiled,
+    "shimmer_render": stage_shimmer_render,
+    "shimmer_gif": _script_stage("animate-locomotive.py", "shimmer.gif"),
+    "shimmer_palette_gif": _script_stage(
+        "animate-locomotive.py", "shimmer-palette.gif", "--encoding", "palette"
+    ),
+    "glint_positions": stage_glint_positions,
+    "glint_render": stage_glint_render,
+    "glints_gif": _script_stage("animate-locomotive-glints.py", "glints.gif"),
+    "glints_delta_gif": _script_stage(
+        "animate-locomotive-glints.py", "glints-delta.gif", "--encoding", "delta"
+    ),
+}
+
+
+def run_stage_here(name, fixture_dir, repeat):
+    """Run one stage in this process and print its metrics as JSON."""
+    fixtures = make_fixtures(fixture_dir)
+    with tempfile.TemporaryDirectory() as out_dir:
+        run = STAGES[name](fixtures, out_dir)
+        times = []
+        output = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+                output = run()
+            times.append(time.perf_counter() - start)
+        result = {
+            "seconds": min(times),
+            "peak_rss_kb": peak_rss_kb(),
+            "output_bytes": os.path.getsize(output) if output else None,
+        }
+    print(json.dumps(result))
+
+
+def run_stage(name, fixture_dir, repeat):
+    """Run one stage in a fresh interpreter so peak RSS is its own."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-stage", name, fixture_dir, str(repeat)],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"stage {name} failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- Comparison ---------------------------------------------------------------
+
+
+def regressions(name, result, baseline, tolerance):
+    """Describe every metric of ``result`` that is worse than ``baseline``."""
+    found = []
+    checks = [
+        ("seconds", TIME_SLACK, "{:.3f}s"),
+        ("peak_rss_kb", RSS_SLACK_KB, "{:.0f} KB"),
+        ("output_bytes", 0, "{:.0f} B"),
+    ]
+    for metric, slack, fmt in checks:
+        old, new = baseline.get(metric), result.get(metric)
+        if old is None or new is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > slack:
+            found.append(
+                f"{name}: {metric} {fmt.format(old)} -> {fmt.format(new)} "
+                f"(+{(new - old) / old:.0%}, tolerance {tolerance:.0%})"
+            )
+    return found
+
+
+def main():
+    if "--run-stage" in sys.argv:
+        i = sys.argv.index("--run-stage")
+        run_stage_here(sys.argv[i + 1], sys.argv[i + 2], int(sys.argv[i + 3]))
+        return
+
+    baseline_path = DEFAULT_BASELINE
+    tolerance = 0.25
+    repeat = 3
+    output_path = None
+    stages = list(STAGES)
+
+    if "--baseline" in sys.argv:
+        baseline_path = sys.argv[sys.argv.index("--baseline") + 1]
+    if "--tolerance" in sys.argv:
+        tolerance = float(sys.argv[sys.argv.index("--tolerance") + 1])
+    if "--repeat" in sys.argv:
+        repeat = int(sys.argv[sys.argv.index("--repeat") + 1])
+    if "--output" in sys.argv:
+        output_path = sys.argv[sys.argv.index("--output") + 1]
+    if "--stage" in sys.argv:
+        stages = [sys.argv[i + 1] for i, arg in enumerate(sys.argv) if arg == "--stage"]
+        unknown = [name for name in stages if name not in STAGES]
+        if unknown:
+            print(f"Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(STAGES)}")
+            sys.exit(1)
+
+    try:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        make_fixtures(fixture_dir)
+        print(f"{'stage':<22}{'time':>10}{'peak RSS':>12}{'output':>12}")
+        for name in stages:
+            result = run_stage(name, fixture_dir, repeat)
+            results[name] = result
+            size = f"{result['output_bytes'] / 1024:.0f} KB" if result["output_bytes"] else "-"
+            print(f"{name:<22}{result['seconds']:>9.3f}s{result['peak_rss_kb'] / 1024:>9.0f} MB{size:>12}")
+
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if "--update-baseline" in sys.argv or not baseline:
+        baseline.update(results)
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {baseline_path}")
+        return
+
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: no baseline entry, skipped (run with --update-baseline to add it)")
+            continue
+        failures += regressions(name, result, baseline[name], tolerance)
+
+    if failures:
+        print(f"\n{len(failures)} regression(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nNo regressions beyond {tolerance:.0%} of {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
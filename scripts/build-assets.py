@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Rebuild the app's art assets in one process, from raw art to final files.
+
+By hand, each step is its own script: process-card.py writes
+locomotive.png, the animator decodes it again, and every run pays for
+interpreter startup and the PIL and NumPy imports. This runs the same
+steps as one graph of stages that hand each other images in memory:
+
+    raw card art --card--> cards/<name>.png
+                    \\--animation--> cards/locomotive.gif   (locomotive only)
+    raw app icon --icons--> icon.png, adaptive-icon.png, splash-icon.png, favicon.png
+
+Usage:
+    python3 build-assets.py --cards raw/ --icon raw/app-icon.png
+    python3 build-assets.py --cards "raw/locomotive*.png" --format webp
+    python3 build-assets.py --cards raw/ --fuzz-config fuzz.json --jobs 2
+    python3 build-assets.py --cards raw/ --icon raw/app-icon.png --dry-run
+
+--cards is a directory or glob of raw card PNGs and --icon the raw app
+icon; either may be left out. Outputs go under --assets (../app/assets
+by default), with the cards in its cards/ directory. --fuzz and
+--fuzz-config are as in process-card.py; the animation is
+animate-locomotive-glints.py at its defaults, written as --format
+gif|webp|webp-lossless|apng. GIFs use its --encoding delta, the only
+one within check-assets.py's animation budget.
+
+Each output is cached (see asset_cache.py) on its raw source, the
+parameters and the source of every script along its path through the
+graph, along with every module from this directory those scripts import;
+--no-cache rebuilds everything. A stage runs when one of its
+outputs is stale or a stage after it needs its image, and encodes only
+its stale outputs, so a full rebuild encodes each file exactly once and
+a stale animation re-derives the card in memory rather than decoding the
+written PNG. PIL, NumPy and the stage scripts are imported only
+once something has to be built, so --help, --dry-run and up-to-date runs
+start instantly.
+
+Stages whose inputs are ready run concurrently in --jobs threads (one per
+CPU by default); the heavy NumPy and Pillow calls release the GIL. Each
+stage's output is printed as a block when it finishes.
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import asset_cache
+from script_support import collect_inputs, fuzz_for, load_fuzz_overrides, load_script
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ASSETS_DIR = os.path.normpath(os.path.join(SCRIPTS_DIR, "..", "app", "assets"))
+
+CARD_SCRIPT = "process-card.py"
+ANIMATION_SCRIPT = "animate-locomotive-glints.py"
+ICON_SCRIPT = "generate-icons.py"
+
+# The one card that is also animated
+ANIMATED_CARD = "locomotive"
+ANIMATION_FORMATS = {"gif": ".gif", "webp": ".webp", "webp-lossless": ".webp", "apng": ".apng"}
+
+# Same as generate-icons.TARGETS, which cannot be read without importing PIL
+ICON_FILES = ("icon.png", "adaptive-icon.png", "splash-icon.png", "favicon.png")
+
+
+class Stage:
+    """One node of the graph.
+
+    ``run(modules, inputs, write)`` gets the imported scripts, the values
+    of the stages in ``needs`` and the stale outputs to encode (empty when
+    only the value is needed), and returns the stage's own value (an
+    image) for the stages after it.
+    """
+
+    def __init__(self, name, script, sources, params, outputs, run, needs=()):
+        self.name = name
+        self.script = script
+        self.sources = list(sources)
+        self.params = params
+        self.outputs = list(outputs)
+        self.run = run
+        self.needs = list(needs)
+        self.entries = []
+        self.stale = False
+        self.needed = False
+
+    def scripts(self):
+        """Every script along this stage's path through the graph."""
+        names = {self.script}
+        for stage in self.needs:
+            names |= stage.scripts()
+        return names
+
+    def key_sources(self):
+        sources = list(self.sources)
+        for stage in self.needs:
+            sources += [path for path in stage.key_sources() if path not in sources]
+        return sources
+
+    def key_params(self):
+        return {
+            "stage": self.name,
+            "params": self.params,
+            "upstream": [stage.key_params() for stage in self.needs],
+        }
+
+
+# --- Stage bodies ---------------------------------------------------------------
+
+
+def _card(input_path, output_path, fuzz):
+    def run(modules, inputs, write):
+        card = modules[CARD_SCRIPT]
+        img = card.card_image(input_path, fuzz=fuzz)
+        if write:
+            card.save_card(img, output_path)
+        return img
+    return run
+
+
+def _animation(card_stage, output_path, output_format, encoding):
+    def run(modules, inputs, write):
+        import numpy as np
+
+        data = np.array(inputs[card_stage].convert("RGBA"))
+        modules[ANIMATION_SCRIPT].animate(data, output_path, encoding=encoding, output_format=output_format)
+    return run
+
+
+def _icons(input_path, output_dir, bg_color, padding_pct):
+    def run(modules, inputs, write):
+        from PIL import Image
+
+        icons = modules[ICON_SCRIPT]
+        with Image.open(input_path) as img:
+            canvas = icons.build_canvas(img.convert("RGB"), bg_color, padding_pct)
+        icons.generate_icons(canvas, output_dir, only={os.path.basename(path) for path in write})
+    return run
+
+
+def build_graph(cards, icon, assets_dir, fuzz=30, overrides=None, output_format="gif"):
+    """The stages for raw ``cards`` and an ``icon`` (either may be empty)."""
+    overrides = overrides or {}
+    stages = []
+    cards_dir = os.path.join(assets_dir, "cards")
+    for path in cards:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        card_fuzz = fuzz_for(path, fuzz, overrides)
+        output = os.path.join(cards_dir, f"{stem}.png")
+        card = Stage(
+            f"card:{stem}", CARD_SCRIPT, [path], {"fuzz": card_fuzz, "optimize": "lossless"},
+            [output], _card(path, output, card_fuzz),
+        )
+        stages.append(card)
+        if stem == ANIMATED_CARD:
+            output = os.path.join(cards_dir, stem + ANIMATION_FORMATS[output_format])
+            encoding = "delta" if output_format == "gif" else "adaptive"
+            stages.append(Stage(
+                f"animation:{stem}", ANIMATION_SCRIPT, [], {"format": output_format, "encoding": encoding},
+                [output], _animation(card, output, output_format, encoding), needs=[card],
+            ))
+    if icon:
+        bg_color, padding_pct = (45, 38, 34), 5  # generate-icons.py defaults
+        stages.append(Stage(
+            "icons", ICON_SCRIPT, [icon], {"bg_color": list(bg_color), "padding": padding_pct},
+            [os.path.join(assets_dir, name) for name in ICON_FILES],
+            _icons(icon, assets_dir, bg_color, padding_pct),
+        ))
+    return stages
+
+
+# --- Planning and running -----------------------------------------------------
+
+
+def plan(stages, use_cache=True):
+    """Mark each stage stale and/or needed from the cache state of its outputs."""
+    digests = {}
+    for stage in stages:
+        paths = set()
+        for script in stage.scripts():
+            paths.update(asset_cache.local_imports(os.path.join(SCRIPTS_DIR, script)))
+        scripts = {}
+        for path in sorted(paths):
+            if path not in digests:
+                digests[path] = asset_cache.file_digest(path)
+            scripts[os.path.basename(path)] = digests[path]
+        params = {**stage.key_params(), "scripts": scripts}
+        stage.entries = [
+            asset_cache.lookup(__file__, stage.key_sources(), params, output, enabled=use_cache)
+            for output in stage.outputs
+        ]
+        stage.stale = not all(entry.fresh for entry in stage.entries)
+
+    # A stage feeding a stale stage has to run even when its own outputs are fresh
+    for stage in reversed(stages):
+        stage.needed = stage.needed or stage.stale
+        if stage.needed:
+            for upstream in stage.needs:
+                upstream.needed = True
+
+
+class _StageOutput:
+    """A sys.stdout stand-in that keeps each stage thread's prints apart."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self, buffer):
+        self.local.buffer = buffer
+
+    def write(self, text):
+        buffer = getattr(self.local, "buffer", None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _run_stage(output, stage, modules, inputs):
+    log = io.StringIO()
+    output.capture(log)
+    start = time.perf_counter()
+    try:
+        write = [entry.output_path for entry in stage.entries if not entry.fresh]
+        for path in write:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        value = stage.run(modules, inputs, write)
+        for entry in stage.entries:
+            if not entry.fresh:
+                entry.store()
+        return value, log.getvalue(), time.perf_counter() - start
+    finally:
+        output.capture(None)
+
+
+def run(stages, jobs=None):
+    """Run the needed stages, each as soon as its inputs are ready.
+
+    Returns the names of the stages that failed, and those skipped
+    because a stage before them failed.
+    """
+    needed = [stage for stage in stages if stage.needed]
+    modules = {name: load_script(name) for name in sorted({stage.script for stage in needed})}
+
+    values, failed = {}, []
+    pending = list(needed)
+    output = _StageOutput(sys.stdout)
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            running = {}
+            while pending or running:
+                for stage in list(pending):
+                    if any(upstream.name in failed for upstream in stage.needs):
+                        failed.append(stage.name)
+                        pending.remove(stage)
+                        output.stream.write(f"{stage.name}: skipped\n")
+                    elif all(upstream in values for upstream in stage.needs):
+                        inputs = {upstream: values[upstream] for upstream in stage.needs}
+                        running[pool.submit(_run_stage, output, stage, modules, inputs)] = stage
+                        pending.remove(stage)
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        values[stage], log, seconds = future.result()
+                    except Exception as e:
+                        failed.append(stage.name)
+                        output.stream.write(f"{stage.name}: FAILED: {type(e).__name__}: {e}\n")
+                        continue
+                    action = "built" if stage.stale else "derived in memory"
+                    output.stream.write(f"{stage.name}: {action} in {seconds:.2f}s\n")
+                    for line in log.splitlines():
+                        output.stream.write(f"  {line}\n")
+                    # Drop images nothing still waiting will read
+                    for upstream in stage.needs:
+                        if not any(upstream in other.needs for other in pending + list(running.values())):
+                            values[upstream] = None
+    finally:
+        sys.stdout = output.stream
+    return failed
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv or not ({"--cards", "--icon"} & set(sys.argv)):
+        print("Usage: python3 build-assets.py [--cards INPUT_DIR_OR_GLOB] [--icon icon.png] [--assets DIR]"
+              " [--fuzz N] [--fuzz-config fuzz.json] [--format gif|webp|webp-lossless|apng]"
+              " [--jobs N] [--no-cache] [--dry-run]")
+        sys.exit(1)
+
+    cards, icon = [], None
+    assets_dir = DEFAULT_ASSETS_DIR
+    fuzz = 30
+    overrides = {}
+    output_format = "gif"
+    jobs = None
+
+    if "--cards" in sys.argv:
+        source = sys.argv[sys.argv.index("--cards") + 1]
+        cards = collect_inputs(source)
+        if not cards:
+            print(f"No PNG files found for: {source}")
+            sys.exit(1)
+    if "--icon" in sys.argv:
+        icon = sys.argv[sys.argv.index("--icon") + 1]
+    if "--assets" in sys.argv:
+        assets_dir = sys.argv[sys.argv.index("--assets") + 1]
+    if "--fuzz" in sys.argv:
+        fuzz = int(sys.argv[sys.argv.index("--fuzz") + 1])
+    if "--fuzz-config" in sys.argv:
+        overrides = load_fuzz_overrides(sys.argv[sys.argv.index("--fuzz-config") + 1])
+    if "--format" in sys.argv:
+        output_format = sys.argv[sys.argv.index("--format") + 1]
+    if "--jobs" in sys.argv:
+        jobs = int(sys.argv[sys.argv.index("--jobs") + 1])
+
+    if output_format not in ANIMATION_FORMATS:
+        print(f"Unknown format: {output_format}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    stages = build_graph(cards, icon, assets_dir, fuzz, overrides, output_format)
+    plan(stages, use_cache="--no-cache" not in sys.argv)
+    for stage in stages:
+        if stage.stale:
+            print(f"{stage.name}: stale -> {', '.join(stage.outputs)}")
+        elif stage.needed:
+            print(f"{stage.name}: up to date, rebuilt in memory for the stages after it")
+    to_run = [stage for stage in stages if stage.needed]
+    if not to_run:
+        print(f"Up to date: {len(stages)} stages")
+        return
+    if "--dry-run" in sys.argv:
+        return
+
+    failed = run(stages, jobs)
+    print(f"Done in {time.perf_counter() - start:.2f}s: {len(to_run) - len(failed)} stages run,"
+          f" {len(failed)} failed")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Pack the processed card images into one trimmed texture atlas.
+
+Each card is trimmed to the same non-transparent bounds crop_to_content
+in process-card.py finds, and the trimmed cards are packed into shelves
+with a transparent gutter between them. The packing is deterministic:
+cards are placed tallest first (ties by name), and of every shelf width
+that fits a whole number of the widest cards, the one giving the
+smallest atlas with no side over 2048 px (--max-size) wins.
+
+Next to the atlas it writes a JSON manifest with, for every card, its
+rectangle in the atlas, where that rectangle sat in the original image
+and the original size, so the full card can be laid out from the atlas:
+
+    {"size": {"w": 1690, "h": 724},
+     "frames": {"red": {"x": 0, "y": 499, "w": 562, "h": 225,
+                        "offset_x": 19, "offset_y": 97,
+                        "source_w": 600, "source_h": 420}, ...}}
+
+Pass --ts to also write the manifest as a TypeScript module for the app.
+
+The atlas is written through png_optimize.py like the cards, losslessly
+unless --lossy lets it take a posterized encoding that passes the error
+guard (about 1.6x smaller for the current cards).
+
+Usage:
+    python3 build-card-atlas.py ../app/assets/cards ../app/assets/card-atlas.png
+    python3 build-card-atlas.py ../app/assets/cards atlas.png --ts ../app/src/cardAtlas.ts --padding 2
+
+Outputs are cached on the card files and options (see asset_cache.py);
+pass --no-cache to always rebuild. --profile out.json [--cprofile] records
+per-stage time and memory (see profiling.py).
+"""
+
+import glob
+import json
+import os
+import sys
+from PIL import Image
+
+import asset_cache
+import png_optimize
+import profiling
+
+# Largest texture side every device the app targets can load
+MAX_SIZE = 2048
+
+
+def load_cards(paths):
+    """Decode each card PNG as RGBA, keyed by file stem."""
+    cards = {}
+    for path in paths:
+        img = Image.open(path).convert("RGBA")
+        cards[os.path.splitext(os.path.basename(path))[0]] = (path, img)
+    return cards
+
+
+def trim(img):
+    """(trimmed image, (left, top)) -- the fully transparent border removed."""
+    bbox = img.getbbox()
+    if bbox is None:
+        bbox = (0, 0, 1, 1)  # keep an empty card addressable
+    return img.crop(bbox), bbox[:2]
+
+
+def shelf_pack(sizes, width, padding):
+    """Place ``sizes`` (name -> (w, h)) left to right in shelves ``width`` wide.
+
+    Returns (positions, atlas width, atlas height); ``padding`` px of gutter
+    separate neighbors but not the atlas edge.
+    """
+    order = sorted(sizes, key=lambda name: (-sizes[name][1], name))
+    positions = {}
+    x = y = shelf_h = used_w = 0
+    for name in order:
+        w, h = sizes[name]
+        if x and x + w > width:
+            x, y, shelf_h = 0, y + shelf_h + padding, 0
+        positions[name] = (x, y)
+        used_w = max(used_w, x + w)
+        shelf_h = max(shelf_h, h)
+        x += w + padding
+    return positions, used_w, y + shelf_h
+
+
+def best_packing(sizes, padding, max_size=MAX_SIZE):
+    """Try a shelf width for every count of cards per shelf; keep the smallest.
+
+    Packings with a side over ``max_size`` are skipped. Ties go to the
+    squarer atlas, then the narrower one.
+    """
+    widths = sorted((w for w, _ in sizes.values()), reverse=True)
+    best = None
+    for per_shelf in range(1, len(widths) + 1):
+        width = sum(widths[:per_shelf]) + padding * (per_shelf - 1)
+        positions, atlas_w, atlas_h = shelf_pack(sizes, width, padding)
+        if max(atlas_w, atlas_h) > max_size:
+            continue
+        rank = (atlas_w * atlas_h, max(atlas_w, atlas_h), atlas_w)
+        if best is None or rank < best[0]:
+            best = (rank, positions, atlas_w, atlas_h)
+    if best is None:
+        raise ValueError(f"cards do not fit in a {max_size}x{max_size} atlas")
+    return best[1:]
+
+
+def build_atlas(cards, padding=2, max_size=MAX_SIZE):
+    """Trim and pack ``cards`` (stem -> (path, image)); returns (atlas, manifest)."""
+    with profiling.stage("trim"):
+        trimmed = {name: trim(img) for name, (_, img) in cards.items()}
+    sizes = {name: crop.size for name, (crop, _) in trimmed.items()}
+
+    with profiling.stage("pack"):
+        positions, atlas_w, atlas_h = best_packing(sizes, padding, max_size)
+
+    with profiling.stage("compose"):
+        atlas = Image.new("RGBA", (atlas_w, atlas_h), (0, 0, 0, 0))
+        frames = {}
+        for name in sorted(positions):
+            crop, (left, top) = trimmed[name]
+            x, y = positions[name]
+            atlas.paste(crop, (x, y))
+            source_w, source_h = cards[name][1].size
+            frames[name] = {
+                "x": x, "y": y, "w": crop.width, "h": crop.height,
+                "offset_x": left, "offset_y": top,
+                "source_w": source_w, "source_h": source_h,
+            }
+    return atlas, {"size": {"w": atlas_w, "h": atlas_h}, "frames": frames}
+
+
+def manifest_ts(manifest, atlas_path, ts_path):
+    """The manifest as a TypeScript module that also ``require``s the atlas."""
+    atlas_rel = os.path.relpath(atlas_path, os.path.dirname(os.path.abspath(ts_path)))
+    atlas_rel = atlas_rel.replace(os.sep, "/")
+    if not atlas_rel.startswith("."):
+        atlas_rel = "./" + atlas_rel
+
+    lines = [
+        "// Generated by scripts/build-card-atlas.py -- do not edit by hand.",
+        "import { ImageSourcePropType } from 'react-native';",
+        "",
+        "export interface AtlasFrame {",
+        "  x: number;",
+        "  y: number;",
+        "  w: number;",
+        "  h: number;",
+        "  offset_x: number;",
+        "  offset_y: number;",
+        "  source_w: number;",
+        "  source_h: number;",
+        "}",
+        "",
+        f"export const CARD_ATLAS: ImageSourcePropType = require('{atlas_rel}');",
+        "",
+        f"export const CARD_ATLAS_SIZE = {{ w: {manifest['size']['w']}, h: {manifest['size']['h']} }};",
+        "",
+        "export const CARD_ATLAS_FRAMES: Record<string, AtlasFrame> = {",
+    ]
+    for name, frame in manifest["frames"].items():
+        fields = ", ".join(f"{key}: {value}" for key, value in frame.items())
+        lines.append(f"  {json.dumps(name)}: {{ {fields} }},")
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+def report_savings(cards, manifest, atlas_path):
+    """Print the atlas's area and size against the individual files."""
+    source_area = sum(img.width * img.height for _, img in cards.values())
+    trimmed_area = sum(f["w"] * f["h"] for f in manifest["frames"].values())
+    atlas_area = manifest["size"]["w"] * manifest["size"]["h"]
+    source_bytes = sum(os.path.getsize(path) for path, _ in cards.values())
+    atlas_bytes = os.path.getsize(atlas_path)
+
+    print(f"  {len(cards)} cards: {source_area:,} px in {source_bytes / 1024:.0f} KB")
+    print(f"  Trimmed: {trimmed_area:,} px ({trimmed_area / source_area:.0%})")
+    print(
+        f"  Atlas {manifest['size']['w']}x{manifest['size']['h']}: {atlas_area:,} px"
+        f" ({1 - atlas_area / source_area:.0%} smaller, {atlas_area - trimmed_area:,} px"
+        f" gutter/slack) in {atlas_bytes / 1024:.0f} KB"
+    )
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 build-card-atlas.py CARDS_DIR atlas.png [--manifest atlas.json] [--ts cardAtlas.ts] [--padding N] [--max-size PX] [--lossy] [--no-cache] [--profile out.json [--cprofile]]")
+        sys.exit(1)
+
+    input_dir = sys.argv[1]
+    atlas_path = sys.argv[2]
+    manifest_path = os.path.splitext(atlas_path)[0] + ".json"
+    ts_path = None
+    padding = 2  # transparent gutter so filtering never samples a neighbor
+    max_size = MAX_SIZE
+    lossless = "--lossy" not in sys.argv
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+    if "--manifest" in sys.argv:
+        manifest_path = sys.argv[sys.argv.index("--manifest") + 1]
+    if "--ts" in sys.argv:
+        ts_path = sys.argv[sys.argv.index("--ts") + 1]
+    if "--padding" in sys.argv:
+        padding = int(sys.argv[sys.argv.index("--padding") + 1])
+    if "--max-size" in sys.argv:
+        max_size = int(sys.argv[sys.argv.index("--max-size") + 1])
+
+    outputs = [atlas_path, manifest_path] + ([ts_path] if ts_path else [])
+    output_abs = {os.path.abspath(path) for path in outputs}
+    inputs = [
+        path for path in sorted(glob.glob(os.path.join(input_dir, "*.png")))
+        if os.path.abspath(path) not in output_abs
+    ]
+    if not inputs:
+        print(f"No PNG files found in: {input_dir}")
+        sys.exit(1)
+
+    entries = []
+    with profiling.stage("cache"):
+        for output_path in outputs:
+            params = {
+                "padding": padding,
+                "max_size": max_size,
+                "output": os.path.basename(output_path),
+                "lossless": lossless,
+                # Card names come from the file names, not their bytes
+                "cards": sorted(os.path.basename(path) for path in inputs),
+            }
+            if output_path == ts_path:
+                params["atlas"] = os.path.relpath(atlas_path, os.path.dirname(os.path.abspath(ts_path)))
+            entries.append(asset_cache.lookup(
+                __file__, inputs, params, output_path, enabled="--no-cache" not in sys.argv
+            ))
+    if all(entry.fresh for entry in entries):
+        print(f"Up to date: {', '.join(outputs)}")
+        return
+
+    with profiling.stage("decode"):
+        cards = load_cards(inputs)
+    print(f"Packing {len(cards)} cards from {input_dir}")
+
+    atlas, manifest = build_atlas(cards, padding, max_size)
+
+    with profiling.stage("save"):
+        for path in outputs:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        report = png_optimize.save_optimized(atlas, atlas_path, lossless=lossless)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+            f.write("\n")
+        if ts_path:
+            with open(ts_path, "w") as f:
+                f.write(manifest_ts(manifest, atlas_path, ts_path))
+    print(f"Saved: {', '.join(outputs)}")
+    print(f"  Optimized ({report['candidate']}, max error {report['max_error']},"
+          f" band error {report['band_error']}, mean error {report['mean_error']})")
+    report_savings(cards, manifest, atlas_path)
+
+    with profiling.stage("cache"):
+        for entry in entries:
+            entry.store()
+
+
+if __name__ == "__main__":
+    main()
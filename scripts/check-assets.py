@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Check the shipped card and icon assets against the art-direction criteria.
+
+Scans every file in app/assets/cards/ and the app icons in app/assets/,
+and flags:
+
+- haze: semi-transparent pixels that are not part of an anti-aliased
+  edge, i.e. not within ``EDGE_WIDTH`` px of both an opaque and a fully
+  transparent pixel. Fog left around the car, or a light body that
+  remove_background made see-through, shows up here. Fails above
+  ``MAX_HAZE`` of the visible pixels.
+- halo: light pixels on the outer edge of the art, left over from the
+  light background the art was generated on. The cards all have dark
+  outlines, so any light edge is background. Fails above ``MAX_HALO`` of
+  the edge, weighted by alpha.
+- fill: how much of process-card.py's target box (the canvas less a 3%
+  margin on each side) the art spans on its longer axis, and whether it
+  is centered. Fails below ``MIN_FILL``, past the margin, or more than
+  ``CENTER_TOLERANCE`` px off center.
+- alpha: a GIF has one-bit transparency, so every frame must decode to
+  alpha of only 0 or 255, and the transparent area must match its card
+  PNG thresholded the way the animators do (alpha > 128).
+- budgets: file size and decoded size (RGBA, every frame) per kind of
+  asset; see ``BUDGETS``.
+
+Files in subdirectories (like cards/old/) are not bundled by the app and
+are skipped. Identical files (the three 1024 px icons) are decoded once.
+
+Usage:
+    python3 check-assets.py
+    python3 check-assets.py --assets ../app/assets --json report.json
+    python3 check-assets.py ../app/assets/cards/red.png
+
+Exits 1 if any asset fails a check. The whole set takes about half a
+second, most of it decoding the GIF's frames, so it can run from a
+pre-commit hook.
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ASSETS_DIR = os.path.normpath(os.path.join(SCRIPTS_DIR, "..", "app", "assets"))
+
+KIB = 1024
+MIB = 1024 * KIB
+
+# (pattern relative to the assets dir, kind, max file bytes, max decoded bytes, size)
+BUDGETS = [
+    ("cards/*.png", "card", 256 * KIB, 1 * MIB, (600, 420)),
+    # The delta-rectangle glint GIF is about 260 KiB; a full frame per step is ~1.8 MiB
+    ("cards/*.gif", "animation", 512 * KIB, 64 * MIB, (600, 420)),
+    ("cards/*.webp", "animation", 2 * MIB, 64 * MIB, (600, 420)),
+    ("cards/*.apng", "animation", 2 * MIB, 64 * MIB, (600, 420)),
+    ("favicon.png", "icon", 16 * KIB, 16 * KIB, (48, 48)),
+    ("*icon.png", "icon", 1 * MIB, 4 * MIB, (1024, 1024)),
+]
+
+# Mirrors process-card.fit_to_canvas and crop_to_content
+CANVAS_MARGIN = 0.03
+CROP_PADDING = 2
+
+EDGE_WIDTH = 3
+MAX_HAZE = 0.03
+HALO_LUMINANCE = 180
+MAX_HALO = 0.005
+MIN_FILL = 0.95
+CENTER_TOLERANCE = 4
+
+# Matches the animators' GIF alpha threshold
+GIF_ALPHA_THRESHOLD = 128
+MAX_GIF_ALPHA_MISMATCH = 0.02
+
+
+def budget_for(relpath):
+    for pattern, kind, max_bytes, max_decoded, size in BUDGETS:
+        if fnmatch.fnmatch(relpath, pattern):
+            return kind, max_bytes, max_decoded, size
+    return None
+
+
+def _grow(mask, steps):
+    """``mask`` grown by ``steps`` pixels in the four directions."""
+    out = mask.copy()
+    for _ in range(steps):
+        grown = out.copy()
+        grown[1:] |= out[:-1]
+        grown[:-1] |= out[1:]
+        grown[:, 1:] |= out[:, :-1]
+        grown[:, :-1] |= out[:, 1:]
+        out = grown
+    return out
+
+
+def haze_fraction(alpha):
+    """Share of visible pixels that are semi-transparent away from an edge."""
+    visible = alpha > 0
+    semi = visible & (alpha < 255)
+    edge = _grow(alpha == 255, EDGE_WIDTH) & _grow(~visible, EDGE_WIDTH)
+    return float((semi & ~edge).sum() / max(int(visible.sum()), 1))
+
+
+def halo_fraction(data):
+    """Alpha-weighted share of the outer edge that is light enough to be background."""
+    alpha = data[..., 3]
+    ring = (alpha > 0) & _grow(alpha == 0, 1)
+    if not ring.any():
+        return 0.0
+    rgb = data[ring][:, :3].astype(np.float32)
+    luminance = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    weight = data[ring][:, 3].astype(np.float32) / 255
+    return float(weight[luminance > HALO_LUMINANCE].sum() / ring.sum())
+
+
+def fill(alpha):
+    """(share of the target box spanned, px off center) of the visible art."""
+    rows = np.flatnonzero((alpha > 0).any(axis=1))
+    cols = np.flatnonzero((alpha > 0).any(axis=0))
+    if rows.size == 0:
+        return 0.0, 0
+    height, width = alpha.shape
+    target_w = int(width * (1 - 2 * CANVAS_MARGIN))
+    target_h = int(height * (1 - 2 * CANVAS_MARGIN))
+    # The crop's padding is part of what fit_to_canvas scales into the box
+    span_w = cols[-1] + 1 - cols[0] + 2 * CROP_PADDING
+    span_h = rows[-1] + 1 - rows[0] + 2 * CROP_PADDING
+    off_x = abs(int(cols[0]) - (width - 1 - int(cols[-1])))
+    off_y = abs(int(rows[0]) - (height - 1 - int(rows[-1])))
+    return float(max(span_w / target_w, span_h / target_h)), max(off_x, off_y) // 2
+
+
+def animation_frames(img):
+    """Each frame of an opened animation as an RGBA array."""
+    for i in range(getattr(img, "n_frames", 1)):
+        img.seek(i)
+        yield np.asarray(img if img.mode == "RGBA" else img.convert("RGBA"))
+
+
+def check_card(data, result, problems):
+    metrics = result["metrics"]
+    metrics["haze"] = round(haze_fraction(data[..., 3]), 4)
+    metrics["halo"] = round(halo_fraction(data), 4)
+    metrics["fill"], metrics["off_center_px"] = fill(data[..., 3])
+    metrics["fill"] = round(metrics["fill"], 3)
+
+    if metrics["haze"] > MAX_HAZE:
+        problems.append(f"haze: {metrics['haze']:.1%} of visible pixels are translucent away from an edge")
+    if metrics["halo"] > MAX_HALO:
+        problems.append(f"halo: {metrics['halo']:.1%} of the edge is light background")
+    if metrics["fill"] < MIN_FILL:
+        problems.append(f"fill: art spans {metrics['fill']:.0%} of the target box")
+    elif metrics["fill"] > 1.01:
+        problems.append(f"fill: art runs {metrics['fill'] - 1:.1%} into the {CANVAS_MARGIN:.0%} margin")
+    if metrics["off_center_px"] > CENTER_TOLERANCE:
+        problems.append(f"fill: art is {metrics['off_center_px']} px off center")
+
+
+def check_animation(img, path, result, problems):
+    """Decode every frame; GIFs must have binary alpha matching their card PNG."""
+    is_gif = img.format == "GIF"
+    reference = None
+    card_path = os.path.splitext(path)[0] + ".png"
+    if is_gif and os.path.exists(card_path):
+        with Image.open(card_path) as card:
+            reference = np.asarray(card.convert("RGBA"))[..., 3] > GIF_ALPHA_THRESHOLD
+
+    frames = 0
+    soft_frames = 0
+    worst_mismatch = 0.0
+    for frame in animation_frames(img):
+        frames += 1
+        alpha = frame[..., 3]
+        # alpha + 1 wraps 255 to 0, so only 1..254 end up above 1
+        if is_gif and ((alpha + np.uint8(1)) > 1).any():
+            soft_frames += 1
+        if reference is not None and alpha.shape == reference.shape:
+            mismatch = ((alpha > GIF_ALPHA_THRESHOLD) != reference).sum() / max(int(reference.sum()), 1)
+            worst_mismatch = max(worst_mismatch, float(mismatch))
+
+    result["frames"] = frames
+    if is_gif:
+        result["metrics"]["alpha_mismatch"] = round(worst_mismatch, 4)
+        if soft_frames:
+            problems.append(f"alpha: {soft_frames} frames have alpha other than 0 and 255")
+        if reference is not None and worst_mismatch > MAX_GIF_ALPHA_MISMATCH:
+            problems.append(f"alpha: transparency differs from {os.path.basename(card_path)}"
+                            f" by up to {worst_mismatch:.1%}")
+    return frames
+
+
+def check_file(path, relpath, checked):
+    """The result dict for one asset; ``checked`` holds results by file digest."""
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    result = {"path": relpath, "bytes": os.path.getsize(path), "metrics": {}, "problems": []}
+    budget = budget_for(relpath)
+    if budget is None:
+        result["problems"].append("not a known kind of asset")
+        return result
+    kind, max_bytes, max_decoded, size = budget
+    result["kind"] = kind
+
+    if digest in checked:
+        for key in ("size", "frames", "decoded_bytes", "metrics"):
+            result[key] = checked[digest][key]
+        result["problems"] = [p for p in checked[digest]["problems"] if not p.startswith(("size", "bytes"))]
+    else:
+        problems = result["problems"]
+        with Image.open(path) as img:
+            result["size"] = list(img.size)
+            if kind == "animation":
+                frames = check_animation(img, path, result, problems)
+            else:
+                frames = 1
+                if kind == "card":
+                    check_card(np.asarray(img.convert("RGBA")), result, problems)
+        result["frames"] = frames
+        result["decoded_bytes"] = result["size"][0] * result["size"][1] * 4 * frames
+        if result["decoded_bytes"] > max_decoded:
+            problems.append(f"memory: decodes to {result['decoded_bytes'] / MIB:.1f} MiB"
+                            f" (budget {max_decoded / MIB:.1f} MiB)")
+        checked[digest] = result
+
+    if tuple(result["size"]) != size:
+        result["problems"].append(f"size: {result['size'][0]}x{result['size'][1]}, expected {size[0]}x{size[1]}")
+    if result["bytes"] > max_bytes:
+        result["problems"].append(f"bytes: {result['bytes'] / KIB:.0f} KiB (budget {max_bytes / KIB:.0f} KiB)")
+    return result
+
+
+def collect_assets(assets_dir):
+    """(path, path relative to ``assets_dir``) of every shipped card and icon."""
+    cards_dir = os.path.join(assets_dir, "cards")
+    paths = [os.path.join(cards_dir, name) for name in sorted(os.listdir(cards_dir))]
+    paths += [os.path.join(assets_dir, name) for name in sorted(os.listdir(assets_dir))
+              if fnmatch.fnmatch(name, "*icon.png") or name == "favicon.png"]
+    return [(p, os.path.relpath(p, assets_dir).replace(os.sep, "/")) for p in paths if os.path.isfile(p)]
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print("Usage: python3 check-assets.py [--assets DIR] [--json report.json] [FILE ...]")
+        sys.exit(1)
+
+    assets_dir = DEFAULT_ASSETS_DIR
+    json_path = None
+    args = sys.argv[1:]
+    if "--assets" in args:
+        idx = args.index("--assets")
+        assets_dir = args[idx + 1]
+        del args[idx:idx + 2]
+    if "--json" in args:
+        idx = args.index("--json")
+        json_path = args[idx + 1]
+        del args[idx:idx + 2]
+
+    start = time.perf_counter()
+    if args:
+        # Files named directly are matched against BUDGETS by their place under --assets
+        assets = [(p, os.path.relpath(os.path.abspath(p), os.path.abspath(assets_dir)).replace(os.sep, "/"))
+                  for p in args]
+    else:
+        assets = collect_assets(assets_dir)
+
+    checked = {}
+    results = [check_file(path, relpath, checked) for path, relpath in assets]
+    seconds = time.perf_counter() - start
+
+    for result in results:
+        metrics = " ".join(f"{key}={value}" for key, value in result["metrics"].items())
+        status = "FAIL" if result["problems"] else "ok"
+        print(f"{status:<5}{result['path']:<28}{result['bytes'] / KIB:>8.0f} KiB  {metrics}")
+        for problem in result["problems"]:
+            print(f"       {problem}")
+
+    failed = sum(1 for result in results if result["problems"])
+    print(f"\n{len(results)} assets checked in {seconds * 1000:.0f} ms, {failed} failed")
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"seconds": seconds, "assets": results}, f, indent=2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Merge runs of identical-looking animation frames into longer ones.
+
+The animators render a frame per step at a fixed duration, but many steps
+show nothing new: glint frames with no glint lit, or two hue steps that
+land on the same pixels. ``merge_frames`` sits between rendering and
+encoding and shows each run of such frames as its first frame, held for
+the run's summed duration:
+
+    for frame, duration in merge_frames(frames, duration_ms):
+        ...
+
+Frames in a run are compared against the run's first frame, not their
+neighbor, so slow fades cannot creep past the tolerance one step at a
+time. The last run is never folded into the first, so the loop keeps
+its length and wraps where it always did.
+
+The encoders (see gif_writer.py and anim_writer.py) already merge frames
+that come out exactly identical, but only after quantizing and comparing
+them. Merging here skips that work for every repeated frame and also
+catches frames a few levels apart, which quantize and encode differently
+without looking any different.
+"""
+
+import numpy as np
+
+from anim_writer import MAX_DELAY_MS
+
+# Frames within this many levels (of 255) on every channel of the frame
+# already being held are merged into it
+MERGE_TOLERANCE = 2
+
+
+def looks_same(a, b, tolerance=MERGE_TOLERANCE):
+    """Whether RGBA uint8 frames ``a`` and ``b`` look the same.
+
+    Whole pixels are compared first, as packed uint32s, so identical
+    frames cost one pass. Only the rows that differ are then compared
+    channel by channel.
+    """
+    a, b = np.ascontiguousarray(a), np.ascontiguousarray(b)
+    rows = (a.view(np.uint32) != b.view(np.uint32)).any(axis=(1, 2))
+    if not rows.any():
+        return True
+    if tolerance <= 0:
+        return False
+    a, b = a[rows], b[rows]
+    return bool((np.maximum(a, b) - np.minimum(a, b)).max() <= tolerance)
+
+
+def merge_frames(frames, duration, same=looks_same, max_duration=MAX_DELAY_MS):
+    """Yield ``(frame, duration)`` for each run of frames that look the same.
+
+    ``frames`` is any iterable of arrays, each shown for ``duration`` ms;
+    ``same(held, frame)`` decides whether ``frame`` joins the run held so
+    far. Frames may be a buffer reused for the next one: each held frame
+    is copied. Runs are cut at ``max_duration`` ms, the longest delay the
+    animation formats can store. Yields as it goes, so memory stays flat.
+    """
+    held, held_duration = None, 0
+    for frame in frames:
+        if held is not None:
+            if held_duration + duration <= max_duration and same(held, frame):
+                held_duration += duration
+                continue
+            yield held, held_duration
+        held, held_duration = np.array(frame, copy=True), duration
+    if held is not None:
+        yield held, held_duration
@@ -0,0 +1,98 @@
+"""Render animation frames in a pool of worker processes.
+
+The source arrays an animator renders from (the image, its HSV planes,
+masks) are copied into shared memory once and mapped by every worker,
+so tasks carry nothing but a frame number. Each worker builds its own
+render state from those arrays once, in its initializer.
+
+Frames come back in frame order with only a few in flight at a time, so
+a streaming encoder downstream keeps its bounded memory. Rendering must
+be a pure function of the frame number and the shared state; that is
+what keeps the output byte-identical to a serial run.
+
+Usage:
+
+    def setup(arrays, *extra):        # once per worker
+        return State(arrays["data"], *extra)
+
+    def render(state, f):             # once per frame
+        return state.frame(f)
+
+    for frame in render_frames(setup, render, {"data": data}, range(n), workers):
+        ...
+
+``setup`` and ``render`` must be module-level functions so they can be
+sent to the workers. With ``workers`` <= 1 everything runs in-process.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Frames queued per worker before the oldest result is waited on
+IN_FLIGHT_PER_WORKER = 2
+
+_worker_state = None
+_worker_segments = []
+
+
+def _share(arrays):
+    """Copy each array into a new shared memory segment.
+
+    Returns the segments (to unlink later) and the specs workers need to
+    map them back: name -> (segment name, shape, dtype).
+    """
+    segments, specs = [], {}
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=segment.buf)[...] = array
+        segments.append(segment)
+        specs[key] = (segment.name, array.shape, array.dtype.str)
+    return segments, specs
+
+
+def _init_worker(setup, specs, extra):
+    global _worker_state
+    arrays = {}
+    for key, (name, shape, dtype) in specs.items():
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments.append(segment)  # keep the mapping alive
+        arrays[key] = np.ndarray(shape, np.dtype(dtype), buffer=segment.buf)
+    _worker_state = setup(arrays, *extra)
+
+
+def _render_task(render, f):
+    return render(_worker_state, f)
+
+
+def render_frames(setup, render, arrays, frames, workers=1, extra=()):
+    """Yield ``render(state, f)`` for each ``f`` in ``frames``, in order.
+
+    ``state`` is ``setup(arrays, *extra)``, built once per process.
+    ``arrays`` maps names to the NumPy arrays shared with the workers.
+    """
+    if workers <= 1:
+        state = setup(arrays, *extra)
+        for f in frames:
+            yield render(state, f)
+        return
+
+    segments, specs = _share(arrays)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(setup, specs, extra)
+        ) as pool:
+            pending = deque()
+            for f in frames:
+                pending.append(pool.submit(_render_task, render, f))
+                if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
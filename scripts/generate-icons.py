@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Generate every app icon from one source image.
+
+Decodes the source once, finds the artwork and pads it to a square once
+(like process-icon.py), then derives each target from that one canvas:
+icon.png, adaptive-icon.png and splash-icon.png for Expo, and favicon.png
+for the web. Targets are built largest first and each one is scaled down
+from the previous one by a box-filter halving chain plus one LANCZOS pass
+(see icon_layout.downscale), so the 48 px favicon never resamples the
+full-resolution canvas.
+
+Usage:
+    python3 generate-icons.py input.png ../app/assets
+    python3 generate-icons.py input.png ../app/assets --bg-color 45,38,34 --padding 5
+
+Outputs are cached per target (see asset_cache.py); pass --no-cache to
+always rebuild. --profile out.json [--cprofile] records per-stage time and
+memory (see profiling.py).
+"""
+
+import os
+import shutil
+import sys
+from PIL import Image
+import numpy as np
+
+import asset_cache
+import profiling
+from icon_layout import content_bounds, detect_background, downscale, pad_to_square
+
+# (file name, size in px), largest first so each can be derived from the last
+TARGETS = [
+    ("icon.png", 1024),  # expo.icon
+    ("adaptive-icon.png", 1024),  # expo.android.adaptiveIcon.foregroundImage
+    ("splash-icon.png", 1024),  # expo.splash.image
+    ("favicon.png", 48),  # expo.web.favicon
+]
+
+
+def build_canvas(img, bg_color, padding_pct):
+    """Crop ``img`` to its artwork and pad it to a square."""
+    data = np.array(img)
+    avg_bg = detect_background(data)
+    print(f"Detected background: RGB({avg_bg[0]:.0f}, {avg_bg[1]:.0f}, {avg_bg[2]:.0f})")
+
+    with profiling.stage("content_bounds"):
+        x_min, y_min, x_max, y_max = content_bounds(data, avg_bg)
+    print(f"Content bounds: ({x_min}, {y_min}) to ({x_max}, {y_max})")
+
+    cropped = img.crop((x_min, y_min, x_max + 1, y_max + 1))
+    with profiling.stage("pad"):
+        canvas = pad_to_square(cropped, bg_color, padding_pct)
+    print(f"Padded to: {canvas.width}x{canvas.height}")
+    return canvas
+
+
+def generate_icons(canvas, output_dir, targets=TARGETS, only=None):
+    """Write each target, scaling each one down from the previous one.
+
+    Targets the same size as the previous one reuse its encoded PNG. With
+    ``only``, just the targets named in it are written; the rest are
+    still scaled through, so each file comes out as in a full run.
+    """
+    current = canvas
+    scaled = False
+    previous_path = None  # a written file holding ``current``
+    for name, size in sorted(targets, key=lambda target: -target[1]):
+        output_path = os.path.join(output_dir, name)
+        if not (scaled and current.width == size):
+            with profiling.stage("resize"):
+                current = downscale(current, size)
+            scaled, previous_path = True, None
+        if only is not None and name not in only:
+            continue
+        with profiling.stage("save"):
+            if previous_path is not None:
+                shutil.copyfile(previous_path, output_path)
+            else:
+                current.save(output_path)
+        previous_path = output_path
+        print(f"Saved: {output_path} ({size}x{size})")
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 generate-icons.py input.png OUTPUT_DIR [--bg-color R,G,B] [--padding PERCENT] [--no-cache] [--profile out.json [--cprofile]]")
+        sys.exit(1)
+
+    input_path = sys.argv[1]
+    output_dir = sys.argv[2]
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
+    bg_color = (45, 38, 34)  # #2D2622 dark wood
+    padding_pct = 5  # percent padding around content
+
+    if "--bg-color" in sys.argv:
+        idx = sys.argv.index("--bg-color") + 1
+        bg_color = tuple(int(x) for x in sys.argv[idx].split(","))
+    if "--padding" in sys.argv:
+        idx = sys.argv.index("--padding") + 1
+        padding_pct = int(sys.argv[idx])
+
+    os.makedirs(output_dir, exist_ok=True)
+    entries = []
+    with profiling.stage("cache"):
+        for name, size in TARGETS:
+            params = {"bg_color": list(bg_color), "padding": padding_pct, "size": size}
+            entries.append(asset_cache.lookup(
+                __file__, [input_path], params, os.path.join(output_dir, name),
+                enabled="--no-cache" not in sys.argv,
+            ))
+    if all(entry.fresh for entry in entries):
+        print(f"Up to date: {', '.join(name for name, _ in TARGETS)} in {output_dir}")
+        return
+
+    with profiling.stage("decode"):
+        img = Image.open(input_path).convert("RGB")
+    print(f"Input: {img.size}")
+
+    canvas = build_canvas(img, bg_color, padding_pct)
+    stale = [entry for entry in entries if not entry.fresh]
+    generate_icons(canvas, output_dir, only={os.path.basename(entry.output_path) for entry in stale})
+
+    with profiling.stage("cache"):
+        for entry in stale:
+            entry.store()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Delta-rectangle animated GIF writer.
+
+Pillow's multi-frame GIF writer either redraws the whole visible subject
+every frame (disposal=2) or cannot turn opaque pixels back to transparent
+(disposal=1). This writer tracks what a decoder is showing and, for each
+frame, emits only the bounding rectangle of pixels that actually change:
+
+- unchanged pixels inside the rectangle are written as the transparent
+  index, which LZW compresses to almost nothing
+- when a pixel has to go from opaque back to transparent, the previous
+  frame's rectangle is grown to cover it and given disposal=2, so the
+  decoder clears it before the next frame is drawn
+- identical consecutive frames are merged into one longer frame
+
+Frames are given as full-canvas palette index arrays plus a palette.
+Frames that share the global palette carry no local color table. LZW
+compression is delegated to Pillow by encoding each rectangle as a
+standalone GIF and lifting out its image data.
+
+Usage:
+
+    with open("out.gif", "wb") as fp:
+        writer = GifWriter(fp, (width, height), palette)
+        for indices in frames:
+            writer.add_frame(indices, duration_ms)
+        writer.close()
+
+or, from a generator of ``(indices, palette)`` pairs, or of
+``(indices, palette, duration_ms)`` triples to time frames one by one:
+
+    write_gif("out.gif", frames, duration_ms)
+
+The writer only ever holds the frame being encoded and what is on screen,
+so memory stays flat however many frames are streamed through it.
+
+``python3 gif_writer.py`` runs ``self_check``, which round-trips frame
+sequences that exercise each disposal through Pillow's decoder.
+"""
+
+import io
+import itertools
+import struct
+
+import numpy as np
+from PIL import Image
+
+TRANSPARENT_INDEX = 0
+
+DISPOSE_NONE = 1
+DISPOSE_BACKGROUND = 2
+DISPOSE_PREVIOUS = 3
+
+
+def _pad_palette(palette):
+    """Return a 768-entry RGB palette list."""
+    palette = list(palette)[: 256 * 3]
+    return palette + [0] * (256 * 3 - len(palette))
+
+
+def _palette_colors(palette, transparency):
+    """Map each palette index to a packed RGBA uint32; transparent maps to 0."""
+    rgb = np.array(_pad_palette(palette), dtype=np.uint32).reshape(256, 3)
+    colors = (rgb[:, 0] << 24) | (rgb[:, 1] << 16) | (rgb[:, 2] << 8) | 0xFF
+    if transparency is not None:
+        colors[transparency] = 0
+    return colors
+
+
+def _lzw_image_data(indices, palette):
+    """LZW-compress a palette index array using Pillow's GIF encoder.
+
+    Returns the image data block (minimum code size byte, data sub-blocks
+    and terminator) ready to follow an image descriptor.
+    """
+    img = Image.fromarray(np.ascontiguousarray(indices), "P")
+    img.putpalette(_pad_palette(palette))
+    buf = io.BytesIO()
+    img.save(buf, "GIF", optimize=False, interlace=False)
+    data = buf.getvalue()
+
+    pos = 13
+    flags = data[10]
+    if flags & 0x80:
+        pos += 3 * (2 << (flags & 0x07))
+    while data[pos] == 0x21:  # skip extension blocks
+        pos += 2
+        while data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+    assert data[pos] == 0x2C, "expected an image descriptor"
+    flags = data[pos + 9]
+    pos += 10
+    if flags & 0x80:
+        pos += 3 * (2 << (flags & 0x07))
+    start = pos
+    pos += 1  # LZW minimum code size
+    while data[pos]:
+        pos += data[pos] + 1
+    return data[start : pos + 1]
+
+
+def _bbox(mask):
+    """(x0, y0, x1, y1) of the True pixels in ``mask``, or None."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+
+
+def _union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+class _PendingFrame:
+    """A frame whose rectangle and disposal may still change."""
+
+    def __init__(self, indices, palette, colors, before, rect, duration):
+        self.indices = indices
+        self.palette = palette
+        self.colors = colors
+        self.before = before  # displayed colors before this frame was drawn
+        self.rect = rect
+        self.duration = duration
+        self.disposal = DISPOSE_NONE
+
+
+class GifWriter:
+    """Stream frames into a looping GIF, writing only what changes."""
+
+    def __init__(self, fp, size, palette, loop=0, transparency=TRANSPARENT_INDEX):
+        self.fp = fp
+        self.width, self.height = size
+        self.palette = _pad_palette(palette)
+        self.transparency = transparency
+        self.global_colors = _palette_colors(self.palette, transparency)
+        # What a decoder is showing once the pending frame has been drawn
+        self.displayed = np.zeros((self.height, self.width), dtype=np.uint32)
+        self.first = None
+        self.pending = None
+        self.frames_written = 0
+        self.bytes_written = 0
+
+        self._write(b"GIF89a")
+        self._write(struct.pack("<HHBBB", self.width, self.height, 0xF7, transparency or 0, 0))
+        self._write(bytes(self.palette))
+        self._write(b"!\xff\x0bNETSCAPE2.0\x03\x01" + struct.pack("<H", loop) + b"\x00")
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.bytes_written += len(data)
+
+    def add_frame(self, indices, duration, palette=None):
+        """Queue a full-canvas frame of palette indices shown for ``duration`` ms.
+
+        ``palette`` overrides the global palette for this frame only.
+        """
+        indices = np.asarray(indices, dtype=np.uint8)
+        if palette is None:
+            palette, colors = self.palette, self.global_colors
+        else:
+            palette = _pad_palette(palette)
+            colors = _palette_colors(palette, self.transparency)
+        target = colors[indices]
+
+        if self.pending is None:
+            # The first frame is drawn onto a cleared canvas in full
+            self.pending = _PendingFrame(
+                indices, palette, colors, self.displayed.copy(),
+                (0, 0, self.width, self.height), duration,
+            )
+            self.displayed = self.first = target
+            return
+
+        changed = target != self.displayed
+        if not changed.any():
+            self.pending.duration += duration
+            return
+
+        changed = self._dispose_for(target, changed)
+
+        # Disposal alone can bring back ``target`` (A, B, A where B only adds
+        # pixels): the frame is then a no-op 1x1 rectangle that holds it
+        self._flush()
+        self.pending = _PendingFrame(
+            indices, palette, colors, self.displayed, _bbox(changed) or (0, 0, 1, 1), duration
+        )
+        self.displayed = target
+
+    def _dispose_for(self, target, changed):
+        """Pick the pending frame's disposal; return the change mask for ``target``.
+
+        Pixels can only go back to transparent through disposal. Restoring
+        the pending rectangle to what was under it (disposal=3) is tried
+        first, since pixels that just appeared over empty canvas vanish for
+        free that way. Otherwise the pending rectangle is grown to cover
+        them and cleared (disposal=2).
+        """
+        clear = changed & (target == 0)
+        if not clear.any():
+            return changed
+
+        frame = self.pending
+        x0, y0, x1, y1 = frame.rect
+        restored = self.displayed.copy()
+        restored[y0:y1, x0:x1] = frame.before[y0:y1, x0:x1]
+        restored_changed = target != restored
+        if not (restored_changed & (target == 0)).any():
+            frame.disposal = DISPOSE_PREVIOUS
+            self.displayed = restored
+            return restored_changed
+
+        frame.rect = _union(frame.rect, _bbox(clear))
+        frame.disposal = DISPOSE_BACKGROUND
+        x0, y0, x1, y1 = frame.rect
+        self.displayed = self.displayed.copy()
+        self.displayed[y0:y1, x0:x1] = 0
+        return target != self.displayed
+
+    def _flush(self):
+        """Encode and write the pending frame."""
+        frame = self.pending
+        x0, y0, x1, y1 = frame.rect
+        indices = frame.indices[y0:y1, x0:x1]
+        same = frame.colors[indices] == frame.before[y0:y1, x0:x1]
+        if self.transparency is not None and same.any():
+            indices = np.where(same, self.transparency, indices).astype(np.uint8)
+
+        delay = int(round(frame.duration / 10))
+        flags = (frame.disposal << 2) | (1 if self.transparency is not None else 0)
+        self._write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, flags, delay, self.transparency or 0, 0))
+
+        local = frame.palette is not self.palette and frame.palette != self.palette
+        self._write(struct.pack("<BHHHHB", 0x2C, x0, y0, x1 - x0, y1 - y0, 0x87 if local else 0))
+        if local:
+            self._write(bytes(frame.palette))
+        self._write(_lzw_image_data(indices, frame.palette))
+        self.frames_written += 1
+        self.pending = None
+
+    def close(self):
+        """Write the last frame and the trailer.
+
+        The last frame also clears anything the first frame shows as
+        transparent, so the loop is seamless even in decoders that do not
+        reset the canvas when they wrap around.
+        """
+        if self.pending is not None:
+            if self.frames_written:
+                self._dispose_for(self.first, self.first != self.displayed)
+            self._flush()
+        self._write(b";")
+
+
+def quantize_frame(rgba, colors=255):
+    """Quantize an alpha-thresholded RGBA frame to its own palette.
+
+    Returns ``(indices, palette)`` with index 0 reserved for transparent
+    pixels, ready for ``GifWriter.add_frame``.
+    """
+    quantized = Image.fromarray(rgba, "RGBA").convert("P", palette=Image.ADAPTIVE, colors=colors)
+    indices = np.array(quantized) + 1
+    indices[rgba[:, :, 3] < 128] = TRANSPARENT_INDEX
+    palette = [0, 0, 0] + quantized.getpalette()[: colors * 3]
+    return indices.astype(np.uint8), palette
+
+
+def write_gif(path, frames, duration, palette=None, loop=0):
+    """Stream ``(indices, palette)`` frames into a looping GIF at ``path``.
+
+    ``frames`` may be any iterable, typically a generator, and is consumed
+    one frame at a time. A frame palette of None means the global palette;
+    if ``palette`` is not given, the first frame's palette is used as the
+    global one. A frame given as ``(indices, palette, duration)`` is shown
+    for its own duration instead of ``duration``. Raises ValueError if
+    ``frames`` is empty. Returns the closed writer for its stats.
+    """
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("no frames to write")
+    indices, first_palette = first[:2]
+    if palette is None:
+        palette = first_palette
+    height, width = np.shape(indices)
+    with open(path, "wb") as fp:
+        writer = GifWriter(fp, (width, height), palette, loop=loop)
+        for indices, frame_palette, *timing in itertools.chain([first], frames):
+            writer.add_frame(indices, timing[0] if timing else duration, palette=frame_palette)
+        writer.close()
+    return writer
+
+
+def self_check():
+    """Write frame sequences that lean on disposal and check they decode as given.
+
+    Raises AssertionError naming the first sequence that does not.
+    """
+    palette = [0, 0, 0, 255, 0, 0, 0, 255, 0]
+    a = np.zeros((10, 10), dtype=np.uint8)
+    a[2:5, 2:5] = 1
+    b = a.copy()
+    b[7:9, 7:9] = 2  # only adds pixels, so restoring to A undoes it
+    c = np.zeros_like(a)
+    c[6:9, 1:4] = 2  # clears all of A
+    sequences = {
+        "add then restore": [a, b, a],
+        "clear and back": [a, c, a],
+        "blank frame": [a, np.zeros_like(a), b],
+    }
+    colors = np.array(_pad_palette(palette), dtype=np.uint8).reshape(256, 3)
+    for name, frames in sequences.items():
+        fp = io.BytesIO()
+        writer = GifWriter(fp, (a.shape[1], a.shape[0]), palette)
+        for indices in frames:
+            writer.add_frame(indices, 100)
+        writer.close()
+        fp.seek(0)
+        with Image.open(fp) as img:
+            assert img.n_frames == len(frames), f"{name}: {img.n_frames} frames"
+            for i, indices in enumerate(frames):
+                img.seek(i)
+                shown = np.asarray(img.convert("RGBA"))
+                opaque = indices != TRANSPARENT_INDEX
+                assert (shown[..., 3] > 0).tolist() == opaque.tolist(), f"{name}: frame {i} alpha"
+                assert (shown[opaque][:, :3] == colors[indices[opaque]]).all(), f"{name}: frame {i} color"
+
+
+if __name__ == "__main__":
+    self_check()
+    print("gif_writer: ok")
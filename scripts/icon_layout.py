@@ -0,0 +1,82 @@
+"""Shared icon layout: find the artwork, pad it to a square, scale it down.
+
+Used by process-icon.py (one 1024x1024 icon) and generate-icons.py (every
+Expo and web icon from one decode).
+"""
+
+import numpy as np
+from PIL import Image
+
+import tiled_image
+
+
+def detect_background(data):
+    """Average of the four corner pixels of an RGB array."""
+    corners = [data[0, 0], data[0, -1], data[-1, 0], data[-1, -1]]
+    return np.mean(corners, axis=0)
+
+
+def content_bounds(data, bg, threshold=20):
+    """(x_min, y_min, x_max, y_max), inclusive, of pixels that differ from ``bg``.
+
+    A pixel is content if any channel differs from the background by more
+    than ``threshold``.
+    """
+    # float32 holds the corner average (a multiple of 0.25) exactly
+    diff = np.abs(data.astype(np.float32) - bg.astype(np.float32)).max(axis=2)
+    content_mask = diff > threshold
+
+    rows = np.any(content_mask, axis=1)
+    cols = np.any(content_mask, axis=0)
+    y_min, y_max = np.where(rows)[0][[0, -1]]
+    x_min, x_max = np.where(cols)[0][[0, -1]]
+    return x_min, y_min, x_max, y_max
+
+
+def content_bounds_tiled(data, bg, threshold=20, tile_rows=tiled_image.TILE_ROWS):
+    """``content_bounds`` for large images, a band of rows at a time.
+
+    Works in integers: ``bg`` is an average of four corners, so four times
+    it is whole, and comparing ``4 * pixel`` against that is exact.
+    """
+    bg4 = np.rint(np.asarray(bg, dtype=np.float64) * 4).astype(np.int16)
+    rows = np.zeros(data.shape[0], dtype=bool)
+    cols = np.zeros(data.shape[1], dtype=bool)
+    for y0, y1 in tiled_image.row_tiles(data.shape[0], tile_rows):
+        diff4 = np.abs(data[y0:y1].astype(np.int16) * 4 - bg4).max(axis=2)
+        content_mask = diff4 > 4 * threshold
+        rows[y0:y1] = content_mask.any(axis=1)
+        cols |= content_mask.any(axis=0)
+
+    y_min, y_max = np.where(rows)[0][[0, -1]]
+    x_min, x_max = np.where(cols)[0][[0, -1]]
+    return x_min, y_min, x_max, y_max
+
+
+def pad_to_square(cropped, bg_color, padding_pct):
+    """Center ``cropped`` on a square ``bg_color`` canvas with a percentage margin."""
+    cw, ch = cropped.size
+    side = max(cw, ch)
+    padding = int(side * padding_pct / 100)
+    canvas_size = side + 2 * padding
+
+    canvas = Image.new("RGB", (canvas_size, canvas_size), bg_color)
+    paste_x = (canvas_size - cw) // 2
+    paste_y = (canvas_size - ch) // 2
+    canvas.paste(cropped, (paste_x, paste_y))
+    return canvas
+
+
+def downscale(img, size):
+    """Resize a square image to ``size`` px (upscaling is a plain LANCZOS).
+
+    Halves with a box filter while the image is still at least 4x the
+    target, then finishes with one LANCZOS pass. The result is close to a
+    single LANCZOS resize, but each halving works on a quarter of the
+    previous pixels.
+    """
+    while img.width // 2 >= size * 2:
+        img = img.reduce(2)
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.LANCZOS)
+    return img
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+"""Load-test a locally running room server with simulated players.
+
+Opens one WebSocket per simulated player against the PartyKit server in
+server/ (``/party/ROOM``, as the app does) and plays real games: the
+first player in each room joins and hosts, the others join, the host
+starts the game, and on each turn the current player either claims a
+route by discarding a same-color set (locomotives wild) or draws two
+cards from the deck or the face-up row. Face-up locomotives are only
+taken as the first draw and end the turn, as the server enforces; any
+rejected move falls back to end-turn so a room never stalls.
+
+It records, per message type:
+
+- request latency: from sending a message to the reply the sender waits
+  for (join-room -> room-created, rejoin-room -> room-rejoined,
+  start-game -> game-started, a draw -> your-hand with the drawn card,
+  discard-cards and end-turn -> game-state)
+- broadcast latency: from the last action sent in a room to each other
+  player receiving the player-action or game-state it triggered
+- counts of messages sent and received, and of server errors
+
+With --storm-every S, every S seconds a --storm-fraction of all players
+drop their connection at once and come back after up to --rejoin-delay
+seconds with rejoin-room and their reconnect token; rejoin latency and
+failures are reported separately.
+
+Usage:
+    pip install websockets           # once
+    cd ../server && npm run dev      # in another terminal
+    python3 load-test-server.py
+    python3 load-test-server.py --rooms 500 --players 4 --duration 120
+    python3 load-test-server.py --storm-every 15 --storm-fraction 0.3 --output load.json
+    python3 load-test-server.py --start-server --rooms 50
+
+--url defaults to ws://localhost:1999 (``partykit dev``) and must point
+at localhost; --start-server runs ``npx partykit dev`` in server/ for the
+length of the test. --think-ms sets each player's pause before a move,
+--ramp spreads the connections over that many seconds. Thousands of
+players need a matching ``ulimit -n``. The summary also shows this
+process's CPU use: near 100% means the load generator, not the server,
+was the bottleneck.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(SCRIPTS_DIR, "..", "server")
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+
+# server/src/server.ts rejects a sixth player
+MAX_PLAYERS_PER_ROOM = 5
+
+# Longest route in the game, so a claim never discards more than this
+MAX_ROUTE_LENGTH = 6
+
+# Reply each request waits for; draws are matched on your-hand below
+REPLIES = {
+    "join-room": "room-created",
+    "rejoin-room": "room-rejoined",
+    "start-game": "game-started",
+    "draw-from-deck": "your-hand",
+    "draw-face-up": "your-hand",
+    "discard-cards": "game-state",
+    "end-turn": "game-state",
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class Stats:
+    """Latency samples and counters shared by every simulated player."""
+
+    def __init__(self):
+        self.latency = defaultdict(list)  # name -> seconds
+        self.sent = Counter()
+        self.received = Counter()
+        self.errors = Counter()  # request type -> server errors
+        self.error_messages = Counter()
+        self.storms = []
+        self.rejoins = Counter()
+
+    def summary(self, seconds, cpu_seconds):
+        total_sent = sum(self.sent.values())
+        total_received = sum(self.received.values())
+        return {
+            "seconds": round(seconds, 2),
+            "cpu_percent": round(100 * cpu_seconds / seconds, 1) if seconds else 0.0,
+            "sent": dict(self.sent),
+            "received": dict(self.received),
+            "sent_per_second": round(total_sent / seconds, 1) if seconds else 0.0,
+            "received_per_second": round(total_received / seconds, 1) if seconds else 0.0,
+            "errors": dict(self.errors),
+            "error_messages": dict(self.error_messages.most_common(10)),
+            "latency_ms": {name: percentiles(samples) for name, samples in sorted(self.latency.items())},
+            "storms": self.storms,
+            "rejoins": dict(self.rejoins),
+        }
+
+
+def percentiles(samples):
+    """Count, p50/p90/p99 and max of ``samples`` (seconds), in ms."""
+    ordered = sorted(samples)
+    result = {"count": len(ordered)}
+    for p in PERCENTILES:
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        result[f"p{p}"] = round(ordered[index] * 1000, 2)
+    result["max"] = round(ordered[-1] * 1000, 2)
+    return result
+
+
+class Room:
+    """What the players of one room share: its code and last action time."""
+
+    def __init__(self, code, size):
+        self.code = code
+        self.size = size
+        self.host_joined = asyncio.Event()
+        self.last_action = None  # perf_counter of the last message that changes state
+
+
+class Player:
+    """One simulated player: a connection, a hand and the turn rules."""
+
+    def __init__(self, room, index, args, stats, rng):
+        self.room = room
+        self.index = index
+        self.is_host = index == 0
+        self.args = args
+        self.stats = stats
+        self.rng = rng
+        self.ws = None
+        self.player_id = None
+        self.token = None
+        self.hand = []
+        self.face_up = []
+        self.turn = None
+        self.phase = "lobby"
+        self.pending = None  # (request type, sent at) awaiting its reply
+        self.thinking = False  # a move is scheduled
+        self.dropped = asyncio.Event()
+        self.stopping = False
+
+    # --- Connection ----------------------------------------------------------
+
+    async def run(self, deadline):
+        """Connect, play until ``deadline`` and come back after each drop."""
+        url = f"{self.args.url}/party/{self.room.code}"
+        if not self.is_host:
+            try:
+                await asyncio.wait_for(self.room.host_joined.wait(), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                return
+        while not self.stopping and time.perf_counter() < deadline:
+            self.dropped.clear()
+            try:
+                async with websockets.connect(url, max_size=None, open_timeout=30) as ws:
+                    self.ws = ws
+                    if self.token is None:
+                        name = f"load-{self.room.code}-{self.index}"
+                        await self.send("join-room", {"roomCode": self.room.code, "playerName": name})
+                    else:
+                        await self.send("rejoin-room", {"reconnectToken": self.token})
+                    reader = asyncio.ensure_future(self.read(ws))
+                    dropped = asyncio.ensure_future(self.dropped.wait())
+                    await asyncio.wait([reader, dropped], return_when=asyncio.FIRST_COMPLETED)
+                    reader.cancel()
+                    dropped.cancel()
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                self.stats.errors["connect"] += 1
+                self.stats.error_messages[f"connect: {type(e).__name__}"] += 1
+            self.ws = None
+            self.pending = None
+            if self.stopping or time.perf_counter() >= deadline:
+                break
+            # A storm dropped us, or the connection failed: come back later
+            await asyncio.sleep(self.rng.uniform(0, self.args.rejoin_delay))
+
+    async def drop(self):
+        """Close the connection as a lost client would; ``run`` rejoins."""
+        if self.ws is not None:
+            self.room.last_action = time.perf_counter()
+            await self.ws.close()
+        self.dropped.set()
+
+    async def stop(self):
+        self.stopping = True
+        await self.drop()
+
+    async def send(self, message_type, payload=None):
+        message = {"type": message_type}
+        if payload is not None:
+            message["payload"] = payload
+        now = time.perf_counter()
+        if message_type in REPLIES:
+            self.pending = (message_type, now)
+        self.room.last_action = now
+        self.stats.sent[message_type] += 1
+        try:
+            await self.ws.send(json.dumps(message))
+        except websockets.exceptions.ConnectionClosed:
+            self.pending = None
+
+    async def read(self, ws):
+        try:
+            async for raw in ws:
+                await self.handle(json.loads(raw))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    # --- Messages ------------------------------------------------------------
+
+    def reply(self, message_type, payload):
+        """Record the latency of the pending request if this message answers it."""
+        if self.pending is None:
+            return
+        request, sent_at = self.pending
+        if REPLIES[request] != message_type:
+            return
+        if message_type == "your-hand" and "drawnCard" not in payload:
+            return
+        self.stats.latency[request].append(time.perf_counter() - sent_at)
+        self.pending = None
+
+    async def handle(self, message):
+        message_type = message.get("type")
+        payload = message.get("payload") or {}
+        self.stats.received[message_type] += 1
+        self.reply(message_type, payload)
+
+        if message_type in ("player-action", "game-state", "player-joined") and self.room.last_action:
+            self.stats.latency[f"broadcast:{message_type}"].append(time.perf_counter() - self.room.last_action)
+
+        if message_type == "room-created":
+            self.player_id = payload["playerId"]
+            self.token = payload["reconnectToken"]
+            if self.is_host:
+                self.room.host_joined.set()
+        elif message_type == "room-rejoined":
+            self.stats.rejoins["ok"] += 1
+            self.player_id = payload["playerId"]
+            self.hand = payload["hand"]
+            self.face_up = payload["faceUpCards"]
+            self.turn = payload["currentTurn"]
+            self.phase = payload["phase"]
+            await self.maybe_start(payload["players"])
+            await self.maybe_move()
+        elif message_type == "player-joined":
+            await self.maybe_start(payload["players"])
+        elif message_type == "game-started":
+            self.phase = "playing"
+            self.hand = payload["yourHand"]
+            self.face_up = payload["faceUpCards"]
+        elif message_type == "your-hand":
+            self.hand = payload["hand"]
+        elif message_type == "game-state":
+            self.phase = "playing"
+            self.face_up = payload["faceUpCards"]
+            self.turn = payload["currentTurn"]
+            await self.maybe_move()
+        elif message_type == "error":
+            await self.on_error(payload.get("message", ""))
+
+    async def on_error(self, text):
+        request = self.pending[0] if self.pending else "unknown"
+        self.pending = None
+        self.stats.errors[request] += 1
+        self.stats.error_messages[text] += 1
+        if request == "rejoin-room":
+            self.stats.rejoins["failed"] += 1
+        elif request in ("draw-from-deck", "draw-face-up", "discard-cards") and self.my_turn():
+            # The move was rejected; hand the turn on rather than stall the room
+            await self.send("end-turn")
+
+    async def maybe_start(self, players):
+        if self.is_host and self.phase == "lobby" and len(players) >= self.room.size and self.pending is None:
+            await self.send("start-game")
+
+    # --- Turn rules ----------------------------------------------------------
+
+    def my_turn(self):
+        return self.turn is not None and self.turn["playerId"] == self.player_id
+
+    def route_cards(self):
+        """Card ids for the largest same-color set plus locomotives, or None."""
+        by_color = defaultdict(list)
+        for card in self.hand:
+            by_color[card["color"]].append(card["id"])
+        locomotives = by_color.pop("locomotive", [])
+        if not by_color:
+            return locomotives[:MAX_ROUTE_LENGTH] or None
+        color = max(by_color, key=lambda c: len(by_color[c]))
+        cards = (by_color[color] + locomotives)[:MAX_ROUTE_LENGTH]
+        return cards if len(cards) >= 2 else None
+
+    def choose_move(self):
+        """The next message for the current turn, as (type, payload)."""
+        turn = self.turn
+        if turn["cardsDrawn"] == 0 and len(self.hand) >= self.args.claim_at:
+            cards = self.route_cards()
+            if cards and self.rng.random() < 0.7:
+                return "discard-cards", {"cardIds": cards}
+        if self.rng.random() < 0.5 and self.face_up:
+            choices = [
+                i for i, card in enumerate(self.face_up)
+                if card["color"] != "locomotive" or turn["cardsDrawn"] == 0
+            ]
+            if choices:
+                return "draw-face-up", {"index": self.rng.choice(choices)}
+        return "draw-from-deck", None
+
+    async def maybe_move(self):
+        """Schedule the next move if it is this player's turn to make one.
+
+        The think time runs as its own task so the reader keeps draining
+        (and timestamping) broadcasts meanwhile.
+        """
+        turn = self.turn
+        if (
+            self.phase != "playing" or not self.my_turn() or self.pending is not None
+            or self.thinking or turn["cardsDrawn"] >= 2 or turn["drewLocomotive"]
+        ):
+            return
+        self.thinking = True
+        asyncio.ensure_future(self.move())
+
+    async def move(self):
+        await asyncio.sleep(self.args.think_ms / 1000 * self.rng.uniform(0.5, 1.5))
+        self.thinking = False
+        if self.ws is None or not self.my_turn() or self.pending is not None:
+            return
+        if self.rng.random() < self.args.end_turn_rate:
+            await self.send("end-turn")
+        else:
+            await self.send(*self.choose_move())
+
+
+# --- Orchestration ------------------------------------------------------------
+
+
+async def storms(players, args, stats, deadline, rng):
+    """Drop a fraction of all players every ``args.storm_every`` seconds."""
+    start = time.perf_counter()
+    while True:
+        await asyncio.sleep(args.storm_every)
+        if time.perf_counter() + args.rejoin_delay >= deadline:
+            return
+        connected = [p for p in players if p.ws is not None and p.token is not None]
+        victims = rng.sample(connected, int(len(connected) * args.storm_fraction))
+        stats.storms.append({"at": round(time.perf_counter() - start, 1), "dropped": len(victims)})
+        print(f"  Storm: dropping {len(victims)} of {len(connected)} connected players")
+        await asyncio.gather(*(p.drop() for p in victims))
+
+
+async def progress(stats, deadline, interval=5):
+    start = time.perf_counter()
+    last = 0
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(min(interval, max(deadline - time.perf_counter(), 0)))
+        received = sum(stats.received.values())
+        elapsed = time.perf_counter() - start
+        print(f"  {elapsed:5.0f}s: {(received - last) / interval:8.0f} msg/s received, "
+              f"{sum(stats.errors.values())} errors")
+        last = received
+
+
+async def run_load(args):
+    stats = Stats()
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:6]
+    rooms = [Room(f"load-{run_id}-{i}", args.players) for i in range(args.rooms)]
+    players = [
+        Player(room, index, args, stats, random.Random(rng.random()))
+        for room, index in itertools.product(rooms, range(args.players))
+    ]
+    print(f"{len(players)} players in {len(rooms)} rooms against {args.url} for {args.duration}s")
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    deadline = start + args.ramp + args.duration
+
+    async def launch(player, delay):
+        await asyncio.sleep(delay)
+        await player.run(deadline)
+
+    tasks = [
+        asyncio.ensure_future(launch(p, args.ramp * i / len(players)))
+        for i, p in enumerate(players)
+    ]
+    background = [asyncio.ensure_future(progress(stats, deadline))]
+    if args.storm_every:
+        background.append(asyncio.ensure_future(storms(players, args, stats, deadline, rng)))
+
+    await asyncio.sleep(max(deadline - time.perf_counter(), 0))
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*(p.stop() for p in players), return_exceptions=True)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return stats.summary(time.perf_counter() - start, time.process_time() - cpu_start)
+
+
+def print_summary(summary):
+    print(f"\nRan {summary['seconds']}s, load generator CPU {summary['cpu_percent']}%")
+    print(f"Sent {sum(summary['sent'].values())} ({summary['sent_per_second']}/s), "
+          f"received {sum(summary['received'].values())} ({summary['received_per_second']}/s)")
+    print(f"\n{'message':<26}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in summary["latency_ms"].items():
+        errors = summary["errors"].get(name, 0)
+        print(f"{name:<26}{stats['count']:>8}{errors:>8}{stats['p50']:>10}{stats['p90']:>10}"
+              f"{stats['p99']:>10}{stats['max']:>10}")
+    if summary["storms"]:
+        dropped = sum(storm["dropped"] for storm in summary["storms"])
+        print(f"\n{len(summary['storms'])} storms dropped {dropped} connections; rejoins: "
+              f"{summary['rejoins'].get('ok', 0)} ok, {summary['rejoins'].get('failed', 0)} failed")
+    if summary["error_messages"]:
+        print("\nServer errors:")
+        for text, count in summary["error_messages"].items():
+            print(f"  {count:>6}  {text}")
+
+
+def wait_for_port(host, port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+class Args:
+    """Command-line options, with the defaults used when a flag is absent."""
+
+    url = "ws://localhost:1999"
+    rooms = 100
+    players = 4
+    duration = 60.0
+    ramp = 5.0
+    think_ms = 100.0
+    claim_at = 6  # hand size from which a player tries to claim a route
+    end_turn_rate = 0.02
+    storm_every = 0.0
+    storm_fraction = 0.25
+    rejoin_delay = 2.0
+    seed = 1
+    output = None
+    start_server = False
+
+
+def parse_args(argv):
+    args = Args()
+    for flag, kind in (
+        ("--url", str), ("--rooms", int), ("--players", int), ("--duration", float),
+        ("--ramp", float), ("--think-ms", float), ("--claim-at", int),
+        ("--end-turn-rate", float), ("--storm-every", float), ("--storm-fraction", float),
+        ("--rejoin-delay", float), ("--seed", int), ("--output", str),
+    ):
+        if flag in argv:
+            setattr(args, flag[2:].replace("-", "_"), kind(argv[argv.index(flag) + 1]))
+    args.start_server = "--start-server" in argv
+    args.url = args.url.rstrip("/")
+    return args
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print("Usage: python3 load-test-server.py [--url ws://localhost:1999] [--rooms N] [--players N]"
+              " [--duration S] [--ramp S] [--think-ms MS] [--storm-every S [--storm-fraction F]"
+              " [--rejoin-delay S]] [--seed N] [--output results.json] [--start-server]")
+        sys.exit(1)
+    if websockets is None:
+        print("load-test-server.py needs the websockets package: pip install websockets")
+        sys.exit(1)
+
+    args = parse_args(sys.argv)
+    url = urlparse(args.url)
+    if url.hostname not in LOCAL_HOSTS:
+        print(f"Refusing to load-test {url.hostname}: only a locally started server may be used")
+        sys.exit(1)
+    if not 1 <= args.players <= MAX_PLAYERS_PER_ROOM:
+        print(f"--players must be 1-{MAX_PLAYERS_PER_ROOM}")
+        sys.exit(1)
+
+    server = None
+    port = url.port or 1999
+    if args.start_server:
+        print(f"Starting partykit dev on port {port}...")
+        server = subprocess.Popen(
+            ["npx", "partykit", "dev", "--port", str(port)], cwd=SERVER_DIR,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    try:
+        if not wait_for_port(url.hostname, port, timeout=60 if server else 2):
+            print(f"No server listening on {url.hostname}:{port} (start it with `npm run dev` in server/)")
+            sys.exit(1)
+        summary = asyncio.run(run_load(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSaved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Shrink processed PNGs without a visible change.
+
+``save_optimized`` builds a few candidates of an RGBA image and writes
+the smallest one whose difference from the original passes the guard:
+
+- ``lossless``: the RGBA pixels as they are, except that fully
+  transparent pixels have their color zeroed since it can never show.
+- ``posterize1`` / ``posterize2``: RGB rounded to a multiple of 2 or 4.
+
+On the current cards posterize2 passes and comes out about 1.6x smaller
+than lossless. There is no 256-color palette candidate: no quantized
+card kept every pixel within ``MAX_ERROR``, so it was never picked.
+
+The accepted candidate is encoded with each zlib strategy at level 9 and
+the smallest result written, without metadata chunks.
+
+The guard compares premultiplied RGBA, so a difference in a half
+transparent pixel counts half. A candidate is accepted when:
+
+- ``max_error``: no channel of any pixel differs by more than
+  ``MAX_ERROR`` levels.
+- ``band_error``: no 3x3 neighborhood's average difference in any
+  channel exceeds ``BAND_ERROR`` levels. Differences well under
+  ``MAX_ERROR`` still show when a whole area shifts the same way, as
+  banding or a color cast.
+- ``mean_error``: the mean difference per channel, weighted by alpha,
+  is at most ``MEAN_ERROR`` levels.
+
+Usage:
+
+    report = png_optimize.save_optimized(img, "out.png")
+    print(report["candidate"], report["bytes"])
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+MAX_ERROR = 16.0
+BAND_ERROR = 4.0
+MEAN_ERROR = 2.0
+
+# zlib strategies: default, filtered, RLE
+ZLIB_STRATEGIES = (0, 1, 3)
+
+
+def premultiply(data):
+    """float32 copy of an RGBA array with RGB scaled by alpha."""
+    out = data.astype(np.float32)
+    out[..., :3] *= out[..., 3:] / 255
+    return out
+
+
+def _box3(plane):
+    """Mean of each pixel's 3x3 neighborhood, edges repeated."""
+    h, w = plane.shape
+    padded = np.pad(plane, 1, mode="edge")
+    total = np.zeros_like(plane)
+    for dy in range(3):
+        for dx in range(3):
+            total += padded[dy:dy + h, dx:dx + w]
+    return total / 9
+
+
+def difference(reference, candidate):
+    """(max, band, mean) error of ``candidate`` against ``reference``, as in the guard."""
+    error = np.abs(premultiply(candidate) - premultiply(reference))
+    band = max(_box3(error[..., channel]).max() for channel in range(4))
+    weight = np.maximum(reference[..., 3], candidate[..., 3]).astype(np.float32) / 255
+    total = weight.sum()
+    mean = float((error.mean(axis=2) * weight).sum() / total) if total else 0.0
+    return float(error.max()), float(band), mean
+
+
+def clear_transparent(data):
+    """Copy of ``data`` with the RGB of fully transparent pixels set to 0."""
+    data = data.copy()
+    data[data[..., 3] == 0, :3] = 0
+    return data
+
+
+def posterize(data, bits):
+    """Round RGB to the middle of each ``2 ** bits`` step; alpha is kept."""
+    data = data.copy()
+    step = 1 << bits
+    data[..., :3] = (data[..., :3] & np.uint8(256 - step)) + np.uint8(step // 2)
+    return clear_transparent(data)
+
+
+def encode_smallest(img, **params):
+    """Encode ``img`` with every zlib strategy at level 9; the smallest PNG bytes."""
+    best = None
+    for strategy in ZLIB_STRATEGIES:
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG", compress_level=9, compress_type=strategy, **params)
+        if best is None or buffer.tell() < len(best):
+            best = buffer.getvalue()
+    return best
+
+
+def _candidates(data, lossless):
+    """(name, image, save params, RGBA pixels) from smallest expected to largest."""
+    if not lossless:
+        for bits in (2, 1):
+            pixels = posterize(data, bits)
+            yield f"posterize{bits}", Image.fromarray(pixels, "RGBA"), {}, pixels
+    pixels = clear_transparent(data)
+    yield "lossless", Image.fromarray(pixels, "RGBA"), {}, pixels
+
+
+def save_optimized(img, path, max_error=MAX_ERROR, band_error=BAND_ERROR, mean_error=MEAN_ERROR,
+                   lossless=False):
+    """Write the smallest candidate of ``img`` that passes the guard to ``path``.
+
+    PNG itself is lossless, so the guard runs on each candidate's pixels
+    before anything is encoded. Candidates are tried smallest first and
+    only the first one accepted goes through the zlib search; the
+    lossless one always passes. Returns a report with the chosen
+    candidate, its size and errors, and the errors of every candidate
+    checked.
+    """
+    data = np.asarray(img.convert("RGBA"))
+    tried = {}
+    for name, candidate, params, pixels in _candidates(data, lossless):
+        max_err, band_err, mean_err = difference(data, pixels)
+        accepted = max_err <= max_error and band_err <= band_error and mean_err <= mean_error
+        tried[name] = {
+            "max_error": round(max_err, 2), "band_error": round(band_err, 2),
+            "mean_error": round(mean_err, 3), "accepted": accepted,
+        }
+        if accepted:
+            break
+
+    encoded = encode_smallest(candidate, **params)
+    with open(path, "wb") as f:
+        f.write(encoded)
+    return {"candidate": name, "bytes": len(encoded), **tried[name], "tried": tried}
@@ -7,57 +7,207 @@ proper alpha-aware edge handling, crops, and resizes to 600x420.
 Usage:
     python3 process-card.py input.png output.png
     python3 process-card.py input.png output.png --fuzz 30
+
+Batch mode processes a whole directory (or glob) in a process pool and
+writes a manifest of results and timings to batch-manifest.json in the
+asset cache directory, so it never lands among the shipped assets:
+    python3 process-card.py --batch raw/ ../app/assets/cards/
+    python3 process-card.py --batch "raw/*.png" out/ --fuzz-config fuzz.json --workers 4
+
+Outputs are cached by input hash, --fuzz and script version (see
+asset_cache.py); pass --no-cache to always rebuild.
+
+Inputs over 2048x2048 (upscaled 4k/8k art) are processed in row tiles
+from a memory-mapped buffer so memory stays bounded (see tiled_image.py);
+pass --tiled to force that mode for any input.
+
+Outputs are written through png_optimize.py, losslessly by default. Pass
+--lossy to keep the smallest of a 256-color palette, posterized and
+lossless encoding whose difference from the full image stays under its
+error guard (about 1.6x smaller for the current cards), or --no-optimize
+for a plain Pillow save.
+
+Pass --profile out.json to record per-stage time and memory (see
+profiling.py); add --cprofile to also dump the hottest stage's cProfile.
+
+Pass --manifest PATH to write the manifest elsewhere. The fuzz config is a
+JSON object mapping file names (or stems) to --fuzz values, e.g.
+{"white.png": 18, "locomotive": 40}.
 """
 
+import io
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
 from PIL import Image, ImageFilter
 import numpy as np
-from collections import deque
 
+import asset_cache
+import png_optimize
+import profiling
+import tiled_image
+from script_support import collect_inputs, fuzz_for, load_fuzz_overrides
+
+# Where --batch writes its manifest unless --manifest is given
+BATCH_MANIFEST = os.path.join(asset_cache.CACHE_DIR, "batch-manifest.json")
+
+
+def color_distance_sq(img_array, bg_color=None):
+    """Squared RGB distance of every pixel from the background color.
 
-def flood_fill_mask(img_array, tolerance=25):
+    The background color defaults to the top-left pixel. Distances stay in
+    integers so thresholds can be compared exactly against ``tolerance ** 2``
+    and the sqrt is only taken where a real distance is needed.
+    """
+    if bg_color is None:
+        bg_color = img_array[0, 0, :3]
+    dist_sq = np.zeros(img_array.shape[:2], dtype=np.int32)
+    delta = np.empty_like(dist_sq)
+    for channel, value in enumerate(bg_color):
+        # In-place ufuncs into one scratch plane avoid a temporary per step
+        np.subtract(img_array[:, :, channel], int(value), out=delta, dtype=np.int32)
+        np.multiply(delta, delta, out=delta)
+        dist_sq += delta
+    return dist_sq
+
+
+def _row_run_labels(mask):
+    """Label each horizontal run of True pixels; 0 means outside the mask."""
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    labels = np.cumsum(starts.ravel(), dtype=np.int32).reshape(mask.shape)
+    labels[~mask] = 0
+    return labels, int(labels.max(initial=0))
+
+
+def _column_run_labels(mask):
+    """Label each vertical run of True pixels by the flat index of its top pixel.
+
+    Walking down one row at a time keeps every step a contiguous row
+    operation; a column-wise cumsum over a C-ordered image is far slower.
+    Labels of pixels outside the mask are meaningless.
+    """
+    h, w = mask.shape
+    labels = np.arange(h * w, dtype=np.int32).reshape(h, w)
+    continues = mask[1:] & mask[:-1]
+    for y in range(1, h):
+        np.copyto(labels[y], labels[y - 1], where=continues[y - 1])
+    return labels, h * w
+
+
+def _reachable(mask, seeds):
+    """Pixels of ``mask`` 4-connected to a pixel of ``seeds``.
+
+    The fill works on runs rather than pixels: every row run and column run
+    of the mask is labeled once, then reachability is bounced between row
+    runs and column runs until it stops growing. That gives the same
+    4-connected result as a pixel-by-pixel BFS.
+    """
+    row_labels, num_rows = _row_run_labels(mask)
+    col_labels, num_cols = _column_run_labels(mask)
+    pixels = np.flatnonzero(mask)
+    row_of = row_labels.ravel()[pixels]
+    col_of = col_labels.ravel()[pixels]
+
+    row_reached = np.zeros(num_rows + 1, dtype=bool)
+    col_reached = np.zeros(num_cols + 1, dtype=bool)
+    row_reached[row_labels[seeds]] = True
+    row_reached[0] = False
+
+    # Pixels whose row run and column run are both reached can never
+    # spread anything new, so each pass only looks at the rest.
+    live_rows, live_cols = row_of, col_of
+    while live_rows.size:
+        col_reached[live_cols[row_reached[live_rows]]] = True
+        row_reached[live_rows[col_reached[live_cols]]] = True
+        row_done = row_reached[live_rows]
+        col_done = col_reached[live_cols]
+        if np.array_equal(row_done, col_done):
+            break  # nothing left that could cross between runs
+        live = ~(row_done & col_done)
+        live_rows, live_cols = live_rows[live], live_cols[live]
+
+    return row_reached[row_labels]
+
+
+def flood_fill_mask(img_array, tolerance=25, dist_sq=None):
     """Create a background mask using flood fill from all edges.
 
     Unlike a global color threshold, this only marks pixels that are
     reachable from the image border -- so internal light-colored areas
     (like window panes) are preserved.
-    """
-    h, w = img_array.shape[:2]
-    bg_color = img_array[0, 0, :3].astype(np.float64)
-    visited = np.zeros((h, w), dtype=bool)
-    is_background = np.zeros((h, w), dtype=bool)
 
-    # Pre-compute color distance from background for every pixel
-    rgb = img_array[:, :, :3].astype(np.float64)
-    diff = np.sqrt(np.sum((rgb - bg_color) ** 2, axis=2))
+    Pass ``dist_sq`` to reuse a precomputed squared color distance map.
+    """
+    if dist_sq is None:
+        dist_sq = color_distance_sq(img_array)
+    mask = dist_sq <= tolerance * tolerance
 
     # Seed from all border pixels that are close to background color
-    queue = deque()
-    for x in range(w):
-        for y in [0, h - 1]:
-            if diff[y, x] <= tolerance:
-                queue.append((y, x))
-                visited[y, x] = True
-                is_background[y, x] = True
-    for y in range(h):
-        for x in [0, w - 1]:
-            if diff[y, x] <= tolerance and not visited[y, x]:
-                queue.append((y, x))
-                visited[y, x] = True
-                is_background[y, x] = True
-
-    # BFS flood fill
-    while queue:
-        cy, cx = queue.popleft()
-        for dy, dx in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            ny, nx = cy + dy, cx + dx
-            if 0 <= ny < h and 0 <= nx < w and not visited[ny, nx]:
-                visited[ny, nx] = True
-                if diff[ny, nx] <= tolerance:
-                    is_background[ny, nx] = True
-                    queue.append((ny, nx))
-
-    return is_background
+    seeds = np.zeros_like(mask)
+    seeds[[0, -1], :] = mask[[0, -1], :]
+    seeds[:, [0, -1]] = mask[:, [0, -1]]
+    return _reachable(mask, seeds)
+
+
+def flood_fill_mask_tiled(img_array, tolerance=25, tile_rows=tiled_image.TILE_ROWS):
+    """``flood_fill_mask`` for large images, one band of rows at a time.
+
+    Each band is filled from its share of the image border plus whatever
+    its neighbors have reached along the rows they share. A band is
+    refilled only when a neighbor's reach grows onto a background pixel
+    next to it, sweeping down and up until nothing changes, so the result
+    is the same as a whole-image fill. Distances are recomputed per band
+    rather than kept, and the mask lives in a ``tiled_image.scratch``
+    buffer.
+    """
+    h, w = img_array.shape[:2]
+    bg_color = np.array(img_array[0, 0, :3])
+    limit = tolerance * tolerance
+
+    def background(y0, y1):
+        return color_distance_sq(img_array[y0:y1], bg_color) <= limit
+
+    reached = tiled_image.scratch((h, w), dtype=bool)
+    tiles = list(tiled_image.row_tiles(h, tile_rows))
+    dirty = [True] * len(tiles)
+    order = range(len(tiles))
+    while any(dirty):
+        for i in order:
+            if not dirty[i]:
+                continue
+            dirty[i] = False
+            y0, y1 = tiles[i]
+            mask = background(y0, y1)
+            seeds = np.array(reached[y0:y1])
+            seeds[:, [0, -1]] |= mask[:, [0, -1]]
+            seeds[0] |= mask[0] & (reached[y0 - 1] if y0 > 0 else True)
+            seeds[-1] |= mask[-1] & (reached[y1] if y1 < h else True)
+            filled = _reachable(mask, seeds)
+            reached[y0:y1] = filled
+
+            # Wake a neighbor only if this band now touches background
+            # it has not reached yet
+            if y0 > 0 and (filled[0] & ~reached[y0 - 1] & background(y0 - 1, y0)[0]).any():
+                dirty[i - 1] = True
+            if y1 < h and (filled[-1] & ~reached[y1] & background(y1, y1 + 1)[0]).any():
+                dirty[i + 1] = True
+        order = order[::-1]
+    return reached
+
+
+def soft_alpha_table(fuzz):
+    """Alpha for each squared distance in the soft edge zone, ``0 .. 4 * fuzz**2``.
+
+    Edge pixels not reached by the fill are scaled by how far they are
+    from the background color; indexing this table with the integer
+    squared distance avoids a float sqrt per pixel.
+    """
+    color_dist = np.sqrt(np.arange(4 * fuzz * fuzz), dtype=np.float64)
+    return np.clip((color_dist - fuzz * 0.5) / (fuzz * 1.5) * 255, 0, 255).astype(np.uint8)
 
 
 def remove_background(img, fuzz=30):
@@ -65,28 +215,30 @@ def remove_background(img, fuzz=30):
     rgba = img.convert("RGBA")
     data = np.array(rgba)
 
+    # One distance map drives both the flood fill and the soft edges
+    with profiling.stage("distance"):
+        dist_sq = color_distance_sq(data)
+
     print("  Flood filling from edges...")
-    bg_mask = flood_fill_mask(data, tolerance=fuzz)
+    with profiling.stage("flood_fill"):
+        bg_mask = flood_fill_mask(data, tolerance=fuzz, dist_sq=dist_sq)
 
     # For pixels right at the boundary between bg and subject,
     # compute a soft alpha based on color distance from background.
     # This handles anti-aliased edges gracefully.
-    bg_color = data[0, 0, :3].astype(np.float64)
-    rgb = data[:, :, :3].astype(np.float64)
-    color_dist = np.sqrt(np.sum((rgb - bg_color) ** 2, axis=2))
 
     # Create alpha channel:
     # - Background pixels (flood-filled): fully transparent
     # - Subject pixels far from bg color: fully opaque
     # - Edge pixels near bg color but not flood-filled: partial alpha
-    alpha = np.full(data.shape[:2], 255, dtype=np.uint8)
-    alpha[bg_mask] = 0
+    with profiling.stage("soft_alpha"):
+        alpha = np.full(data.shape[:2], 255, dtype=np.uint8)
+        alpha[bg_mask] = 0
 
-    # Soft edge: for non-background pixels within 2x the fuzz range,
-    # scale alpha by how far they are from the background color
-    edge_zone = (~bg_mask) & (color_dist < fuzz * 2)
-    edge_alpha = np.clip((color_dist[edge_zone] - fuzz * 0.5) / (fuzz * 1.5) * 255, 0, 255)
-    alpha[edge_zone] = edge_alpha.astype(np.uint8)
+        # Soft edge: for non-background pixels within 2x the fuzz range,
+        # scale alpha by how far they are from the background color
+        edge_zone = (~bg_mask) & (dist_sq < 4 * fuzz * fuzz)
+        alpha[edge_zone] = soft_alpha_table(fuzz)[dist_sq[edge_zone]]
 
     data[:, :, 3] = alpha
     return Image.fromarray(data)
@@ -105,53 +257,323 @@ def crop_to_content(img, padding=2):
     return img.crop((x1, y1, x2, y2))
 
 
-def fit_to_canvas(img, width=600, height=420):
-    """Resize to fit within canvas and center with transparent padding."""
+def _fit_size(img_w, img_h, width, height):
+    """Size of an ``img_w`` x ``img_h`` image scaled into the canvas margins."""
     margin = 0.03  # 3% margin on each side
     target_w = int(width * (1 - 2 * margin))
     target_h = int(height * (1 - 2 * margin))
 
-    ratio = min(target_w / img.width, target_h / img.height)
-    new_w = int(img.width * ratio)
-    new_h = int(img.height * ratio)
-    resized = img.resize((new_w, new_h), Image.LANCZOS)
+    ratio = min(target_w / img_w, target_h / img_h)
+    return int(img_w * ratio), int(img_h * ratio)
+
 
+def _center_on_canvas(resized, width, height):
     canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    x = (width - new_w) // 2
-    y = (height - new_h) // 2
+    x = (width - resized.width) // 2
+    y = (height - resized.height) // 2
     canvas.paste(resized, (x, y), resized)
-
     return canvas
 
 
-def main():
-    if len(sys.argv) < 3:
-        print("Usage: python3 process-card.py input.png output.png [--fuzz N]")
-        sys.exit(1)
+def fit_to_canvas(img, width=600, height=420):
+    """Resize to fit within canvas and center with transparent padding."""
+    new_w, new_h = _fit_size(img.width, img.height, width, height)
+    with profiling.stage("resize"):
+        resized = img.resize((new_w, new_h), Image.LANCZOS)
+    return _center_on_canvas(resized, width, height)
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2]
-    fuzz = 30
 
-    if "--fuzz" in sys.argv:
-        idx = sys.argv.index("--fuzz")
-        fuzz = int(sys.argv[idx + 1])
+def remove_background_tiled(data, fuzz=30, tile_rows=tiled_image.TILE_ROWS):
+    """``remove_background`` in place on a large RGBA array, a band at a time.
+
+    Returns the bounding box (x1, y1, x2, y2) of the non-transparent pixels,
+    like ``Image.getbbox``, or None if everything was removed.
+    """
+    print("  Flood filling from edges (tiled)...")
+    with profiling.stage("flood_fill"):
+        bg_mask = flood_fill_mask_tiled(data, tolerance=fuzz, tile_rows=tile_rows)
+
+    with profiling.stage("soft_alpha"):
+        bg_color = np.array(data[0, 0, :3])
+        table = soft_alpha_table(fuzz)
+        rows = np.zeros(data.shape[0], dtype=bool)
+        cols = np.zeros(data.shape[1], dtype=bool)
+        for y0, y1 in tiled_image.row_tiles(data.shape[0], tile_rows):
+            dist_sq = color_distance_sq(data[y0:y1], bg_color)
+            reached = np.asarray(bg_mask[y0:y1])
+            alpha = np.where(reached, np.uint8(0), np.uint8(255))
+            edge_zone = ~reached & (dist_sq < 4 * fuzz * fuzz)
+            alpha[edge_zone] = table[dist_sq[edge_zone]]
+            data[y0:y1, :, 3] = alpha
+
+            visible = alpha != 0
+            rows[y0:y1] = visible.any(axis=1)
+            cols |= visible.any(axis=0)
+
+    if not rows.any():
+        return None
+    y_idx, x_idx = np.flatnonzero(rows), np.flatnonzero(cols)
+    return int(x_idx[0]), int(y_idx[0]), int(x_idx[-1]) + 1, int(y_idx[-1]) + 1
+
+
+def _process_large(input_path, fuzz, timings):
+    """The ``process_card`` pipeline for inputs too big to hold as arrays.
+
+    Decodes into a memory-mapped buffer and keeps every full-size step in
+    row tiles; the final resize reads the cropped region band by band.
+    """
+    start = time.perf_counter()
+    with profiling.stage("decode"):
+        data = tiled_image.decode_to_memmap(input_path, "RGBA")
+    timings["decode"] = time.perf_counter() - start
+    h, w = data.shape[:2]
+    print(f"Input: ({w}, {h}), tiled")
+
+    start = time.perf_counter()
+    with profiling.stage("remove_background"):
+        bbox = remove_background_tiled(data, fuzz=fuzz)
+    timings["remove_background"] = time.perf_counter() - start
+    print("  Background removed")
+
+    # Same padding as crop_to_content
+    padding = 2
+    if bbox is None:
+        bbox = (0, 0, w, h)
+    else:
+        bbox = (max(0, bbox[0] - padding), max(0, bbox[1] - padding),
+                min(w, bbox[2] + padding), min(h, bbox[3] + padding))
+    crop_w, crop_h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    print(f"  Cropped to content: ({crop_w}, {crop_h})")
+
+    start = time.perf_counter()
+    with profiling.stage("fit_to_canvas"):
+        width, height = 600, 420
+        size = _fit_size(crop_w, crop_h, width, height)
+        with profiling.stage("resize"):
+            resized = tiled_image.resize(data, bbox, size)
+        img = _center_on_canvas(resized, width, height)
+    timings["fit_to_canvas"] = time.perf_counter() - start
+    print(f"  Final: {img.size}")
+    return img
+
 
-    img = Image.open(input_path)
+def card_image(input_path, fuzz=30, tiled=False, timings=None):
+    """Decode ``input_path`` and return the finished 600x420 RGBA card image.
+
+    Inputs over ``tiled_image.LARGE_INPUT_PIXELS`` (or any input, with
+    ``tiled``) go through the bounded-memory tiled pipeline. Per-stage
+    timings are added to ``timings`` if given.
+    """
+    timings = {} if timings is None else timings
+    with Image.open(input_path) as probe:
+        tiled = tiled or tiled_image.is_large(probe.size)
+    if tiled:
+        return _process_large(input_path, fuzz, timings)
+
+    start = time.perf_counter()
+    with profiling.stage("decode"):
+        img = Image.open(input_path)
+        img.load()
+    timings["decode"] = time.perf_counter() - start
     print(f"Input: {img.size}, mode={img.mode}")
 
-    img = remove_background(img, fuzz=fuzz)
+    start = time.perf_counter()
+    with profiling.stage("remove_background"):
+        img = remove_background(img, fuzz=fuzz)
+    timings["remove_background"] = time.perf_counter() - start
     print("  Background removed")
 
-    img = crop_to_content(img)
+    start = time.perf_counter()
+    with profiling.stage("crop_to_content"):
+        img = crop_to_content(img)
+    timings["crop_to_content"] = time.perf_counter() - start
     print(f"  Cropped to content: {img.size}")
 
-    img = fit_to_canvas(img)
+    start = time.perf_counter()
+    with profiling.stage("fit_to_canvas"):
+        img = fit_to_canvas(img)
+    timings["fit_to_canvas"] = time.perf_counter() - start
     print(f"  Final: {img.size}")
+    return img
 
-    img.save(output_path)
+
+def save_card(img, output_path, optimize="lossless", timings=None):
+    """Write a finished card, through ``png_optimize`` unless ``optimize`` is "none".
+
+    "lossless" limits the optimizer to the lossless candidate; "auto"
+    also lets it pick a lossy one that passes its error guard.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    with profiling.stage("save"):
+        if optimize == "none":
+            img.save(output_path)
+        else:
+            report = png_optimize.save_optimized(img, output_path, lossless=optimize == "lossless")
+    timings["save"] = time.perf_counter() - start
+    if optimize != "none":
+        print(f"  Optimized ({report['candidate']}, max error {report['max_error']},"
+              f" band error {report['band_error']}, mean error {report['mean_error']}):"
+              f" {report['bytes'] / 1024:.0f} KB")
     print(f"  Saved to: {output_path}")
 
 
+def process_card(input_path, output_path, fuzz=30, use_cache=True, tiled=False, optimize="lossless"):
+    """Run the full pipeline on one file.
+
+    See ``card_image`` and ``save_card``. Returns the per-stage timings
+    and the cache status; timings are empty when the output was already
+    up to date.
+    """
+    timings = {}
+
+    with profiling.stage("cache"):
+        cache = asset_cache.lookup(
+            __file__, [input_path], {"fuzz": fuzz, "tiled": tiled, "optimize": optimize}, output_path, enabled=use_cache
+        )
+    if cache.fresh:
+        print(f"Up to date ({cache.status}): {output_path}")
+        return timings, cache.status
+
+    img = card_image(input_path, fuzz=fuzz, tiled=tiled, timings=timings)
+    save_card(img, output_path, optimize=optimize, timings=timings)
+
+    with profiling.stage("cache"):
+        cache.store()
+    return timings, cache.status
+
+
+def _batch_worker(input_path, output_path, fuzz, use_cache, profile=False, tiled=False,
+                  optimize="lossless"):
+    """Process one file in a pool worker, capturing its progress output."""
+    entry = {"input": input_path, "output": output_path, "fuzz": fuzz}
+    if profile:
+        profiling.start()
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()):
+            entry["timings"], entry["cache"] = process_card(
+                input_path, output_path, fuzz=fuzz, use_cache=use_cache, tiled=tiled,
+                optimize=optimize,
+            )
+        entry["status"] = "ok"
+        entry["bytes"] = os.path.getsize(output_path)
+    except Exception as e:
+        entry["status"] = "error"
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = time.perf_counter() - start
+    if profile:
+        entry["profile"] = profiling.stop()
+    return entry
+
+
+def run_batch(source, output_dir, default_fuzz=30, overrides=None, workers=None,
+              manifest_path=None, use_cache=True, tiled=False, optimize="lossless"):
+    """Process every card in ``source`` in parallel and write a manifest.
+
+    The pool defaults to one worker per CPU. The manifest goes to
+    ``BATCH_MANIFEST`` unless ``manifest_path`` is given.
+    """
+    overrides = overrides or {}
+    inputs = collect_inputs(source)
+    if not inputs:
+        print(f"No PNG files found for: {source}")
+        return None
+
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, len(inputs))
+    print(f"Processing {len(inputs)} files with {workers} workers")
+
+    start = time.perf_counter()
+    entries = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _batch_worker,
+                path,
+                os.path.join(output_dir, os.path.basename(path)),
+                fuzz_for(path, default_fuzz, overrides),
+                use_cache,
+                profiling.active(),
+                tiled,
+                optimize,
+            )
+            for path in inputs
+        ]
+        for future in as_completed(futures):
+            entry = future.result()
+            profiling.merge(entry.pop("profile", None))
+            entries.append(entry)
+            if entry["status"] == "ok":
+                print(f"  {entry['input']} (fuzz {entry['fuzz']}, {entry['cache']}): {entry['seconds']:.2f}s")
+            else:
+                print(f"  {entry['input']} FAILED: {entry['error']}")
+
+    manifest = {
+        "source": source,
+        "output_dir": output_dir,
+        "workers": workers,
+        "total_seconds": time.perf_counter() - start,
+        "files": sorted(entries, key=lambda e: e["input"]),
+    }
+    manifest_path = manifest_path or BATCH_MANIFEST
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    failed = sum(1 for e in entries if e["status"] != "ok")
+    print(f"Done in {manifest['total_seconds']:.2f}s, {failed} failed. Manifest: {manifest_path}")
+    return manifest
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python3 process-card.py input.png output.png [--fuzz N] [--no-cache] [--tiled]"
+              " [--lossy | --no-optimize]")
+        print("       python3 process-card.py --batch INPUT_DIR_OR_GLOB OUTPUT_DIR"
+              " [--fuzz N] [--fuzz-config fuzz.json] [--workers N] [--manifest PATH]")
+        print("       add --profile out.json [--cprofile] to either for a per-stage profile")
+        sys.exit(1)
+
+    fuzz = 30
+    use_cache = "--no-cache" not in sys.argv
+    tiled = "--tiled" in sys.argv
+    optimize = "lossless"
+    if "--lossy" in sys.argv:
+        optimize = "auto"
+    if "--no-optimize" in sys.argv:
+        optimize = "none"
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
+    if "--fuzz" in sys.argv:
+        idx = sys.argv.index("--fuzz")
+        fuzz = int(sys.argv[idx + 1])
+
+    if "--batch" in sys.argv:
+        idx = sys.argv.index("--batch")
+        source, output_dir = sys.argv[idx + 1], sys.argv[idx + 2]
+        overrides = {}
+        workers = None
+        manifest_path = None
+        if "--fuzz-config" in sys.argv:
+            overrides = load_fuzz_overrides(sys.argv[sys.argv.index("--fuzz-config") + 1])
+        if "--workers" in sys.argv:
+            workers = int(sys.argv[sys.argv.index("--workers") + 1])
+        if "--manifest" in sys.argv:
+            manifest_path = sys.argv[sys.argv.index("--manifest") + 1]
+        manifest = run_batch(
+            source, output_dir, fuzz, overrides, workers, manifest_path, use_cache, tiled, optimize
+        )
+        if manifest is None or any(e["status"] != "ok" for e in manifest["files"]):
+            sys.exit(1)
+        return
+
+    process_card(sys.argv[1], sys.argv[2], fuzz=fuzz, use_cache=use_cache, tiled=tiled,
+                 optimize=optimize)
+
+
 if __name__ == "__main__":
     main()
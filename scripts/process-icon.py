@@ -1,17 +1,32 @@
 #!/usr/bin/env python3
-"""Post-process app icon: crop to content, pad to square, resize to 1024x1024."""
+"""Post-process app icon: crop to content, pad to square, resize to 1024x1024.
+
+Inputs over 2048x2048 are decoded into a memory-mapped buffer and scanned
+in row tiles (see tiled_image.py); pass --tiled to force that for any input.
+
+Pass --profile out.json [--cprofile] for a per-stage profile (see profiling.py).
+"""
 import sys
 from PIL import Image
 import numpy as np
 
+import asset_cache
+import profiling
+import tiled_image
+from icon_layout import content_bounds, content_bounds_tiled, detect_background, pad_to_square
+
 def main():
     if len(sys.argv) < 3:
-        print("Usage: python process-icon.py input.png output.png [--bg-color R,G,B] [--padding PERCENT]")
+        print("Usage: python process-icon.py input.png output.png [--bg-color R,G,B] [--padding PERCENT] [--no-cache] [--tiled] [--profile out.json [--cprofile]]")
         sys.exit(1)
 
     input_path = sys.argv[1]
     output_path = sys.argv[2]
 
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
     # Parse optional args
     bg_color = (45, 38, 34)  # #2D2622 dark wood
     padding_pct = 5  # percent padding around content
@@ -23,47 +38,57 @@ def main():
         idx = sys.argv.index("--padding") + 1
         padding_pct = int(sys.argv[idx])
 
-    img = Image.open(input_path).convert("RGB")
-    data = np.array(img)
-    print(f"Input: {img.size}")
+    params = {"bg_color": list(bg_color), "padding": padding_pct}
+    with profiling.stage("cache"):
+        cache = asset_cache.lookup(
+            __file__, [input_path], params, output_path, enabled="--no-cache" not in sys.argv
+        )
+    if cache.fresh:
+        print(f"Up to date ({cache.status}): {output_path}")
+        return
+
+    with Image.open(input_path) as probe:
+        size = probe.size
+    tiled = "--tiled" in sys.argv or tiled_image.is_large(size)
+    with profiling.stage("decode"):
+        if tiled:
+            data = tiled_image.decode_to_memmap(input_path, "RGB")
+        else:
+            img = Image.open(input_path).convert("RGB")
+            data = np.array(img)
+    print(f"Input: {size}" + (", tiled" if tiled else ""))
 
     # Find content bounds - pixels that differ significantly from the background
     # Sample background color from corners
-    corners = [data[0, 0], data[0, -1], data[-1, 0], data[-1, -1]]
-    avg_bg = np.mean(corners, axis=0)
+    avg_bg = detect_background(data)
     print(f"Detected background: RGB({avg_bg[0]:.0f}, {avg_bg[1]:.0f}, {avg_bg[2]:.0f})")
 
-    # Mask of content pixels (differ from background by more than threshold)
-    diff = np.abs(data.astype(float) - avg_bg).max(axis=2)
-    content_mask = diff > 20
-
-    # Find bounding box of content
-    rows = np.any(content_mask, axis=1)
-    cols = np.any(content_mask, axis=0)
-    y_min, y_max = np.where(rows)[0][[0, -1]]
-    x_min, x_max = np.where(cols)[0][[0, -1]]
+    with profiling.stage("content_bounds"):
+        bounds = content_bounds_tiled if tiled else content_bounds
+        x_min, y_min, x_max, y_max = bounds(data, avg_bg)
     print(f"Content bounds: ({x_min}, {y_min}) to ({x_max}, {y_max})")
 
     # Crop to content
-    cropped = img.crop((x_min, y_min, x_max + 1, y_max + 1))
+    if tiled:
+        cropped = Image.fromarray(np.ascontiguousarray(data[y_min:y_max + 1, x_min:x_max + 1]))
+    else:
+        cropped = img.crop((x_min, y_min, x_max + 1, y_max + 1))
     cw, ch = cropped.size
     print(f"Cropped: {cw}x{ch}")
 
     # Pad to square
-    side = max(cw, ch)
-    padding = int(side * padding_pct / 100)
-    canvas_size = side + 2 * padding
-
-    canvas = Image.new("RGB", (canvas_size, canvas_size), bg_color)
-    paste_x = (canvas_size - cw) // 2
-    paste_y = (canvas_size - ch) // 2
-    canvas.paste(cropped, (paste_x, paste_y))
-    print(f"Padded to: {canvas_size}x{canvas_size}")
+    with profiling.stage("pad"):
+        canvas = pad_to_square(cropped, bg_color, padding_pct)
+    print(f"Padded to: {canvas.width}x{canvas.height}")
 
     # Resize to 1024x1024
-    final = canvas.resize((1024, 1024), Image.LANCZOS)
-    final.save(output_path)
+    with profiling.stage("resize"):
+        final = canvas.resize((1024, 1024), Image.LANCZOS)
+    with profiling.stage("save"):
+        final.save(output_path)
     print(f"Saved: {output_path} (1024x1024)")
+    with profiling.stage("cache"):
+        cache.store()
 
 
 if __name__ == "__main__":
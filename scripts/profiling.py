@@ -0,0 +1,206 @@
+"""Per-stage timing and memory instrumentation shared by the asset scripts.
+
+Scripts mark their stages, and the marks cost nothing unless profiling
+was started, which the scripts do for ``--profile out.json``:
+
+    profiling.start("out.json", cprofile=True)
+    with profiling.stage("decode"):
+        img = Image.open(path)
+        img.load()
+    frames = profiling.iterate("render", frame_generator)
+
+For each stage the report records how many times it ran and its wall
+time. Time spent in nested stages is not counted again, so a streaming
+encode that pulls frames from a render stage only reports its own
+encoding work. The report also records the stage's peak and net
+tracemalloc allocations, which include NumPy arrays. The report is
+written when the script exits, along with the process's peak RSS.
+
+With ``cprofile=True``, every stage also runs under its own cProfile
+profiler. The stats for the hottest stage, by own time, are dumped next
+to the report as ``out.prof`` for ``python -m pstats`` or snakeviz.
+
+Pool workers do not share the parent's profiler. They call ``start()``
+themselves, return ``stop()``'s stage records with their results, and
+the parent folds them in with ``merge()``.
+"""
+
+import atexit
+import cProfile
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from script_support import peak_rss_kb
+
+_active = None
+
+
+class _Frame:
+    """One running stage on the stack."""
+
+    def __init__(self, name, start_memory):
+        self.name = name
+        self.start = time.perf_counter()
+        self.child_seconds = 0.0
+        self.start_memory = start_memory
+        self.peak_memory = start_memory
+        self.cprofile = None
+
+
+def _stage_record():
+    return {"calls": 0, "seconds": 0.0, "total_seconds": 0.0, "peak_bytes": 0, "net_bytes": 0}
+
+
+class Profiler:
+    """Collects stage records for one process."""
+
+    def __init__(self, path=None, cprofile=False):
+        self.path = path
+        self.use_cprofile = cprofile
+        self.stages = {}
+        self.cprofiles = {}
+        self.stack = []
+        self.started = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = self.stages.setdefault(name, _stage_record())  # report in first-entry order
+        current, peak = tracemalloc.get_traced_memory()
+        parent = self.stack[-1] if self.stack else None
+        if parent is not None:
+            parent.peak_memory = max(parent.peak_memory, peak)
+            if parent.cprofile is not None:
+                parent.cprofile.disable()
+        tracemalloc.reset_peak()
+
+        frame = _Frame(name, current)
+        self.stack.append(frame)
+        if self.use_cprofile:
+            frame.cprofile = self.cprofiles.setdefault(name, cProfile.Profile())
+            frame.cprofile.enable()
+        try:
+            yield
+        finally:
+            if frame.cprofile is not None:
+                frame.cprofile.disable()
+            elapsed = time.perf_counter() - frame.start
+            current, peak = tracemalloc.get_traced_memory()
+            frame.peak_memory = max(frame.peak_memory, peak)
+            tracemalloc.reset_peak()
+            self.stack.pop()
+
+            record["calls"] += 1
+            record["total_seconds"] += elapsed
+            record["seconds"] += elapsed - frame.child_seconds
+            record["peak_bytes"] = max(record["peak_bytes"], frame.peak_memory - frame.start_memory)
+            record["net_bytes"] += current - frame.start_memory
+
+            if parent is not None:
+                parent.child_seconds += elapsed
+                parent.peak_memory = max(parent.peak_memory, frame.peak_memory)
+                if parent.cprofile is not None:
+                    parent.cprofile.enable()
+
+    def iterate(self, name, iterable):
+        """Yield from ``iterable``, timing each item's production as ``name``."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def merge(self, stages):
+        """Fold stage records from another process into this one."""
+        for name, other in stages.items():
+            record = self.stages.setdefault(name, _stage_record())
+            for key in ("calls", "seconds", "total_seconds", "net_bytes"):
+                record[key] += other[key]
+            record["peak_bytes"] = max(record["peak_bytes"], other["peak_bytes"])
+
+    def hottest(self):
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda name: self.stages[name]["seconds"])
+
+    def report(self):
+        hottest = self.hottest()
+        report = {
+            "script": os.path.basename(sys.argv[0]),
+            "argv": sys.argv[1:],
+            "total_seconds": time.perf_counter() - self.started,
+            "peak_rss_kb": peak_rss_kb(),
+            "hottest_stage": hottest,
+            "stages": self.stages,
+        }
+        if hottest in self.cprofiles and self.path:
+            report["cprofile"] = os.path.splitext(self.path)[0] + ".prof"
+            self.cprofiles[hottest].dump_stats(report["cprofile"])
+        return report
+
+    def write(self):
+        report = self.report()
+        with open(self.path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        print(f"\nProfile ({report['total_seconds']:.2f}s, peak RSS {report['peak_rss_kb'] / 1024:.0f} MB):")
+        for name, record in self.stages.items():
+            print(
+                f"  {name:<18} {record['seconds']:8.3f}s  x{record['calls']:<4}"
+                f" peak {record['peak_bytes'] / 1e6:7.1f} MB"
+            )
+        written = f"Profile written to {self.path}"
+        if "cprofile" in report:
+            written += f", cProfile: {report['cprofile']}"
+        print(written)
+
+
+def start(path=None, cprofile=False):
+    """Begin profiling this process; the report goes to ``path`` at exit."""
+    global _active
+    _active = Profiler(path, cprofile)
+    if path:
+        atexit.register(_active.write)
+    return _active
+
+
+def stop():
+    """Stop profiling and return the stage records collected so far."""
+    global _active
+    profiler, _active = _active, None
+    if profiler is None:
+        return {}
+    tracemalloc.stop()
+    return profiler.stages
+
+
+def stage(name):
+    """Context manager timing ``name``; a no-op unless profiling is active."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def iterate(name, iterable):
+    """Time each item produced by ``iterable`` as stage ``name``."""
+    if _active is None:
+        return iterable
+    return _active.iterate(name, iterable)
+
+
+def merge(stages):
+    """Fold a worker's stage records into the active profile, if any."""
+    if _active is not None and stages:
+        _active.merge(stages)
+
+
+def active():
+    return _active is not None
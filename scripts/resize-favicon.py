@@ -1,9 +1,41 @@
 #!/usr/bin/env python3
-"""Resize an image to favicon size (48x48)."""
+"""Resize an image to favicon size (48x48).
+
+Pass --profile out.json [--cprofile] for a per-stage profile (see profiling.py).
+"""
 import sys
 from PIL import Image
 
-img = Image.open(sys.argv[1])
-favicon = img.resize((48, 48), Image.LANCZOS)
-favicon.save(sys.argv[2])
-print(f"Saved {sys.argv[2]} ({favicon.size})")
+import asset_cache
+import profiling
+
+
+def main():
+    input_path, output_path = sys.argv[1], sys.argv[2]
+
+    if "--profile" in sys.argv:
+        profile_path = sys.argv[sys.argv.index("--profile") + 1]
+        profiling.start(profile_path, cprofile="--cprofile" in sys.argv)
+
+    with profiling.stage("cache"):
+        cache = asset_cache.lookup(
+            __file__, [input_path], {"size": 48}, output_path, enabled="--no-cache" not in sys.argv
+        )
+    if cache.fresh:
+        print(f"Up to date ({cache.status}): {output_path}")
+        return
+
+    with profiling.stage("decode"):
+        img = Image.open(input_path)
+        img.load()
+    with profiling.stage("resize"):
+        favicon = img.resize((48, 48), Image.LANCZOS)
+    with profiling.stage("save"):
+        favicon.save(output_path)
+    print(f"Saved {output_path} ({favicon.size})")
+    with profiling.stage("cache"):
+        cache.store()
+
+
+if __name__ == "__main__":
+    main()
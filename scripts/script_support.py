@@ -0,0 +1,71 @@
+"""Helpers shared by the scripts that load and measure other scripts.
+
+The asset scripts have hyphenated names, so the build, benchmark and
+worker scripts cannot ``import`` them and use ``load_script`` instead:
+
+    card = script_support.load_script("process-card.py")
+    img = card.card_image("raw/red.png")
+
+``peak_rss_kb`` is the process's peak resident set size, as reported by
+the benchmark and by profiling.py. ``collect_inputs``,
+``load_fuzz_overrides`` and ``fuzz_for`` read card inputs and
+--fuzz-config the same way for process-card.py --batch and
+build-assets.py.
+"""
+
+import glob
+import importlib.util
+import json
+import os
+import resource
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_script(name):
+    """Import a hyphen-named script from this directory as a module."""
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    path = os.path.join(SCRIPTS_DIR, name)
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_")[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB.
+
+    Reads VmHWM, which starts afresh at exec; ru_maxrss can carry over the
+    high-water mark of the parent that forked us.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def collect_inputs(source):
+    """Expand a directory or glob into a sorted list of PNG paths."""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "*.png")))
+    return sorted(p for p in glob.glob(source) if os.path.isfile(p))
+
+
+def load_fuzz_overrides(config_path):
+    """Read a JSON object mapping file names or stems to --fuzz values."""
+    with open(config_path) as f:
+        overrides = json.load(f)
+    return {str(name): int(value) for name, value in overrides.items()}
+
+
+def fuzz_for(input_path, default_fuzz, overrides):
+    """Pick the fuzz for a file: exact file name first, then stem, then default."""
+    name = os.path.basename(input_path)
+    stem = os.path.splitext(name)[0]
+    return overrides.get(name, overrides.get(stem, default_fuzz))
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Monte Carlo simulation of the server's deck, face-up and reshuffle logic.
+
+Plays many games at once as NumPy arrays, following server/src/server.ts
+and gameLogic.ts: a 110-card deck (12 of each of 8 colors, 14
+locomotives), 4-card starting hands, five face-up cards that are all
+discarded and redealt while more than two are locomotives, a face-up
+locomotive only as the first draw (ending the turn), two draws per turn
+otherwise, and the discard pile shuffled back in only when a draw finds
+the deck empty. A face-up card taken while the deck is empty is not
+replaced, so the row can shrink.
+
+Every pile is held as per-color counts, one column per game: drawing from a
+shuffled deck is the same as drawing a color with probability
+proportional to its count, and a reshuffle just moves the discard counts
+into the deck. Each turn is then a few array operations over every game.
+
+Players claim a route as their first action whenever their largest
+single-color set plus locomotives reaches their current target length
+(uniform over 1-6, redrawn after each claim); the cards go to the
+discard pile and the turn ends. Otherwise they draw by strategy:
+
+- deck: always the deck
+- greedy: a face-up locomotive if it can be taken, else the face-up
+  color the player already holds most of
+- random: a fair coin between the deck and a random face-up card
+
+A deck draw that finds both the deck and the discard pile empty is the
+server's "No cards left in deck" error; the player then takes a face-up
+card if one is allowed, or ends the turn.
+
+For each player count and strategy it reports the distribution over
+games of reshuffles, empty-deck errors, locomotive redeals and turns
+started with fewer than five face-up cards, and of hand sizes at the end.
+
+Usage:
+    python3 simulate-deck.py
+    python3 simulate-deck.py --games 1000000 --players 4,5 --strategies deck,greedy
+    python3 simulate-deck.py --rounds 80 --output deck-sim.json
+
+--rounds is turns per player. Games run in batches of --batch to bound
+memory. --seed makes runs repeatable.
+"""
+
+import json
+import sys
+import time
+
+import numpy as np
+
+# Mirrors server/src/gameLogic.ts
+REGULAR_COLORS = ("red", "orange", "yellow", "green", "blue", "purple", "black", "white")
+CARDS_PER_COLOR = 12
+LOCOMOTIVE_COUNT = 14
+INITIAL_HAND_SIZE = 4
+FACE_UP_COUNT = 5
+MAX_FACE_UP_LOCOMOTIVES = 2
+
+LOCO = len(REGULAR_COLORS)
+NUM_COLORS = LOCO + 1
+DECK = np.array([CARDS_PER_COLOR] * len(REGULAR_COLORS) + [LOCOMOTIVE_COUNT], dtype=np.int16)
+
+ROUTE_LENGTHS = (1, 6)  # inclusive range of target route lengths
+STRATEGIES = ("deck", "greedy", "random")
+PERCENTILES = (50, 90, 99)
+
+
+# NumPy's cumsum and argmax along the first axis of a (colors, games) array
+# are many times slower than a few whole-row operations, so these do it by row.
+
+def cumulative(counts):
+    """Running totals over the colors of (colors, games) counts."""
+    out = np.empty_like(counts)
+    out[0] = counts[0]
+    for color in range(1, len(counts)):
+        np.add(out[color - 1], counts[color], out=out[color])
+    return out
+
+
+def best_color(values):
+    """(color, value) of the largest of (colors, games) values; ties go to the first color."""
+    # The value in the high bits and the color reversed in the low four
+    keys = values.astype(np.int32) * 16 + (15 - np.arange(len(values), dtype=np.int32))[:, None]
+    best = keys[0].copy()
+    for row in keys[1:]:
+        np.maximum(best, row, out=best)
+    return 15 - (best & 15), best >> 4
+
+
+def sample(counts, rng):
+    """A color for each game with probability proportional to its count; -1 for none."""
+    totals = cumulative(counts)
+    r = (rng.random(counts.shape[1]) * totals[-1]).astype(np.int16)
+    color = (totals <= r).sum(axis=0)
+    return np.where(totals[-1] > 0, color, -1)
+
+
+class Games:
+    """The card state of a batch of games.
+
+    Piles are (colors, games) count arrays, so summing or scanning over
+    the nine colors runs over contiguous rows of games.
+    """
+
+    def __init__(self, num_games, num_players, rng):
+        self.rng = rng
+        self.num_games = num_games
+        self.deck = np.repeat(DECK[:, None], num_games, axis=1)
+        self.discard = np.zeros((NUM_COLORS, num_games), dtype=np.int16)
+        self.face = np.zeros((NUM_COLORS, num_games), dtype=np.int16)
+        self.hands = np.zeros((num_players, NUM_COLORS, num_games), dtype=np.int16)
+        self.targets = self.new_targets((num_players, num_games))
+
+        self.reshuffles = np.zeros(num_games, dtype=np.int32)
+        self.empty_deck = np.zeros(num_games, dtype=np.int32)
+        self.redeals = np.zeros(num_games, dtype=np.int32)
+        self.short_face_up = np.zeros(num_games, dtype=np.int32)
+        self.claims = np.zeros(num_games, dtype=np.int32)
+
+        everyone = np.arange(num_games)
+        for player in range(num_players):
+            for _ in range(INITIAL_HAND_SIZE):
+                self.add(self.hands[player], everyone, self.draw(self.deck, everyone))
+        for _ in range(FACE_UP_COUNT):
+            self.add(self.face, everyone, self.draw(self.deck, everyone))
+        self.redeal_locomotives(everyone, count=False)
+
+    def new_targets(self, shape):
+        return self.rng.integers(ROUTE_LENGTHS[0], ROUTE_LENGTHS[1] + 1, shape, dtype=np.int16)
+
+    # --- Primitives ------------------------------------------------------------
+    #
+    # ``games`` arguments are index arrays of the games a step applies to;
+    # colors come back aligned with them, -1 where there was no card.
+
+    def draw(self, counts, games):
+        """Take a random card out of ``counts`` for each of ``games``."""
+        color = sample(np.take(counts, games, axis=1), self.rng)
+        self.add(counts, games, color, -1)
+        return color
+
+    def add(self, counts, games, color, n=1):
+        # Each game appears once, so a plain fancy-indexed add is safe
+        ok = color >= 0
+        counts[color[ok], games[ok]] += n
+
+    def reshuffle(self, games):
+        """reshuffleDiscardIntoDeck for those of ``games`` whose deck is empty."""
+        games = games[(self.deck[:, games].sum(axis=0) == 0) & (self.discard[:, games].sum(axis=0) > 0)]
+        self.deck[:, games] += self.discard[:, games]
+        self.discard[:, games] = 0
+        self.reshuffles[games] += 1
+
+    def redeal_locomotives(self, games, count=True):
+        """checkLocomotiveRefresh: redeal the row while it shows 3+ locomotives."""
+        while True:
+            games = games[self.face[LOCO, games] > MAX_FACE_UP_LOCOMOTIVES]
+            if games.size == 0:
+                return
+            if count:
+                self.redeals[games] += 1
+            self.discard[:, games] += self.face[:, games]
+            self.face[:, games] = 0
+            for _ in range(FACE_UP_COUNT):
+                self.add(self.face, games, self.draw(self.deck, games))
+
+    # --- Turn --------------------------------------------------------------------
+
+    def claim(self, player):
+        """Claim a route with the current player's best set where it reaches the target.
+
+        Returns a mask of the games where the player claimed.
+        """
+        hand = self.hands[player]
+        target = self.targets[player]
+        color, colored = best_color(hand[:LOCO])
+        games = np.arange(self.num_games)
+        claims = colored + hand[LOCO] >= target
+
+        from_color = np.minimum(colored, target) * claims
+        from_loco = (target - from_color) * claims
+        hand[color, games] -= from_color
+        hand[LOCO] -= from_loco
+        self.discard[color, games] += from_color
+        self.discard[LOCO] += from_loco
+        target[claims] = self.new_targets(int(claims.sum()))
+        self.claims += claims
+        return claims
+
+    def face_choice(self, strategy, hand, first, games):
+        """The face-up color each of ``games`` would take; -1 for none allowed."""
+        allowed = np.take(self.face, games, axis=1)
+        if not first:
+            allowed[LOCO] = 0
+        if strategy == "greedy":
+            # Held count, with colors not on offer pushed below any held count
+            score = np.where(allowed[:LOCO] > 0, np.take(hand[:LOCO], games, axis=1), -1)
+            color, held = best_color(score)
+            color = np.where(held >= 0, color, -1)
+            if first:
+                color = np.where(allowed[LOCO] > 0, LOCO, color)
+            return color
+        return sample(allowed, self.rng)
+
+    def draw_card(self, strategy, player, games, first):
+        """One draw for the current player in each of ``games``.
+
+        Returns the games whose turn goes on to another draw.
+        """
+        hand = self.hands[player]
+        if strategy == "deck":
+            choice = np.full(len(games), -1)
+        elif strategy == "greedy":
+            choice = self.face_choice(strategy, hand, first, games)
+        else:
+            choice = np.full(len(games), -1)
+            coin = self.rng.random(len(games)) < 0.5
+            choice[coin] = self.face_choice(strategy, hand, first, games[coin])
+
+        # Deck draws; an empty deck is reshuffled first, then may still be empty
+        deck_games = games[choice < 0]
+        self.reshuffle(deck_games)
+        color = self.draw(self.deck, deck_games)
+        self.add(hand, deck_games, color)
+        empty = deck_games[color < 0]
+        self.empty_deck[empty] += 1
+
+        # The server's error sends the player to the face-up row instead
+        if empty.size:
+            choice[np.isin(games, empty)] = self.face_choice("random", hand, first, empty)
+
+        taken = choice >= 0
+        face_games, face_color = games[taken], choice[taken]
+        self.add(self.face, face_games, face_color, -1)
+        self.add(hand, face_games, face_color)
+        self.add(self.face, face_games, self.draw(self.deck, face_games))
+        self.redeal_locomotives(face_games)
+        self.reshuffle(face_games)
+
+        drew = np.zeros(self.num_games, dtype=bool)
+        drew[deck_games[color >= 0]] = True
+        drew[face_games[face_color != LOCO]] = True
+        return np.flatnonzero(drew)
+
+    def turn(self, strategy, player):
+        self.short_face_up += self.face.sum(axis=0) < FACE_UP_COUNT
+        drawing = np.flatnonzero(~self.claim(player))
+        drawing = self.draw_card(strategy, player, drawing, first=True)
+        self.draw_card(strategy, player, drawing, first=False)
+
+
+def simulate(num_games, num_players, strategy, rounds, rng):
+    """Play ``num_games`` games for ``rounds`` turns per player; per-game results."""
+    games = Games(num_games, num_players, rng)
+    for _ in range(rounds):
+        for player in range(num_players):
+            games.turn(strategy, player)
+    hand_sizes = games.hands.sum(axis=1)
+    return {
+        "reshuffles": games.reshuffles,
+        "empty_deck": games.empty_deck,
+        "redeals": games.redeals,
+        "short_face_up": games.short_face_up,
+        "claims": games.claims,
+        "hand_size": hand_sizes.ravel(),
+        "max_hand_size": hand_sizes.max(axis=0),
+    }
+
+
+def distribution(values):
+    """Mean, share of nonzero values, percentiles and max of an integer array."""
+    result = {
+        "mean": round(float(values.mean()), 3),
+        "nonzero": round(float((values > 0).mean()), 4),
+    }
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES, method="lower")):
+        result[f"p{p}"] = int(value)
+    result["max"] = int(values.max())
+    return result
+
+
+def run(num_games, player_counts, strategies, rounds, batch, seed):
+    results = []
+    rng = np.random.default_rng(seed)
+    for num_players in player_counts:
+        for strategy in strategies:
+            start = time.perf_counter()
+            parts = []
+            for first in range(0, num_games, batch):
+                parts.append(simulate(min(batch, num_games - first), num_players, strategy, rounds, rng))
+            per_game = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+            results.append({
+                "players": num_players,
+                "strategy": strategy,
+                "games": num_games,
+                "rounds": rounds,
+                "seconds": round(time.perf_counter() - start, 2),
+                **{key: distribution(values) for key, values in per_game.items()},
+            })
+            print_result(results[-1])
+    return results
+
+
+def print_result(result):
+    print(f"\n{result['players']} players, {result['strategy']}: {result['games']:,} games"
+          f" of {result['rounds']} rounds in {result['seconds']}s")
+    print(f"  {'':<15}{'mean':>8}{'any':>8}{'p50':>6}{'p90':>6}{'p99':>6}{'max':>6}")
+    for key in ("reshuffles", "empty_deck", "redeals", "short_face_up", "claims", "hand_size", "max_hand_size"):
+        d = result[key]
+        print(f"  {key:<15}{d['mean']:>8}{d['nonzero']:>8.1%}{d['p50']:>6}{d['p90']:>6}{d['p99']:>6}{d['max']:>6}")
+
+
+def main():
+    if "--help" in sys.argv or "-h" in sys.argv:
+        print("Usage: python3 simulate-deck.py [--games N] [--players 2,3,4,5] [--strategies deck,greedy,random]"
+              " [--rounds N] [--batch N] [--seed N] [--output results.json]")
+        sys.exit(1)
+
+    num_games = 100_000
+    player_counts = [2, 3, 4, 5]
+    strategies = list(STRATEGIES)
+    rounds = 50
+    batch = 100_000
+    seed = 1
+
+    if "--games" in sys.argv:
+        num_games = int(sys.argv[sys.argv.index("--games") + 1])
+    if "--players" in sys.argv:
+        player_counts = [int(n) for n in sys.argv[sys.argv.index("--players") + 1].split(",")]
+    if "--strategies" in sys.argv:
+        strategies = sys.argv[sys.argv.index("--strategies") + 1].split(",")
+    if "--rounds" in sys.argv:
+        rounds = int(sys.argv[sys.argv.index("--rounds") + 1])
+    if "--batch" in sys.argv:
+        batch = int(sys.argv[sys.argv.index("--batch") + 1])
+    if "--seed" in sys.argv:
+        seed = int(sys.argv[sys.argv.index("--seed") + 1])
+
+    unknown = set(strategies) - set(STRATEGIES)
+    if unknown:
+        print(f"Unknown strategies: {', '.join(sorted(unknown))} (choose from {', '.join(STRATEGIES)})")
+        sys.exit(1)
+
+    results = run(num_games, player_counts, strategies, rounds, batch, seed)
+    if "--output" in sys.argv:
+        output_path = sys.argv[sys.argv.index("--output") + 1]
+        with open(output_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Bounded-memory helpers for very large source images.
+
+Upscaled 4k/8k art is too big to promote to float arrays whole. These
+helpers keep a large image in a file-backed uint8 buffer and let a script
+walk it in bands of rows:
+
+    data = tiled_image.decode_to_memmap(path, "RGBA")
+    for y0, y1 in tiled_image.row_tiles(data.shape[0]):
+        ...work on data[y0:y1]...
+    img = tiled_image.resize(data, box, (600, 420))
+
+Every full-size buffer is a memory map over an anonymous temporary file,
+so the OS can page it out; only the band being worked on needs to be
+resident. Scripts switch to this mode on their own for inputs larger than
+``LARGE_INPUT_PIXELS`` and accept ``--tiled`` to force it.
+"""
+
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Inputs with more pixels than this are processed in row tiles
+LARGE_INPUT_PIXELS = 2048 * 2048
+
+# Rows per tile; a 8192 px wide RGBA tile is 8 MB
+TILE_ROWS = 256
+
+# Support of PIL's LANCZOS filter, in source pixels at scale 1
+LANCZOS_SUPPORT = 3.0
+
+
+def is_large(size):
+    """Whether an image of ``size`` (w, h) should be processed in tiles."""
+    return size[0] * size[1] > LARGE_INPUT_PIXELS
+
+
+def row_tiles(height, tile_rows=TILE_ROWS):
+    """Yield (y0, y1) bounds of consecutive bands of at most ``tile_rows`` rows."""
+    for y0 in range(0, height, tile_rows):
+        yield y0, min(y0 + tile_rows, height)
+
+
+def scratch(shape, dtype=np.uint8):
+    """A zeroed array backed by an anonymous temporary file.
+
+    The file is deleted as soon as the array is garbage collected.
+    """
+    with tempfile.TemporaryFile(prefix="tiled-") as f:
+        return np.memmap(f, dtype=dtype, mode="w+", shape=shape)
+
+
+def decode_to_memmap(path, mode="RGBA", tile_rows=TILE_ROWS):
+    """Decode ``path`` into an (h, w, bands) uint8 ``scratch`` array.
+
+    The decoder still produces the image in its own mode once, but the
+    conversion to ``mode`` happens a band at a time and the decoded image
+    is released before this returns.
+    """
+    with Image.open(path) as img:
+        img.load()
+        w, h = img.size
+        data = scratch((h, w, len(mode)))
+        for y0, y1 in row_tiles(h, tile_rows):
+            data[y0:y1] = np.asarray(img.crop((0, y0, w, y1)).convert(mode))
+    return data
+
+
+def resize(data, box, size, tile_rows=TILE_ROWS):
+    """LANCZOS-resize the ``box`` region of an image array to ``size``.
+
+    Matches ``Image.fromarray(data).crop(box).resize(size, Image.LANCZOS)``
+    but builds the output in bands, each from just the source rows its
+    filter reaches, so the full-size region is never copied into PIL.
+    """
+    x0, y0, x1, y1 = box
+    new_w, new_h = size
+    mode = "RGBA" if data.shape[2] == 4 else "RGB"
+    scale = (y1 - y0) / new_h
+    support = LANCZOS_SUPPORT * max(scale, 1.0)
+    band = max(1, int(tile_rows / max(scale, 1.0)))
+
+    out = Image.new(mode, size)
+    for out0 in range(0, new_h, band):
+        out1 = min(out0 + band, new_h)
+        top, bottom = out0 * scale, out1 * scale
+        # Same reach as PIL's own clipping, plus a row of slack either side
+        src0 = max(int(top - support) - 1, 0)
+        src1 = min(int(bottom + support) + 2, y1 - y0)
+        strip = Image.fromarray(np.ascontiguousarray(data[y0 + src0:y0 + src1, x0:x1]), mode)
+        out.paste(
+            strip.resize((new_w, out1 - out0), Image.LANCZOS,
+                         box=(0, top - src0, x1 - x0, bottom - src0)),
+            (0, out0),
+        )
+    return out